@@ -22,9 +22,82 @@ class Settings(BaseSettings):
     SUPABASE_KEY: str
     SUPABASE_SERVICE_KEY: str
 
+    # Connections to Supabase shared by every request, and query timeouts
+    DATABASE_POOL_SIZE: int = 20
+    DATABASE_CONNECT_TIMEOUT: float = 5.0
+    DATABASE_TIMEOUT: float = 10.0
+
+    # Users by ID, cached in front of the database; broadcast invalidations
+    # to other workers over Supabase Realtime when running more than one
+    USER_CACHE_TTL_SECONDS: float = 60.0
+    USER_CACHE_MAX_USERS: int = 10_000
+    USER_CACHE_BROADCAST: bool = False
+
+    # Gmail API client
+    GMAIL_HTTP_TIMEOUT: float = 30.0
+    GMAIL_MAX_CONCURRENCY: int = 4
+    GMAIL_CLIENT_IDLE_SECONDS: float = 600.0
+    GMAIL_CLIENT_POOL_SIZE: int = 1024
+    GMAIL_FETCH_WINDOW: int = 4
+
+    # OAuth token refresh
+    TOKEN_REFRESH_MARGIN_SECONDS: float = 300.0
+    TOKEN_MANAGER_MAX_USERS: int = 4096
+
+    # Message parsing process pool (None = one worker per CPU, 0 = always inline)
+    PARSE_POOL_WORKERS: int | None = None
+    PARSE_INLINE_MAX_BYTES: int = 256 * 1024
+
+    # Parsed message cache
+    MESSAGE_CACHE_MAX_BYTES_PER_USER: int = 16 * 1024 * 1024
+    MESSAGE_CACHE_MAX_USERS: int = 256
+
+    # Incremental mailbox sync (Gmail history API)
+    MAILBOX_SYNC_FRESH_SECONDS: float = 15.0
+    MAILBOX_SYNC_MAX_USERS: int = 1024
+    MAILBOX_SYNC_WINDOW: int = 500
+
+    # Emails last shown to each user, for "reply to email #2"
+    RESULT_SET_TTL_SECONDS: float = 1800.0
+    RESULT_SET_MAX_USERS: int = 4096
+
+    # Local similarity search over synced messages, for "the email from John about..."
+    SEARCH_INDEX_DIM: int = 2048
+    SEARCH_INDEX_MAX_MESSAGES_PER_USER: int = 1000
+    SEARCH_INDEX_MAX_USERS: int = 256
+    SEARCH_REFERENCE_MIN_SCORE: float = 0.15
+
     # Google Gemini API
     GEMINI_API_KEY: str
 
+    # Gemini rate limits shared by every request in the process, and 429 retries
+    GEMINI_REQUESTS_PER_MINUTE: float = 1000.0
+    GEMINI_TOKENS_PER_MINUTE: float = 1_000_000.0
+    GEMINI_MAX_CONCURRENCY: int = 16
+    GEMINI_MAX_RETRIES: int = 4
+    GEMINI_BACKOFF_BASE_SECONDS: float = 1.0
+
+    # Stored AI summaries, read through an in-process LRU
+    ENRICHMENT_CACHE_MAX_ENTRIES: int = 50_000
+
+    # Most emails one listing fetches in full and summarizes
+    FETCH_MAX_EMAILS: int = 50
+
+    # Largest inbox slice one categorize request handles, and Gemini chunks in flight
+    CATEGORIZE_MAX_EMAILS: int = 1000
+    CATEGORIZE_CONCURRENCY: int = 8
+
+    # Full-day digest: most emails covered, and group summaries in flight
+    DIGEST_MAX_EMAILS: int = 1000
+    DIGEST_CONCURRENCY: int = 8
+
+    # Local email classifier, trained on Gemini's categorizations
+    CLASSIFIER_DIM: int = 4096
+    CLASSIFIER_MIN_EXAMPLES: int = 40
+    CLASSIFIER_MIN_CONFIDENCE: float = 0.95
+    CLASSIFIER_AUDIT_RATE: float = 0.05
+    CLASSIFIER_MAX_USERS: int = 1024
+
     # CORS
     FRONTEND_URL: str = "http://localhost:3000"
 
@@ -1,27 +1,117 @@
 """Database operations and utilities."""
 
+import time
+from typing import Any, Protocol
 from uuid import UUID
 
-from supabase import Client, create_client
+import httpx
+from postgrest import APIResponse, AsyncPostgrestClient
 
 from app.core.config import settings
 from app.models.schemas import UserCreate, UserInDB, UserUpdate
 
 
+class UserCacheHook(Protocol):
+    """What Database needs from a cache of users by ID (see ``app.services.user_cache``)."""
+
+    def get(self, user_id: UUID) -> UserInDB | None: ...
+
+    def begin(self) -> int: ...
+
+    def put(self, user: UserInDB, generation: int | None = None) -> None: ...
+
+    async def invalidate(self, user_id: UUID) -> None: ...
+
+
+class _NoUserCache:
+    """Stand-in until a user cache is registered: every lookup goes to the database."""
+
+    def get(self, _user_id: UUID) -> UserInDB | None:
+        return None
+
+    def begin(self) -> int:
+        return 0
+
+    def put(self, user: UserInDB, generation: int | None = None) -> None:
+        pass
+
+    async def invalidate(self, user_id: UUID) -> None:
+        pass
+
+
 class Database:
-    """Database client wrapper for Supabase operations."""
+    """
+    Database client wrapper for Supabase operations.
+
+    Queries go to Supabase's PostgREST API with the async client, over one
+    pool of at most ``DATABASE_POOL_SIZE`` keep-alive connections shared by
+    every request, so a slow round trip only holds up the request waiting
+    on it instead of the whole event loop. A query that cannot get a
+    connection, connect or answer within its timeout raises
+    ``httpx.TimeoutException``.
+
+    Users by ID are read through the cache registered with
+    ``use_user_cache``, if any, which user writes keep current.
+    """
 
     def __init__(self) -> None:
-        """Initialize Supabase client with service key to bypass RLS."""
+        """Initialize the PostgREST client with service key to bypass RLS."""
         # Use service key instead of anon key to bypass RLS
-        self.client: Client = create_client(
-            settings.SUPABASE_URL,
-            settings.SUPABASE_SERVICE_KEY,  # Changed from SUPABASE_KEY
+        key = settings.SUPABASE_SERVICE_KEY
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.DATABASE_POOL_SIZE,
+                max_keepalive_connections=settings.DATABASE_POOL_SIZE,
+            ),
+            timeout=httpx.Timeout(
+                settings.DATABASE_TIMEOUT, connect=settings.DATABASE_CONNECT_TIMEOUT
+            ),
+            http2=True,
+            follow_redirects=True,
+        )
+        self.client = AsyncPostgrestClient(
+            f"{settings.SUPABASE_URL}/rest/v1",
+            headers={
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+                "apikey": key,
+                "Authorization": f"Bearer {key}",
+            },
+            http_client=self._http,
         )
+        self.queries = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.query_seconds = 0.0
+        self.user_cache: UserCacheHook = _NoUserCache()
+
+    def use_user_cache(self, cache: UserCacheHook) -> None:
+        """Read users by ID through ``cache`` and keep it current on user writes."""
+        self.user_cache = cache
+
+    async def _execute(self, query: Any) -> APIResponse:
+        """Run a built query on the shared pool, counting it for /metrics."""
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            return await query.execute()
+        except httpx.TimeoutException:
+            self.timeouts += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.queries += 1
+            self.query_seconds += time.perf_counter() - started
+
+    async def aclose(self) -> None:
+        """Close the pooled connections."""
+        await self._http.aclose()
 
     async def get_user_by_email(self, email: str) -> UserInDB | None:
         """Fetch user by email."""
-        response = self.client.table("users").select("*").eq("email", email).execute()
+        response = await self._execute(self.client.table("users").select("*").eq("email", email))
 
         if not response.data:
             return None
@@ -30,7 +120,9 @@ class Database:
 
     async def get_user_by_google_id(self, google_id: str) -> UserInDB | None:
         """Fetch user by Google ID."""
-        response = self.client.table("users").select("*").eq("google_id", google_id).execute()
+        response = await self._execute(
+            self.client.table("users").select("*").eq("google_id", google_id)
+        )
 
         if not response.data:
             return None
@@ -38,13 +130,22 @@ class Database:
         return UserInDB(**response.data[0])
 
     async def get_user_by_id(self, user_id: UUID) -> UserInDB | None:
-        """Fetch user by ID."""
-        response = self.client.table("users").select("*").eq("id", str(user_id)).execute()
+        """Fetch user by ID, from the user cache when it has them."""
+        cached = self.user_cache.get(user_id)
+        if cached is not None:
+            return cached
+
+        generation = self.user_cache.begin()
+        response = await self._execute(
+            self.client.table("users").select("*").eq("id", str(user_id))
+        )
 
         if not response.data:
             return None
 
-        return UserInDB(**response.data[0])
+        user = UserInDB(**response.data[0])
+        self.user_cache.put(user, generation)
+        return user
 
     async def create_user(self, user_data: UserCreate) -> UserInDB:
         """Create a new user."""
@@ -58,12 +159,15 @@ class Database:
             ),
         }
 
-        response = self.client.table("users").insert(data).execute()
+        response = await self._execute(self.client.table("users").insert(data))
 
         if not response.data:
             raise ValueError("Failed to create user")
 
-        return UserInDB(**response.data[0])
+        user = UserInDB(**response.data[0])
+        await self.user_cache.invalidate(user.id)
+        self.user_cache.put(user)
+        return user
 
     async def update_user(self, user_id: UUID, user_data: UserUpdate) -> UserInDB:
         """Update user tokens."""
@@ -76,12 +180,18 @@ class Database:
         if user_data.token_expiry is not None:
             update_data["token_expiry"] = user_data.token_expiry.isoformat()
 
-        response = self.client.table("users").update(update_data).eq("id", str(user_id)).execute()
+        response = await self._execute(
+            self.client.table("users").update(update_data).eq("id", str(user_id))
+        )
 
         if not response.data:
             raise ValueError("Failed to update user")
 
-        return UserInDB(**response.data[0])
+        user = UserInDB(**response.data[0])
+        # Other workers may hold the old tokens
+        await self.user_cache.invalidate(user.id)
+        self.user_cache.put(user)
+        return user
 
     async def save_chat_message(
         self, user_id: UUID, role: str, content: str, metadata: dict | None = None
@@ -94,21 +204,69 @@ class Database:
             "metadata": metadata,
         }
 
-        self.client.table("chat_history").insert(data).execute()
+        await self._execute(self.client.table("chat_history").insert(data))
 
     async def get_chat_history(self, user_id: UUID, limit: int = 50) -> list[dict]:
         """Retrieve chat history for a user."""
-        response = (
+        response = await self._execute(
             self.client.table("chat_history")
             .select("*")
             .eq("user_id", str(user_id))
             .order("created_at", desc=True)
             .limit(limit)
-            .execute()
         )
 
         return response.data if response.data else []
 
+    async def get_email_summaries(
+        self, user_id: UUID, message_ids: list[str], model: str, prompt_version: str
+    ) -> dict[str, str]:
+        """Fetch stored summaries for the given messages, keyed by message ID."""
+        response = await self._execute(
+            self.client.table("email_enrichments")
+            .select("message_id, summary")
+            .eq("user_id", str(user_id))
+            .eq("model", model)
+            .eq("prompt_version", prompt_version)
+            .in_("message_id", message_ids)
+        )
+
+        return {row["message_id"]: row["summary"] for row in response.data or []}
+
+    async def save_email_summaries(
+        self, user_id: UUID, summaries: dict[str, str], model: str, prompt_version: str
+    ) -> None:
+        """Store summaries, replacing any produced by the same model and prompt."""
+        rows = [
+            {
+                "user_id": str(user_id),
+                "message_id": message_id,
+                "model": model,
+                "prompt_version": prompt_version,
+                "summary": summary,
+            }
+            for message_id, summary in summaries.items()
+        ]
+
+        await self._execute(
+            self.client.table("email_enrichments").upsert(
+                rows, on_conflict="user_id,message_id,model,prompt_version"
+            )
+        )
+
+    def stats(self) -> dict[str, Any]:
+        """Queries, timeouts, concurrency and mean round-trip time."""
+        return {
+            "queries": self.queries,
+            "timeouts": self.timeouts,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "pool_size": settings.DATABASE_POOL_SIZE,
+            "mean_query_ms": (
+                round(self.query_seconds / self.queries * 1000, 2) if self.queries else None
+            ),
+        }
+
 
 # Singleton instance
 db = Database()
@@ -1,47 +1,139 @@
 """Chat router - AI-powered email assistant endpoints."""
 
+import json
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
 from uuid import UUID
 
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 
+from app.core.config import settings
 from app.core.database import db
-from app.models.schemas import ChatRequest, ChatResponse
+from app.models.schemas import ChatMessage, ChatRequest, ChatResponse, UserInDB
 from app.services.ai_service import AIService
-from app.services.gmail_service import GmailService
+from app.services.gmail_service import METADATA, AsyncGmailService
+from app.services.llm_scheduler import INTERACTIVE, llm_scheduler
+from app.services.result_sets import result_sets
+from app.services.search_index import search_index
 
 router = APIRouter()
 
+# Fields sent in ``email`` stream events, before summaries are ready
+EMAIL_HEADER_FIELDS = ("id", "thread_id", "from", "subject", "date", "snippet", "labels")
 
-@router.post("/message")
-async def send_message(
-    request: ChatRequest, user_id: str = Query(..., description="User ID")
-) -> ChatResponse:
+_END = object()
+
+
+def _sse(event: str, data: Any) -> str:
+    """Encode one server-sent event."""
+    if isinstance(data, BaseModel):
+        data = data.model_dump(mode="json")
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _iterate_in_thread(iterator: Iterator[str]) -> AsyncIterator[str]:
+    """Drain a blocking Gemini stream without blocking the event loop."""
+    while True:
+        item = await llm_scheduler.to_thread(INTERACTIVE, next, iterator, _END)
+        if item is _END:
+            return
+        yield item
+
+
+async def _resolve_email_index(
+    user_id: UUID,
+    email_index: int,
+    conversation_history: list[ChatMessage],
+    gmail_service: AsyncGmailService,
+) -> str | None:
     """
-    Process a chat message from the user.
+    Map an index the user saw ("email #2") to a message ID.
 
-    This endpoint will:
-    1. Parse user intent (fetch, summarize, reply, send, delete, categorize, digest)
-    2. Call appropriate Gmail/AI services
-    3. Return AI response with action metadata including email data
+    Tries the email list in the conversation's own metadata first, since
+    that is what this user saw in this conversation; the server-side record
+    of the user's last listing may come from another tab or be missing on
+    another worker. Only then are message IDs (no message bodies) listed
+    from Gmail.
+    """
+    for msg in reversed(conversation_history):
+        shown = (msg.metadata or {}).get("emails")
+        if msg.role == "assistant" and isinstance(shown, list) and shown:
+            if -len(shown) <= email_index < len(shown):
+                return shown[email_index].get("id")
+            return None
+
+    email_id = result_sets.resolve(str(user_id), email_index)
+    if email_id:
+        return email_id
+
+    message_ids = await gmail_service.list_message_ids(max_results=max(email_index + 1, 10))
+    if email_index < len(message_ids):
+        return message_ids[email_index]
+    return None
+
+
+def _resolve_email_reference(user_id: UUID, reference: str) -> str | None:
+    """
+    Map a free-text reference ("the email from John about the invoice") to a message ID.
+
+    Searches the local index of the user's synced messages, so it costs no
+    Gmail or Gemini calls; returns None unless a match scores high enough.
+    """
+    matches = search_index.search(
+        str(user_id), reference, k=1, min_score=settings.SEARCH_REFERENCE_MIN_SCORE
+    )
+    return matches[0][0] if matches else None
+
+
+async def _get_user(user_id: str) -> UserInDB:
+    """
+    Look up the user a chat request is made for.
+
+    Raises:
+        HTTPException: 400 for a malformed user ID, 404 for an unknown user
     """
     try:
         user_uuid = UUID(user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid user ID") from e
 
-        # Verify user exists
-        user = await db.get_user_by_id(user_uuid)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+    user = await db.get_user_by_id(user_uuid)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
-        # Save user message to history
-        await db.save_chat_message(user_uuid, "user", request.message)
 
-        # Initialize services
-        ai_service = AIService()
-        gmail_service = GmailService(user)
+async def _chat_events(request: ChatRequest, user: UserInDB) -> AsyncIterator[tuple[str, Any]]:
+    """
+    Process a chat message, yielding ``(event, data)`` pairs as work progresses.
+
+    Events, in order of appearance:
+    - ``intent``: the detected intent and its parameters
+    - ``email``: headers of one listed email, as soon as the listing arrives
+    - ``summary``: ``{"id", "summary"}`` for one listed email, as each batch completes
+    - ``progress``: ``{"categorized", "total"}`` as categorization chunks complete;
+      ``total`` counts the emails fetched so far
+    - ``token``: ``{"text"}`` fragments of a streamed reply, digest or answer
+    - ``done``: the final ChatResponse, always last
+
+    Raises:
+        HTTPException: 400 for invalid input, 500 otherwise
+    """
+    user_uuid = user.id
 
+    try:
         # Detect intent with enhanced NLP
+        ai_service = AIService()
         intent_data = ai_service.detect_intent(request.message, request.conversation_history)
         intent = intent_data["intent"]
+        yield "intent", intent_data
+
+        # Save user message to history
+        await db.save_chat_message(user_uuid, "user", request.message)
+
+        gmail_service = await AsyncGmailService.for_user(user)
 
         response_message = ""
         action_taken = None
@@ -50,21 +142,29 @@ async def send_message(
         # Process based on intent
         if intent == "fetch_emails" or intent == "summarize":
             # Fetch emails with AI-generated summaries for each
-            count = intent_data.get("count", 5)
+            count = min(intent_data.get("count", 5), settings.FETCH_MAX_EMAILS)
             query = intent_data.get("query", "")
 
             print(f"[CHAT] Fetching {count} emails with query: '{query}'")
-            emails = gmail_service.fetch_emails(max_results=count, query=query)
+            emails = await gmail_service.fetch_emails(max_results=count, query=query)
 
             if not emails:
                 response_message = "No emails found matching your criteria."
                 action_taken = "fetch_emails"
                 metadata = {"emails": [], "count": 0}
             else:
-                # Generate AI summary for each email
+                for email in emails:
+                    yield "email", {key: email[key] for key in EMAIL_HEADER_FIELDS}
+
+                # Reuse stored summaries; summarize the rest in as few calls as possible
+                summaries: dict[str, str] = {}
+                async for batch in ai_service.iter_summaries(user_uuid, emails):
+                    summaries.update(batch)
+                    for message_id, summary in batch.items():
+                        yield "summary", {"id": message_id, "summary": summary}
+
                 enriched_emails = []
                 for email in emails:
-                    summary = ai_service.summarize_single_email(email)
                     enriched_emails.append(
                         {
                             "id": email["id"],
@@ -74,11 +174,13 @@ async def send_message(
                             "date": email["date"],
                             "snippet": email["snippet"],
                             "body": email["body"][:500],  # Truncate for frontend
-                            "summary": summary,
+                            "summary": summaries[email["id"]],
                             "labels": email["labels"],
                         }
                     )
 
+                result_sets.remember(str(user_uuid), [e["id"] for e in enriched_emails])
+
                 # Create conversational response
                 response_message = ai_service.create_email_list_response(enriched_emails, query)
                 action_taken = "fetch_emails"
@@ -95,17 +197,24 @@ async def send_message(
             custom_instruction = intent_data.get("instruction", "")
 
             if not email_id and email_index is not None:
-                # Get email from previous context (need to fetch recent emails)
-                emails = gmail_service.fetch_emails(max_results=10)
-                if email_index < len(emails):
-                    email_id = emails[email_index]["id"]
+                # Resolve against the emails the user was last shown
+                email_id = await _resolve_email_index(
+                    user_uuid, email_index, request.conversation_history, gmail_service
+                )
+            elif not email_id and intent_data.get("reference"):
+                email_id = _resolve_email_reference(user_uuid, intent_data["reference"])
 
             if email_id:
-                emails = gmail_service.fetch_emails(max_results=50)
-                target_email = next((e for e in emails if e["id"] == email_id), None)
+                target_email = await gmail_service.get_email(email_id)
 
                 if target_email:
-                    reply_text = ai_service.generate_reply(target_email, custom_instruction)
+                    parts = []
+                    async for text in _iterate_in_thread(
+                        ai_service.stream_reply(target_email, custom_instruction)
+                    ):
+                        parts.append(text)
+                        yield "token", {"text": text}
+                    reply_text = "".join(parts).strip()
                     response_message = f"Here's a suggested reply:\n\n{reply_text}\n\nWould you like me to send this? (Say 'yes send it' or 'no thanks')"
                     action_taken = "generate_reply"
                     metadata = {
@@ -131,7 +240,7 @@ async def send_message(
             thread_id = intent_data.get("thread_id")
 
             if all([reply_text, to, subject]):
-                result = gmail_service.send_email(to, subject, reply_text, thread_id)
+                result = await gmail_service.send_email(to, subject, reply_text, thread_id)
                 response_message = f"✅ Reply sent successfully to {to}!"
                 action_taken = "send_reply"
                 metadata = {"sent_message_id": result["id"]}
@@ -148,20 +257,21 @@ async def send_message(
             confirmed = intent_data.get("confirmed", False)
 
             if not email_id and email_index is not None:
-                emails = gmail_service.fetch_emails(max_results=10)
-                if email_index < len(emails):
-                    email_id = emails[email_index]["id"]
+                email_id = await _resolve_email_index(
+                    user_uuid, email_index, request.conversation_history, gmail_service
+                )
+            elif not email_id and intent_data.get("reference"):
+                email_id = _resolve_email_reference(user_uuid, intent_data["reference"])
 
             if email_id:
                 if confirmed:
-                    gmail_service.delete_email(email_id)
+                    await gmail_service.delete_email(email_id)
                     response_message = "🗑️ Email deleted successfully!"
                     action_taken = "delete_email"
                     metadata = {"deleted_email_id": email_id}
                 else:
                     # Ask for confirmation
-                    emails = gmail_service.fetch_emails(max_results=50)
-                    target_email = next((e for e in emails if e["id"] == email_id), None)
+                    target_email = await gmail_service.get_email(email_id)
                     if target_email:
                         response_message = f"Are you sure you want to delete:\n\nFrom: {target_email['from']}\nSubject: {target_email['subject']}\n\nSay 'yes delete it' to confirm."
                         action_taken = "delete_confirm"
@@ -175,21 +285,38 @@ async def send_message(
 
         elif intent == "categorize":
             # Smart inbox categorization
-            count = intent_data.get("count", 20)
-            emails = gmail_service.fetch_emails(max_results=count)
-
-            categories = ai_service.categorize_emails(emails)
+            count = min(intent_data.get("count", 20), settings.CATEGORIZE_MAX_EMAILS)
+            # Categorization only reads sender, subject and snippet
+            batches = gmail_service.iter_emails(max_results=count, projection=METADATA)
+
+            categories: dict[str, list[dict]] = {}
+            total = 0
+            async for categorized, total, result in ai_service.iter_categorization(
+                batches, user_uuid
+            ):
+                if result is None:
+                    yield "progress", {"categorized": categorized, "total": total}
+                else:
+                    categories = result
             response_message = ai_service.format_categorized_emails(categories)
             action_taken = "categorize"
-            metadata = {"categories": categories, "total_emails": len(emails)}
+            metadata = {"categories": categories, "total_emails": total}
 
         elif intent == "digest":
             # Daily email digest
-            emails = gmail_service.fetch_emails(max_results=20, query="newer_than:1d")
-            digest = ai_service.generate_daily_digest(emails)
-            response_message = digest
+            batches = gmail_service.iter_emails(
+                max_results=settings.DIGEST_MAX_EMAILS, query="newer_than:1d", projection=METADATA
+            )
+            emails, group_summaries = await ai_service.summarize_digest_groups(user_uuid, batches)
+            parts = []
+            async for text in _iterate_in_thread(
+                ai_service.stream_daily_digest(emails, group_summaries)
+            ):
+                parts.append(text)
+                yield "token", {"text": text}
+            response_message = "".join(parts).strip()
             action_taken = "digest"
-            metadata = {"emails_count": len(emails)}
+            metadata = {"emails_count": len(emails), "groups": len(group_summaries)}
 
         else:
             # General query with context
@@ -199,14 +326,25 @@ async def send_message(
                     [f"{msg.role}: {msg.content}" for msg in request.conversation_history[-5:]]
                 )
 
-            response_message = ai_service.process_natural_query(request.message, context)
+            parts = []
+            async for text in _iterate_in_thread(
+                ai_service.stream_natural_query(request.message, context)
+            ):
+                parts.append(text)
+                yield "token", {"text": text}
+            response_message = "".join(parts).strip()
             action_taken = "query"
 
         # Save assistant response to history
         await db.save_chat_message(user_uuid, "assistant", response_message, metadata)
 
-        return ChatResponse(message=response_message, action_taken=action_taken, metadata=metadata)
+        yield (
+            "done",
+            ChatResponse(message=response_message, action_taken=action_taken, metadata=metadata),
+        )
 
+    except HTTPException:
+        raise
     except ValueError as e:
         error_msg = f"Error: {e!s}"
         print(f"[CHAT ERROR] ValueError: {e}")
@@ -222,6 +360,55 @@ async def send_message(
         raise HTTPException(status_code=500, detail=error_msg) from e
 
 
+@router.post("/message")
+async def send_message(
+    request: ChatRequest, user_id: str = Query(..., description="User ID")
+) -> ChatResponse:
+    """
+    Process a chat message from the user.
+
+    This endpoint will:
+    1. Parse user intent (fetch, summarize, reply, send, delete, categorize, digest)
+    2. Call appropriate Gmail/AI services
+    3. Return AI response with action metadata including email data
+    """
+    user = await _get_user(user_id)
+    response = None
+    async for event, data in _chat_events(request, user):
+        if event == "done":
+            response = data
+    return response
+
+
+@router.post("/stream")
+async def stream_message(
+    request: ChatRequest, user_id: str = Query(..., description="User ID")
+) -> StreamingResponse:
+    """
+    Process a chat message, streaming progress as server-sent events.
+
+    Emits the events documented on ``_chat_events``; the final ``done`` event
+    carries the same payload ``/chat/message`` returns. An invalid or unknown
+    user is rejected with 400 or 404 before the stream starts; later failures
+    arrive as an ``error`` event with ``status_code`` and ``detail``.
+    """
+    user = await _get_user(user_id)
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event, data in _chat_events(request, user):
+                yield _sse(event, data)
+        except HTTPException as e:
+            yield _sse("error", {"status_code": e.status_code, "detail": e.detail})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/history")
 async def get_history(
     user_id: str = Query(..., description="User ID"),
@@ -234,7 +421,10 @@ async def get_history(
     """
     try:
         user_uuid = UUID(user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid user ID") from e
 
+    try:
         # Verify user exists
         user = await db.get_user_by_id(user_uuid)
         if not user:
@@ -1,15 +1,95 @@
 """AI service using Google Gemini for email processing."""
 
+import asyncio
+import hashlib
+import json
+import random
 import re
+import threading
+import time
+import zlib
+from collections.abc import AsyncIterable, AsyncIterator, Iterator
 from typing import Any
+from uuid import UUID
 
 import google.generativeai as genai
 
 from app.core.config import settings
+from app.services.category_classifier import CATEGORIES, category_classifier
+from app.services.enrichment_store import enrichment_store
+from app.services.intent_matcher import intent_matcher
+from app.services.llm_scheduler import BULK, INTERACTIVE, llm_scheduler
+from app.services.prompt_packer import PACKING_VERSION, count_tokens, prompt_packer, truncate_tokens
+from app.services.single_flight import single_flight
 
 # Configure Gemini
 genai.configure(api_key=settings.GEMINI_API_KEY)
 
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# Token budgets for email content in prompts. Bodies are stripped of quoted
+# history and signatures first (see prompt_packer), so these go to new text.
+REPLY_BODY_TOKENS = 300
+SINGLE_SUMMARY_BODY_TOKENS = 150
+OVERVIEW_SNIPPET_TOKENS = 40
+CATEGORIZE_SNIPPET_TOKENS = 20
+
+# Batched summaries: emails per Gemini call, the body tokens they share, and
+# the most any one body gets
+SUMMARY_BATCH_SIZE = 10
+SUMMARY_BATCH_BODY_TOKENS = 1000
+SUMMARY_BODY_MAX_TOKENS = 300
+
+SUMMARY_ENTRY_TEMPLATE = """[id: {id}]
+From: {sender}
+Subject: {subject}
+Content: {content}"""
+
+SUMMARY_BATCH_PROMPT = """Summarize each of these emails in 1-2 sentences. Be concise and highlight the main point or request.
+Reply with ONLY a JSON object mapping each email's id to its summary.
+
+{emails}
+
+Format: {{"<id>": "<summary>"}}"""
+
+# Emails per categorization request to Gemini, and how a request is retried
+CATEGORIZE_CHUNK_SIZE = 20
+CATEGORIZE_ATTEMPTS = 3
+CATEGORIZE_RETRY_DELAY = 0.5
+
+# Full-day digests: days with more emails than DIGEST_GROUP_SIZE are
+# summarized in groups of about that many, and the digest is written from
+# the group summaries
+DIGEST_GROUP_SIZE = 20
+DIGEST_SNIPPET_TOKENS = 25
+
+DIGEST_GROUP_PROMPT = """Summarize these {count} emails in 2-4 short bullet points.
+Say who needs what and by when, and flag anything urgent; leave out routine notifications and promotions.
+
+{emails}"""
+
+# Typical response tokens, charged to the rate limiter along with the
+# prompt's own until Gemini reports a call's actual usage
+EXPECTED_OUTPUT_TOKENS = 256
+
+QUERY_FALLBACK = "I'm having trouble processing that request. Could you try rephrasing it?"
+DIGEST_HEADER = "📅 **Daily Email Digest**\n\n"
+DIGEST_EMPTY = "📭 No emails today! Your inbox is clear."
+
+EMAIL_ADDRESS = re.compile(r"[\w\.-]+@[\w\.-]+\.\w+")
+
+# Stored summaries are keyed by this, so editing the prompt invalidates them
+SUMMARY_PROMPT_VERSION = hashlib.sha256(
+    f"{SUMMARY_BATCH_PROMPT}{SUMMARY_ENTRY_TEMPLATE}{SUMMARY_BATCH_BODY_TOKENS}"
+    f"{SUMMARY_BODY_MAX_TOKENS}{PACKING_VERSION}".encode()
+).hexdigest()[:16]
+
+
+# Stored digest group summaries are keyed by this, for the same reason
+DIGEST_GROUP_PROMPT_VERSION = hashlib.sha256(
+    f"{DIGEST_GROUP_PROMPT}{DIGEST_SNIPPET_TOKENS}{PACKING_VERSION}".encode()
+).hexdigest()[:16]
+
 
 class AIService:
     """Google Gemini AI service for email assistance."""
@@ -17,7 +97,60 @@ class AIService:
     def __init__(self) -> None:
         """Initialize Gemini model."""
         # Use Gemini 1.5 Flash for fast, cost-effective processing
-        self.model = genai.GenerativeModel("gemini-2.5-flash")
+        self.model_name = GEMINI_MODEL
+        self.model = genai.GenerativeModel(self.model_name)
+        self.usage = {"calls": 0, "prompt_tokens": 0, "output_tokens": 0}
+        self._usage_lock = threading.Lock()
+
+    def _generate(self, prompt: str, priority: int = INTERACTIVE, **kwargs: Any) -> Any:
+        """
+        Call Gemini through the shared scheduler and record token usage.
+
+        An identical prompt already in flight, e.g. from a double-submitted
+        request, is not sent again; its response is shared.
+        """
+        key = (self.model_name, prompt, repr(sorted(kwargs.items())))
+        return single_flight.run("gemini", key, lambda: self._call(prompt, priority, kwargs))
+
+    def _call(self, prompt: str, priority: int, kwargs: dict[str, Any]) -> Any:
+        estimated = self._estimate_tokens(prompt)
+        response = llm_scheduler.run(
+            lambda: self.model.generate_content(prompt, **kwargs), priority, estimated
+        )
+        self._record_usage(response, estimated)
+        return response
+
+    def _stream(self, prompt: str, priority: int = INTERACTIVE) -> Iterator[str]:
+        """Call Gemini with streaming and yield text as it is generated."""
+        estimated = self._estimate_tokens(prompt)
+
+        def chunks() -> Iterator[str]:
+            response = self.model.generate_content(prompt, stream=True)
+            for chunk in response:
+                if chunk.candidates and chunk.parts:
+                    yield chunk.text
+            self._record_usage(response, estimated)
+
+        yield from llm_scheduler.stream(chunks, priority, estimated)
+
+    def _estimate_tokens(self, prompt: str) -> int:
+        return count_tokens(prompt) + EXPECTED_OUTPUT_TOKENS
+
+    def _record_usage(self, response: Any, estimated: int) -> None:
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            with self._usage_lock:
+                self.usage["calls"] += 1
+            return
+
+        prompt_tokens = usage.prompt_token_count or 0
+        output_tokens = usage.candidates_token_count or 0
+        llm_scheduler.settle(estimated, prompt_tokens, output_tokens)
+        # Parallel categorization calls report from several threads
+        with self._usage_lock:
+            self.usage["calls"] += 1
+            self.usage["prompt_tokens"] += prompt_tokens
+            self.usage["output_tokens"] += output_tokens
 
     def detect_intent(
         self, user_message: str, conversation_history: list | None = None
@@ -28,159 +161,7 @@ class AIService:
         Returns:
             Dict with intent type and extracted parameters
         """
-        message_lower = user_message.lower()
-        conversation_history = conversation_history or []
-
-        # Check for confirmation keywords first - with metadata extraction
-        if (
-            any(
-                word in message_lower
-                for word in [
-                    "yes",
-                    "confirm",
-                    "do it",
-                    "go ahead",
-                    "send it",
-                    "delete it",
-                    "yeah",
-                    "yep",
-                    "sure",
-                ]
-            )
-            and conversation_history
-        ):
-            # Look back through last 3 messages for pending actions
-            for msg in reversed(conversation_history[-3:]):
-                # Handle both dict and Pydantic ChatMessage
-                if hasattr(msg, "role"):
-                    role = msg.role
-                    content = msg.content
-                    metadata = getattr(msg, "metadata", None)
-                elif isinstance(msg, dict):
-                    role = msg.get("role")
-                    content = msg.get("content", "")
-                    metadata = msg.get("metadata")
-                else:
-                    continue
-
-                # Only check assistant messages
-                if role != "assistant":
-                    continue
-
-                # Check if assistant was asking for delete confirmation
-                if "are you sure you want to delete" in content.lower():
-                    if metadata and isinstance(metadata, dict):
-                        email_id = metadata.get("email_id")
-                        if email_id:
-                            return {
-                                "intent": "delete_email",
-                                "email_id": email_id,
-                                "confirmed": True,
-                            }
-                    break
-
-                # Check if assistant was asking to send reply
-                if "would you like me to send" in content.lower():
-                    if metadata and isinstance(metadata, dict):
-                        return {"intent": "send_reply", "confirmed": True, **metadata}
-                    break
-
-        # Fetch/Show emails
-        if any(word in message_lower for word in ["show", "list", "fetch", "get", "display"]):
-            count = self._extract_number(user_message) or 5
-            query = self._extract_query(user_message)
-            return {"intent": "fetch_emails", "count": count, "query": query}
-
-        # Summarize
-        if any(word in message_lower for word in ["summarize", "summary"]):
-            count = self._extract_number(user_message) or 5
-            query = self._extract_query(user_message)
-            return {"intent": "fetch_emails", "count": count, "query": query}
-
-        # Reply generation
-        if any(word in message_lower for word in ["reply", "respond", "answer"]):
-            email_index = self._extract_email_index(user_message)
-            instruction = self._extract_instruction(user_message)
-            return {
-                "intent": "generate_reply",
-                "email_index": email_index,
-                "instruction": instruction,
-            }
-
-        # Delete
-        if any(word in message_lower for word in ["delete", "remove", "trash"]):
-            email_index = self._extract_email_index(user_message)
-            return {
-                "intent": "delete_email",
-                "email_index": email_index,
-                "confirmed": False,
-            }
-
-        # Categorize
-        if any(word in message_lower for word in ["categorize", "organize", "group", "category"]):
-            count = self._extract_number(user_message) or 20
-            return {"intent": "categorize", "count": count}
-
-        # Daily digest
-        if any(word in message_lower for word in ["digest", "today", "summary of the day"]):
-            return {"intent": "digest"}
-
-        # Default to general query
-        return {"intent": "query", "message": user_message}
-
-    def _extract_number(self, message: str) -> int | None:
-        """Extract number from message (e.g., 'last 5 emails' -> 5)."""
-        import re
-
-        match = re.search(r"\b(\d+)\b", message)
-        return int(match.group(1)) if match else None
-
-    def _extract_email_index(self, message: str) -> int | None:
-        """Extract email index (e.g., 'email #2' or 'second email' -> 1)."""
-        import re
-
-        # Check for #N or number N
-        match = re.search(r"#(\d+)|email\s+(\d+)|(\d+)\s*(?:st|nd|rd|th)", message.lower())
-        if match:
-            num = match.group(1) or match.group(2) or match.group(3)
-            return int(num) - 1  # Convert to 0-indexed
-
-        # Check for ordinal words
-        ordinals = {
-            "first": 0,
-            "second": 1,
-            "third": 2,
-            "fourth": 3,
-            "fifth": 4,
-            "last": -1,
-            "latest": 0,
-            "recent": 0,
-        }
-        for word, index in ordinals.items():
-            if word in message.lower():
-                return index
-
-        return None
-
-    def _extract_instruction(self, message: str) -> str:
-        """Extract custom instruction from reply command."""
-        # Look for phrases after 'saying' or 'that'
-        import re
-
-        match = re.search(r"(?:saying|that|tell them)\s+(.+)", message, re.IGNORECASE)
-        return match.group(1) if match else ""
-
-    def _extract_query(self, message: str) -> str:
-        """Extract Gmail query from user message."""
-        # Look for email-related filters
-        if "unread" in message.lower():
-            return "is:unread"
-        if "from" in message.lower():
-            # Extract email address if present
-            email_match = re.search(r"[\w\.-]+@[\w\.-]+", message)
-            if email_match:
-                return f"from:{email_match.group()}"
-        return ""
+        return intent_matcher.detect(user_message, conversation_history)
 
     def _extract_target(self, message: str) -> str:
         """Extract target identifier from delete command."""
@@ -210,7 +191,7 @@ class AIService:
             email_summaries.append(
                 f"{idx}. From: {email['from']}\n"
                 f"   Subject: {email['subject']}\n"
-                f"   Snippet: {email['snippet'][:150]}..."
+                f"   Snippet: {truncate_tokens(email['snippet'], OVERVIEW_SNIPPET_TOKENS)}"
             )
 
         emails_text = "\n\n".join(email_summaries)
@@ -226,9 +207,10 @@ Provide a brief overview highlighting:
 - Any urgent items
 
 Keep it conversational and under 150 words."""
+        prompt_packer.measure("overview", prompt)
 
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate(prompt)
             return response.text
 
         except Exception:
@@ -256,26 +238,39 @@ Keep it conversational and under 150 words."""
         Returns:
             AI-generated reply text
         """
+        try:
+            response = self._generate(self._reply_prompt(original_email, user_instruction))
+            return response.text.strip()
+
+        except Exception as e:
+            raise ValueError(f"Failed to generate reply: {e!s}") from e
+
+    def stream_reply(
+        self, original_email: dict[str, Any], user_instruction: str = ""
+    ) -> Iterator[str]:
+        """Like generate_reply, but yields the reply text as Gemini generates it."""
+        try:
+            yield from self._stream(self._reply_prompt(original_email, user_instruction))
+        except Exception as e:
+            raise ValueError(f"Failed to generate reply: {e!s}") from e
+
+    def _reply_prompt(self, original_email: dict[str, Any], user_instruction: str) -> str:
         email_context = f"""From: {original_email["from"]}
 Subject: {original_email["subject"]}
-Body: {original_email["body"][:1000]}"""  # Limit body for tokens
+Body: {prompt_packer.body(original_email["body"], REPLY_BODY_TOKENS)}"""
 
         instruction = user_instruction or "Write a professional, helpful reply"
 
-        prompt = f"""You are an email assistant. Generate a reply to this email:
+        return prompt_packer.measure(
+            "reply",
+            f"""You are an email assistant. Generate a reply to this email:
 
 {email_context}
 
 User instruction: {instruction}
 
-Write a clear, professional reply. Keep it concise (under 200 words). Do not include greetings like "Dear" or signatures, just the reply body."""
-
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-
-        except Exception as e:
-            raise ValueError(f"Failed to generate reply: {e!s}") from e
+Write a clear, professional reply. Keep it concise (under 200 words). Do not include greetings like "Dear" or signatures, just the reply body.""",
+        )
 
     def process_natural_query(self, user_message: str, context: str = "") -> str:
         """
@@ -288,25 +283,41 @@ Write a clear, professional reply. Keep it concise (under 200 words). Do not inc
         Returns:
             AI-generated response
         """
-        prompt = f"""You are a helpful email assistant. The user says:
+        try:
+            response = self._generate(self._query_prompt(user_message, context))
+            return response.text.strip()
+
+        except Exception:
+            return QUERY_FALLBACK
+
+    def stream_natural_query(self, user_message: str, context: str = "") -> Iterator[str]:
+        """Like process_natural_query, but yields the response as Gemini generates it."""
+        produced = False
+        try:
+            for text in self._stream(self._query_prompt(user_message, context)):
+                produced = True
+                yield text
+        except Exception as e:
+            print(f"[AI] Streaming query failed: {e}")
+            if not produced:
+                yield QUERY_FALLBACK
+
+    def _query_prompt(self, user_message: str, context: str) -> str:
+        return prompt_packer.measure(
+            "query",
+            f"""You are a helpful email assistant. The user says:
 
 "{user_message}"
 
 Context:
 {context if context else "No specific context provided."}
 
-Respond conversationally and helpfully. If you need more information, ask clarifying questions. Keep your response under 100 words."""
-
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-
-        except Exception:
-            return "I'm having trouble processing that request. Could you try rephrasing it?"
+Respond conversationally and helpfully. If you need more information, ask clarifying questions. Keep your response under 100 words.""",
+        )
 
     def extract_email_address(self, text: str) -> str | None:
         """Extract email address from text."""
-        match = re.search(r"[\w\.-]+@[\w\.-]+\.\w+", text)
+        match = EMAIL_ADDRESS.search(text)
         return match.group() if match else None
 
     def summarize_single_email(self, email: dict[str, Any]) -> str:
@@ -323,17 +334,131 @@ Respond conversationally and helpfully. If you need more information, ask clarif
 
 From: {email["from"]}
 Subject: {email["subject"]}
-Content: {email["body"][:500]}
+Content: {prompt_packer.body(email["body"], SINGLE_SUMMARY_BODY_TOKENS)}
 
 Be concise and highlight the main point or request."""
+        prompt_packer.measure("summary", prompt)
 
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate(prompt, BULK)
             return response.text.strip()
         except Exception:
             # Fallback to snippet
             return email["snippet"][:100] + "..."
 
+    async def summarize_emails_cached(
+        self, user_id: UUID, emails: list[dict[str, Any]]
+    ) -> dict[str, str]:
+        """
+        Summarize emails, reusing summaries stored by earlier requests.
+
+        Only emails without a stored summary for the current model and prompt
+        version are sent to Gemini, and their summaries are stored for next time.
+        Snippet fallbacks are never stored.
+
+        Args:
+            user_id: Owner of the emails
+            emails: List of email dictionaries
+
+        Returns:
+            Dict mapping message ID to a 1-2 sentence summary
+        """
+        summaries: dict[str, str] = {}
+        async for batch in self.iter_summaries(user_id, emails):
+            summaries.update(batch)
+        return summaries
+
+    async def iter_summaries(
+        self, user_id: UUID, emails: list[dict[str, Any]]
+    ) -> AsyncIterator[dict[str, str]]:
+        """
+        Yield summaries as they become available, same rules as summarize_emails_cached.
+
+        Stored summaries come first in one batch, then one batch per Gemini
+        call. Every email appears in exactly one batch.
+        """
+        summaries = await enrichment_store.get_summaries(
+            user_id, [email["id"] for email in emails], self.model_name, SUMMARY_PROMPT_VERSION
+        )
+        if summaries:
+            yield summaries
+
+        missing = [email for email in emails if email["id"] not in summaries]
+        for chunk in self._summary_chunks(missing):
+            generated = await llm_scheduler.to_thread(BULK, self._summarize_chunk, chunk)
+            await enrichment_store.put_summaries(
+                user_id, generated, self.model_name, SUMMARY_PROMPT_VERSION
+            )
+            yield self._with_fallbacks(chunk, dict(generated))
+
+    def summarize_emails_batch(self, emails: list[dict[str, Any]]) -> dict[str, str]:
+        """
+        Summarize many emails with one Gemini call per chunk instead of one per email.
+
+        Emails are sent in chunks of SUMMARY_BATCH_SIZE, whose bodies share
+        SUMMARY_BATCH_BODY_TOKENS. Any email the model skips, or a whole chunk
+        whose call fails, falls back to its snippet.
+
+        Args:
+            emails: List of email dictionaries
+
+        Returns:
+            Dict mapping message ID to a 1-2 sentence summary
+        """
+        summaries: dict[str, str] = {}
+        for chunk in self._summary_chunks(emails):
+            summaries.update(self._summarize_chunk(chunk))
+        return self._with_fallbacks(emails, summaries)
+
+    def _with_fallbacks(
+        self, emails: list[dict[str, Any]], summaries: dict[str, str]
+    ) -> dict[str, str]:
+        """Fill in the snippet for every email that has no summary."""
+        for email in emails:
+            if not summaries.get(email["id"]):
+                summaries[email["id"]] = email["snippet"][:100] + "..."
+        return summaries
+
+    def _summary_chunks(self, emails: list[dict[str, Any]]) -> Iterator[list[dict[str, Any]]]:
+        """Split emails into chunks of one summarization prompt each."""
+        for start in range(0, len(emails), SUMMARY_BATCH_SIZE):
+            yield emails[start : start + SUMMARY_BATCH_SIZE]
+
+    def _summarize_chunk(self, emails: list[dict[str, Any]]) -> dict[str, str]:
+        """Summarize one chunk of emails; returns only the summaries the model produced."""
+        bodies = prompt_packer.bodies(
+            [email["body"] for email in emails], SUMMARY_BATCH_BODY_TOKENS, SUMMARY_BODY_MAX_TOKENS
+        )
+        entries = [
+            SUMMARY_ENTRY_TEMPLATE.format(
+                id=email["id"], sender=email["from"], subject=email["subject"], content=body
+            )
+            for email, body in zip(emails, bodies, strict=True)
+        ]
+        prompt = prompt_packer.measure(
+            "summary_batch", SUMMARY_BATCH_PROMPT.format(emails="\n\n".join(entries))
+        )
+
+        try:
+            response = self._generate(
+                prompt, BULK, generation_config={"response_mime_type": "application/json"}
+            )
+            text = response.text.strip()
+            start = text.find("{")
+            end = text.rfind("}") + 1
+            if start < 0 or end <= start:
+                return {}
+            parsed = json.loads(text[start:end])
+        except Exception as e:
+            print(f"[AI] Batch summarization failed: {e}")
+            return {}
+
+        return {
+            email["id"]: parsed[email["id"]].strip()
+            for email in emails
+            if isinstance(parsed.get(email["id"]), str) and parsed[email["id"]].strip()
+        }
+
     def create_email_list_response(self, emails: list[dict[str, Any]], query: str = "") -> str:
         """Create a conversational response for email list."""
         count = len(emails)
@@ -346,24 +471,214 @@ Be concise and highlight the main point or request."""
             + "You can ask me to:\n- Reply to any email (e.g., 'reply to email #1')\n- Delete an email (e.g., 'delete email #2')\n- Get more details about any email"
         )
 
-    def categorize_emails(self, emails: list[dict[str, Any]]) -> dict[str, list[dict]]:
+    def categorize_emails(
+        self, emails: list[dict[str, Any]], user_id: UUID | None = None
+    ) -> dict[str, list[dict]]:
         """
         Categorize emails using AI into Work, Personal, Promotions, Urgent.
 
+        With a ``user_id``, the user's local classifier labels the emails it
+        is confident about and only the rest go to Gemini, whose answers in
+        turn train the classifier. A small random share of confident labels
+        is still checked by Gemini, to keep measuring how often the two agree.
+        Gemini is asked ``CATEGORIZE_CHUNK_SIZE`` emails at a time, one chunk
+        after another; ``iter_categorization`` runs the chunks in parallel.
+
         Args:
             emails: List of email dictionaries
+            user_id: Whose local classifier to use and train
 
         Returns:
             Dict with categories as keys and email lists as values
         """
-        if not emails:
-            return {"Work": [], "Personal": [], "Promotions": [], "Urgent": []}
+        guesses, asked = self._triage_categories(emails, user_id)
+        labels: dict[int, str] = {}
+        llm_calls = 0
+        for chunk in self._category_chunks(asked):
+            chunk_labels, chunk_calls = self._categorize_chunk(emails, chunk)
+            labels.update(chunk_labels)
+            llm_calls += chunk_calls
+        return self._merge_categories(emails, user_id, guesses, asked, labels, llm_calls=llm_calls)
+
+    async def iter_categorization(
+        self,
+        email_batches: AsyncIterable[list[dict[str, Any]]],
+        user_id: UUID | None = None,
+    ) -> AsyncIterator[tuple[int, int, dict[str, list[dict]] | None]]:
+        """
+        Categorize like categorize_emails, as emails arrive and in parallel.
+
+        Each batch (e.g. from AsyncGmailService.iter_emails) is triaged as soon
+        as it arrives and its Gemini chunks start right away, so work on the
+        first batch overlaps with fetching the rest. At most
+        ``CATEGORIZE_CONCURRENCY`` chunks are in flight at once, and a chunk
+        that fails is retried on its own (see ``_categorize_chunk``).
+
+        Yields:
+            ``(emails categorized so far, emails received so far, None)`` as
+            each batch arrives and each chunk completes, then
+            ``(total, total, categories)`` once every result is merged
+        """
+        emails: list[dict[str, Any]] = []
+        guesses: list[tuple[str, float] | None] = []
+        asked: list[int] = []
+        labels: dict[int, str] = {}
+        # Gemini calls made by each finished chunk
+        llm_calls: list[int] = []
+        # Emails newly categorized, or None once every batch has arrived
+        progress: asyncio.Queue[int | None] = asyncio.Queue()
+        semaphore = asyncio.Semaphore(settings.CATEGORIZE_CONCURRENCY)
+        tasks: list[asyncio.Task] = []
+
+        async def categorize(batch: list[dict[str, Any]], offset: int, chunk: list[int]) -> None:
+            try:
+                async with semaphore:
+                    chunk_labels, chunk_calls = await llm_scheduler.to_thread(
+                        BULK, self._categorize_chunk, batch, chunk
+                    )
+                llm_calls.append(chunk_calls)
+                labels.update(
+                    (offset + position, label) for position, label in chunk_labels.items()
+                )
+            finally:
+                progress.put_nowait(len(chunk))
+
+        async def receive() -> None:
+            try:
+                async for batch in email_batches:
+                    offset = len(emails)
+                    emails.extend(batch)
+                    batch_guesses, batch_asked = self._triage_categories(batch, user_id)
+                    guesses.extend(batch_guesses or [None] * len(batch))
+                    asked.extend(offset + position for position in batch_asked)
+                    tasks.extend(
+                        asyncio.create_task(categorize(batch, offset, chunk))
+                        for chunk in self._category_chunks(batch_asked)
+                    )
+                    progress.put_nowait(len(batch) - len(batch_asked))
+            finally:
+                progress.put_nowait(None)
+
+        receiver = asyncio.create_task(receive())
+        categorized = 0
+        receiving = True
+        try:
+            while receiving or categorized < len(emails):
+                done = await progress.get()
+                if done is None:
+                    receiving = False
+                    # Surface a failed listing or fetch
+                    await receiver
+                    continue
+                categorized += done
+                yield categorized, len(emails), None
+        finally:
+            for task in [receiver, *tasks]:
+                task.cancel()
+
+        categories = self._merge_categories(
+            emails, user_id, guesses, sorted(asked), labels, llm_calls=sum(llm_calls)
+        )
+        yield len(emails), len(emails), categories
+
+    def _triage_categories(
+        self, emails: list[dict[str, Any]], user_id: UUID | None
+    ) -> tuple[list[tuple[str, float]] | None, list[int]]:
+        """Return the local classifier's guesses and the positions of emails to ask Gemini about."""
+        guesses = category_classifier.predict(str(user_id), emails) if user_id else None
+        confident = [
+            position
+            for position, (_, confidence) in enumerate(guesses or [])
+            if confidence >= category_classifier.min_confidence
+        ]
+        uncertain = sorted(set(range(len(emails))).difference(confident))
+
+        # Audit confident labels alongside a call that is happening anyway, and
+        # now and then send an otherwise fully local batch
+        audit_rate = settings.CLASSIFIER_AUDIT_RATE
+        if uncertain:
+            audited = [position for position in confident if random.random() < audit_rate]
+        else:
+            audited = confident if random.random() < audit_rate else []
+        return guesses, sorted(uncertain + audited)
+
+    def _category_chunks(self, positions: list[int]) -> Iterator[list[int]]:
+        for start in range(0, len(positions), CATEGORIZE_CHUNK_SIZE):
+            yield positions[start : start + CATEGORIZE_CHUNK_SIZE]
+
+    def _categorize_chunk(
+        self, emails: list[dict[str, Any]], positions: list[int]
+    ) -> tuple[dict[int, str], int]:
+        """
+        Ask Gemini to categorize the emails at ``positions``, retrying what it missed.
+
+        A failed call is retried, and so are emails a successful call left
+        out, up to ``CATEGORIZE_ATTEMPTS`` calls with exponential backoff.
+
+        Returns:
+            Category by position, for every email Gemini answered, and the
+            number of Gemini calls made
+        """
+        labels: dict[int, str] = {}
+        pending = positions
+        calls = 0
+        for attempt in range(CATEGORIZE_ATTEMPTS):
+            if attempt:
+                time.sleep(CATEGORIZE_RETRY_DELAY * 2 ** (attempt - 1))
+                print(f"[AI] Retrying categorization of {len(pending)} emails")
+            answers = self._llm_categories([emails[position] for position in pending])
+            calls += 1
+            labels.update((pending[index], label) for index, label in answers.items())
+            pending = [position for position in pending if position not in labels]
+            if not pending:
+                break
+        return labels, calls
+
+    def _merge_categories(
+        self,
+        emails: list[dict[str, Any]],
+        user_id: UUID | None,
+        guesses: list[tuple[str, float] | None] | None,
+        asked: list[int],
+        labels: dict[int, str],
+        *,
+        llm_calls: int,
+    ) -> dict[str, list[dict]]:
+        """Train on Gemini's labels and group every email under its final category."""
+        if user_id:
+            user = str(user_id)
+            if labels:
+                category_classifier.learn(
+                    user,
+                    [emails[position] for position in labels],
+                    list(labels.values()),
+                    [guesses[position] for position in labels] if guesses else None,
+                )
+            category_classifier.record(
+                local_labels=len(emails) - len(asked),
+                llm_labels=len(labels),
+                llm_calls=llm_calls,
+            )
+
+        categories: dict[str, list[dict]] = {category: [] for category in CATEGORIES}
+        for position, email in enumerate(emails):
+            if position in labels:
+                label = labels[position]
+            elif guesses and guesses[position] is not None:
+                # Confident, or Gemini failed or was not asked: the best local guess
+                label = guesses[position][0]
+            else:
+                label = self._keyword_category(email)
+            categories[label].append(email)
+
+        return categories
 
-        # Build prompt with email details
+    def _llm_categories(self, emails: list[dict[str, Any]]) -> dict[int, str]:
+        """Ask Gemini to categorize emails; returns category by position, {} on failure."""
         email_data = []
-        for idx, email in enumerate(emails[:20]):  # Limit for token efficiency
+        for idx, email in enumerate(emails):
             email_data.append(
-                f"{idx}: From={email['from']}, Subject={email['subject']}, Snippet={email['snippet'][:80]}"
+                f"{idx}: From={email['from']}, Subject={email['subject']}, Snippet={truncate_tokens(email['snippet'], CATEGORIZE_SNIPPET_TOKENS)}"
             )
 
         emails_text = "\n".join(email_data)
@@ -375,10 +690,10 @@ Emails:
 {emails_text}
 
 Format: {{"0": "Work", "1": "Personal", "2": "Promotions", "3": "Urgent"}}"""
+        prompt_packer.measure("categorize", prompt)
 
         try:
-            response = self.model.generate_content(prompt)
-            import json
+            response = self._generate(prompt, BULK)
 
             # Extract JSON from response
             text = response.text.strip()
@@ -386,46 +701,36 @@ Format: {{"0": "Work", "1": "Personal", "2": "Promotions", "3": "Urgent"}}"""
             start = text.find("{")
             end = text.rfind("}") + 1
             if start >= 0 and end > start:
-                json_str = text[start:end]
-                categorization = json.loads(json_str)
-
-                # Organize emails by category
-                categories = {
-                    "Work": [],
-                    "Personal": [],
-                    "Promotions": [],
-                    "Urgent": [],
+                categorization = json.loads(text[start:end])
+                return {
+                    int(idx_str): category
+                    for idx_str, category in categorization.items()
+                    if int(idx_str) < len(emails) and category in CATEGORIES
                 }
-                for idx_str, category in categorization.items():
-                    idx = int(idx_str)
-                    if idx < len(emails) and category in categories:
-                        categories[category].append(emails[idx])
-
-                return categories
         except Exception as e:
             print(f"[AI] Categorization failed: {e}")
 
-        # Fallback: simple keyword-based categorization
-        return self._fallback_categorization(emails)
+        return {}
 
     def _fallback_categorization(self, emails: list[dict[str, Any]]) -> dict[str, list[dict]]:
         """Simple keyword-based categorization fallback."""
-        categories = {"Work": [], "Personal": [], "Promotions": [], "Urgent": []}
-
+        categories: dict[str, list[dict]] = {category: [] for category in CATEGORIES}
         for email in emails:
-            text = (email["subject"] + " " + email["snippet"]).lower()
-
-            if any(word in text for word in ["urgent", "asap", "important", "critical"]):
-                categories["Urgent"].append(email)
-            elif any(word in text for word in ["unsubscribe", "offer", "deal", "sale", "discount"]):
-                categories["Promotions"].append(email)
-            elif any(word in text for word in ["meeting", "project", "deadline", "report"]):
-                categories["Work"].append(email)
-            else:
-                categories["Personal"].append(email)
-
+            categories[self._keyword_category(email)].append(email)
         return categories
 
+    def _keyword_category(self, email: dict[str, Any]) -> str:
+        """Categorize one email by keywords in its subject and snippet."""
+        text = (email["subject"] + " " + email["snippet"]).lower()
+
+        if any(word in text for word in ["urgent", "asap", "important", "critical"]):
+            return "Urgent"
+        if any(word in text for word in ["unsubscribe", "offer", "deal", "sale", "discount"]):
+            return "Promotions"
+        if any(word in text for word in ["meeting", "project", "deadline", "report"]):
+            return "Work"
+        return "Personal"
+
     def format_categorized_emails(self, categories: dict[str, list[dict]]) -> str:
         """Format categorized emails into readable response."""
         response = "📊 **Email Categories:**\n\n"
@@ -447,29 +752,181 @@ Format: {{"0": "Work", "1": "Personal", "2": "Promotions", "3": "Urgent"}}"""
 
         return response
 
-    def generate_daily_digest(self, emails: list[dict[str, Any]]) -> str:
+    def generate_daily_digest(
+        self, emails: list[dict[str, Any]], group_summaries: list[str] | None = None
+    ) -> str:
         """
         Generate a daily digest summary of emails.
 
         Args:
             emails: List of today's emails
+            group_summaries: Summaries from summarize_digest_groups, for days
+                with too many emails to list in one prompt
 
         Returns:
             AI-generated digest with key insights and action items
         """
         if not emails:
-            return "📭 No emails today! Your inbox is clear."
+            return DIGEST_EMPTY
 
-        # Build concise email list
-        email_summaries = []
-        for idx, email in enumerate(emails[:15], 1):
-            email_summaries.append(
-                f"{idx}. {email['from']} - {email['subject']}\n   {email['snippet'][:100]}..."
-            )
+        try:
+            response = self._generate(self._digest_prompt(emails, group_summaries))
+            return f"{DIGEST_HEADER}{response.text.strip()}"
+        except Exception:
+            # Fallback
+            return f"{DIGEST_HEADER}{self._digest_fallback(emails)}"
 
-        emails_text = "\n\n".join(email_summaries)
+    def stream_daily_digest(
+        self, emails: list[dict[str, Any]], group_summaries: list[str] | None = None
+    ) -> Iterator[str]:
+        """Like generate_daily_digest, but yields the digest as Gemini generates it."""
+        if not emails:
+            yield DIGEST_EMPTY
+            return
+
+        yield DIGEST_HEADER
+        produced = False
+        try:
+            for text in self._stream(self._digest_prompt(emails, group_summaries)):
+                yield text if produced else text.lstrip()
+                produced = True
+        except Exception as e:
+            print(f"[AI] Streaming digest failed: {e}")
+            if not produced:
+                yield self._digest_fallback(emails)
+
+    async def summarize_digest_groups(
+        self, user_id: UUID, email_batches: AsyncIterable[list[dict[str, Any]]]
+    ) -> tuple[list[dict[str, Any]], list[str]]:
+        """
+        Summarize a day's emails group by group, for a digest of the whole day.
+
+        Emails are collected as their batches arrive (e.g. from
+        AsyncGmailService.iter_emails) and then grouped from the oldest end;
+        groups are summarized in parallel, at most ``DIGEST_CONCURRENCY`` at a
+        time, and stored like email summaries, keyed by the message IDs they
+        cover. Group boundaries depend only on the emails themselves (see
+        ``_digest_groups``), so asking again later in the day finds every group
+        but the newest one or two stored, and only new mail goes to Gemini.
+
+        Args:
+            user_id: Owner of the emails
+            email_batches: Today's emails, newest first as Gmail lists them
+
+        Returns:
+            Every email received, and one summary per group, oldest group
+            first; no summaries when the emails are few enough for the digest
+            prompt to list them directly
+        """
+        emails = [email async for batch in email_batches for email in batch]
+        if len(emails) <= DIGEST_GROUP_SIZE:
+            return emails, []
+
+        groups = self._digest_groups(emails)
+        keys = [self._digest_group_key(group) for group in groups]
+        summaries = await enrichment_store.get_summaries(
+            user_id, keys, self.model_name, DIGEST_GROUP_PROMPT_VERSION
+        )
+
+        missing = [position for position, key in enumerate(keys) if key not in summaries]
+        semaphore = asyncio.Semaphore(settings.DIGEST_CONCURRENCY)
+
+        async def summarize(group: list[dict[str, Any]]) -> str | None:
+            async with semaphore:
+                return await llm_scheduler.to_thread(BULK, self._summarize_digest_group, group)
+
+        results = await asyncio.gather(*(summarize(groups[position]) for position in missing))
+        generated = {
+            keys[position]: summary
+            for position, summary in zip(missing, results, strict=True)
+            if summary
+        }
+        await enrichment_store.put_summaries(
+            user_id, generated, self.model_name, DIGEST_GROUP_PROMPT_VERSION
+        )
+        summaries.update(generated)
+
+        return emails, [
+            summaries.get(key) or self._digest_group_fallback(group)
+            for key, group in zip(keys, groups, strict=True)
+        ]
+
+    def _digest_groups(self, emails: list[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+        """
+        Split emails, newest first, into groups, oldest first, cut where the message IDs say.
+
+        A group ends after an email whose ID hashes to a multiple of
+        ``DIGEST_GROUP_SIZE``, once it has a quarter of that many emails, and
+        always at twice that many. Since cuts follow the IDs rather than
+        positions, mail arriving at one end of the day or ageing out at the
+        other only changes the groups at that end. Cutting starts from the
+        oldest email, so new mail, which is what a repeat request sees most
+        of, only touches the newest group.
+        """
+        groups: list[list[dict[str, Any]]] = []
+        group: list[dict[str, Any]] = []
+        for email in reversed(emails):
+            group.append(email)
+            boundary = zlib.crc32(email["id"].encode()) % DIGEST_GROUP_SIZE == 0
+            if (boundary and len(group) >= DIGEST_GROUP_SIZE // 4) or (
+                len(group) >= 2 * DIGEST_GROUP_SIZE
+            ):
+                groups.append(group)
+                group = []
+        if group:
+            groups.append(group)
+        return groups
+
+    def _digest_group_key(self, group: list[dict[str, Any]]) -> str:
+        """Stand-in message ID under which a group's summary is stored."""
+        ids = ",".join(email["id"] for email in group)
+        return f"digest:{hashlib.sha256(ids.encode()).hexdigest()[:40]}"
+
+    def _digest_entry(self, email: dict[str, Any]) -> str:
+        snippet = truncate_tokens(email["snippet"], DIGEST_SNIPPET_TOKENS)
+        return f"{email['from']} - {email['subject']}\n   {snippet}"
+
+    def _summarize_digest_group(self, group: list[dict[str, Any]]) -> str | None:
+        """Summarize one group of emails; None if Gemini fails."""
+        prompt = DIGEST_GROUP_PROMPT.format(
+            count=len(group),
+            emails="\n\n".join(
+                f"{idx}. {self._digest_entry(email)}" for idx, email in enumerate(group, 1)
+            ),
+        )
+        prompt_packer.measure("digest_group", prompt)
+        try:
+            return self._generate(prompt, BULK).text.strip() or None
+        except Exception as e:
+            print(f"[AI] Digest group summary failed: {e}")
+            return None
+
+    def _digest_group_fallback(self, group: list[dict[str, Any]]) -> str:
+        lines = [f"- {email['from']}: {email['subject']}" for email in group[:5]]
+        if len(group) > 5:
+            lines.append(f"- ...and {len(group) - 5} more")
+        return "\n".join(lines)
+
+    def _digest_fallback(self, emails: list[dict[str, Any]]) -> str:
+        return f"You received {len(emails)} emails today. Check your inbox for important messages."
+
+    def _digest_prompt(
+        self, emails: list[dict[str, Any]], group_summaries: list[str] | None = None
+    ) -> str:
+        if group_summaries:
+            groups_text = "\n\n".join(
+                f"Group {idx}:\n{summary}" for idx, summary in enumerate(group_summaries, 1)
+            )
+            emails_text = f"Summaries of them in groups, oldest first:\n\n{groups_text}"
+        else:
+            # Build concise email list
+            emails_text = "\n\n".join(
+                f"{idx}. {self._digest_entry(email)}" for idx, email in enumerate(emails, 1)
+            )
 
-        prompt = f"""You are an email assistant. Create a daily digest for these {len(emails)} emails:
+        return prompt_packer.measure(
+            "digest",
+            f"""You are an email assistant. Create a daily digest for these {len(emails)} emails:
 
 {emails_text}
 
@@ -479,11 +936,5 @@ Provide:
 3. Suggested actions or follow-ups
 4. Any urgent items
 
-Keep it conversational and under 200 words."""
-
-        try:
-            response = self.model.generate_content(prompt)
-            return f"📅 **Daily Email Digest**\n\n{response.text.strip()}"
-        except Exception:
-            # Fallback
-            return f"📅 **Daily Email Digest**\n\nYou received {len(emails)} emails today. Check your inbox for important messages."
+Keep it conversational and under 200 words.""",
+        )
@@ -0,0 +1,218 @@
+"""Per-user naive Bayes email classifier, trained on Gemini's categorizations."""
+
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from itertools import pairwise
+from typing import Any
+
+import numpy as np
+
+from app.core.config import settings
+
+CATEGORIES = ("Work", "Personal", "Promotions", "Urgent")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Snippet characters used as features; the rest of the body adds noise, not signal
+FEATURE_SNIPPET_CHARS = 200
+
+# Message IDs remembered per user so re-categorized emails are not learned twice
+MAX_LEARNED_IDS = 10_000
+
+
+def _terms(email: dict[str, Any]) -> list[str]:
+    """
+    Features of an email: sender words, subject words and bigrams, and snippet words.
+
+    Sender words are prefixed so "amazon" in the address and "amazon" in a
+    subject are different features.
+    """
+    sender = [f"from:{word}" for word in _TOKEN.findall(email.get("from", "").lower())]
+    subject = _TOKEN.findall(email.get("subject", "").lower())
+    snippet = _TOKEN.findall(email.get("snippet", "")[:FEATURE_SNIPPET_CHARS].lower())
+    bigrams = [f"{first} {second}" for first, second in pairwise(subject)]
+    return sender + subject + bigrams + snippet
+
+
+def featurize(emails: list[dict[str, Any]], dim: int) -> np.ndarray:
+    """Hash every email's terms into a row of counts over ``dim`` buckets."""
+    rows: list[int] = []
+    buckets: list[int] = []
+    for row, email in enumerate(emails):
+        for term in _terms(email):
+            rows.append(row)
+            buckets.append(zlib.crc32(term.encode()) % dim)
+
+    counts = np.zeros((len(emails), dim), dtype=np.float32)
+    np.add.at(counts, (rows, buckets), 1.0)
+    return counts
+
+
+class _UserModel:
+    """Term counts per category for one user."""
+
+    def __init__(self, dim: int) -> None:
+        self.term_counts = np.zeros((len(CATEGORIES), dim), dtype=np.float32)
+        self.examples = np.zeros(len(CATEGORIES), dtype=np.int64)
+        self.learned: OrderedDict[str, None] = OrderedDict()
+
+
+class CategoryClassifier:
+    """
+    Multinomial naive Bayes over hashed email features, one model per user.
+
+    Every categorization Gemini makes is fed back through ``learn``, so each
+    user's model is trained on their own mail. Once a model has seen
+    ``min_examples`` emails, ``predict`` labels a whole batch with one matrix
+    product; the caller keeps predictions at or above ``min_confidence`` and
+    sends only the rest to Gemini. Models live in memory, least recently
+    active users first out beyond ``max_users``.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        min_examples: int,
+        min_confidence: float,
+        max_users: int,
+        smoothing: float = 0.1,
+    ) -> None:
+        """Initialize without any trained models."""
+        self.dim = dim
+        self.min_examples = min_examples
+        self.min_confidence = min_confidence
+        self.max_users = max_users
+        self.smoothing = smoothing
+        self._models: OrderedDict[str, _UserModel] = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_labels = 0
+        self.llm_labels = 0
+        self.llm_calls = 0
+        self.llm_calls_saved = 0
+        self.compared = 0
+        self.agreed = 0
+        self.confident_compared = 0
+        self.confident_agreed = 0
+
+    def predict(self, user_id: str, emails: list[dict[str, Any]]) -> list[tuple[str, float]] | None:
+        """
+        Guess a category for every email.
+
+        Returns:
+            (category, posterior probability) per email, or None while the
+            user's model has seen fewer than ``min_examples`` emails
+        """
+        with self._lock:
+            model = self._models.get(user_id)
+            if model is None or model.examples.sum() < self.min_examples or not emails:
+                return None
+            self._models.move_to_end(user_id)
+            term_counts = model.term_counts.copy()
+            examples = model.examples.copy()
+
+        smoothed = term_counts + self.smoothing
+        log_likelihood = np.log(smoothed / smoothed.sum(axis=1, keepdims=True))
+        log_prior = np.log((examples + 1) / (examples.sum() + len(CATEGORIES)))
+
+        scores = featurize(emails, self.dim) @ log_likelihood.T + log_prior
+        scores -= scores.max(axis=1, keepdims=True)
+        posteriors = np.exp(scores)
+        posteriors /= posteriors.sum(axis=1, keepdims=True)
+
+        best = posteriors.argmax(axis=1)
+        return [
+            (CATEGORIES[index], float(posteriors[row, index])) for row, index in enumerate(best)
+        ]
+
+    def learn(
+        self,
+        user_id: str,
+        emails: list[dict[str, Any]],
+        labels: list[str],
+        guesses: list[tuple[str, float] | None] | None = None,
+    ) -> None:
+        """
+        Train on categories Gemini assigned, and score the model's guesses against them.
+
+        Args:
+            user_id: Whose model to train
+            emails: Emails Gemini categorized
+            labels: Gemini's category for each email
+            guesses: What ``predict`` said about the same emails, if it was asked,
+                with None for emails it was not asked about
+        """
+        with self._lock:
+            model = self._models.get(user_id)
+            learned = model.learned if model is not None else {}
+            pairs = [
+                (email, label, guesses[position] if guesses else None)
+                for position, (email, label) in enumerate(zip(emails, labels, strict=True))
+                if label in CATEGORIES and email["id"] not in learned
+            ]
+        if not pairs:
+            return
+
+        counts = featurize([email for email, _, _ in pairs], self.dim)
+        label_indexes = np.array([CATEGORIES.index(label) for _, label, _ in pairs])
+
+        with self._lock:
+            model = self._models.get(user_id)
+            if model is None:
+                model = self._models[user_id] = _UserModel(self.dim)
+                while len(self._models) > self.max_users:
+                    self._models.popitem(last=False)
+            self._models.move_to_end(user_id)
+
+            np.add.at(model.term_counts, label_indexes, counts)
+            np.add.at(model.examples, label_indexes, 1)
+            model.learned.update(dict.fromkeys(email["id"] for email, _, _ in pairs))
+            while len(model.learned) > MAX_LEARNED_IDS:
+                model.learned.popitem(last=False)
+
+            for _, label, guess in pairs:
+                if guess is None:
+                    continue
+                self.compared += 1
+                self.agreed += guess[0] == label
+                if guess[1] >= self.min_confidence:
+                    self.confident_compared += 1
+                    self.confident_agreed += guess[0] == label
+
+    def record(self, local_labels: int, llm_labels: int, llm_calls: int) -> None:
+        """Count one categorization request by how its emails were labelled."""
+        with self._lock:
+            self.local_labels += local_labels
+            self.llm_labels += llm_labels
+            self.llm_calls += llm_calls
+            if not llm_calls:
+                self.llm_calls_saved += 1
+
+    def stats(self) -> dict[str, Any]:
+        """Label sources, LLM calls avoided and local/LLM agreement."""
+        with self._lock:
+            return {
+                "users": len(self._models),
+                "local_labels": self.local_labels,
+                "llm_labels": self.llm_labels,
+                "llm_calls": self.llm_calls,
+                "llm_calls_saved": self.llm_calls_saved,
+                "agreement": round(self.agreed / self.compared, 4) if self.compared else None,
+                "confident_agreement": (
+                    round(self.confident_agreed / self.confident_compared, 4)
+                    if self.confident_compared
+                    else None
+                ),
+                "compared": self.compared,
+                "confident_compared": self.confident_compared,
+            }
+
+
+# Singleton instance
+category_classifier = CategoryClassifier(
+    dim=settings.CLASSIFIER_DIM,
+    min_examples=settings.CLASSIFIER_MIN_EXAMPLES,
+    min_confidence=settings.CLASSIFIER_MIN_CONFIDENCE,
+    max_users=settings.CLASSIFIER_MAX_USERS,
+)
@@ -0,0 +1,113 @@
+"""Persistent store of AI summaries, so an email is only summarized once."""
+
+import logging
+import threading
+from collections import OrderedDict
+from uuid import UUID
+
+from app.core.config import settings
+from app.core.database import db
+
+logger = logging.getLogger(__name__)
+
+# (user ID, message ID, model, prompt version)
+EnrichmentKey = tuple[str, str, str, str]
+
+
+class EnrichmentStore:
+    """
+    Read-through cache of email summaries backed by the ``email_enrichments`` table.
+
+    Lookups check an in-process LRU of ``max_entries`` summaries first and
+    fetch the rest from the database in one query. Entries are keyed by model
+    name and prompt version, so a new model or an edited prompt template
+    misses and gets summarized afresh. Database errors are logged and treated
+    as misses; the store only ever saves work, it never blocks a response.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        """Initialize an empty in-process cache."""
+        self.max_entries = max_entries
+        self._entries: OrderedDict[EnrichmentKey, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.db_errors = 0
+
+    async def get_summaries(
+        self, user_id: UUID, message_ids: list[str], model: str, prompt_version: str
+    ) -> dict[str, str]:
+        """Return the stored summaries for ``message_ids``; missing ones are omitted."""
+        user = str(user_id)
+        summaries: dict[str, str] = {}
+        missing: list[str] = []
+
+        with self._lock:
+            for message_id in message_ids:
+                key = (user, message_id, model, prompt_version)
+                summary = self._entries.get(key)
+                if summary is None:
+                    missing.append(message_id)
+                else:
+                    self._entries.move_to_end(key)
+                    summaries[message_id] = summary
+            self.hits += len(summaries)
+
+        if not missing:
+            return summaries
+
+        try:
+            stored = await db.get_email_summaries(user_id, missing, model, prompt_version)
+        except Exception as e:
+            self.db_errors += 1
+            logger.warning("Could not read stored summaries: %s", e)
+            stored = {}
+
+        self._remember(user, stored, model, prompt_version)
+        self.db_hits += len(stored)
+        self.misses += len(missing) - len(stored)
+        summaries.update(stored)
+        return summaries
+
+    async def put_summaries(
+        self, user_id: UUID, summaries: dict[str, str], model: str, prompt_version: str
+    ) -> None:
+        """Store freshly generated summaries in memory and in the database."""
+        if not summaries:
+            return
+
+        self._remember(str(user_id), summaries, model, prompt_version)
+        try:
+            await db.save_email_summaries(user_id, summaries, model, prompt_version)
+            self.writes += len(summaries)
+        except Exception as e:
+            self.db_errors += 1
+            logger.warning("Could not store summaries: %s", e)
+
+    def _remember(
+        self, user: str, summaries: dict[str, str], model: str, prompt_version: str
+    ) -> None:
+        with self._lock:
+            for message_id, summary in summaries.items():
+                key = (user, message_id, model, prompt_version)
+                self._entries[key] = summary
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        """Lookup counters; ``misses`` are summaries that had to be generated."""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "db_errors": self.db_errors,
+        }
+
+
+# Singleton instance
+enrichment_store = EnrichmentStore(max_entries=settings.ENRICHMENT_CACHE_MAX_ENTRIES)
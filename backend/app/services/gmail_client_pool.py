@@ -0,0 +1,150 @@
+"""Process-wide pool of Gmail API clients."""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import httplib2
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import Resource, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from app.core.config import settings
+from app.models.schemas import UserInDB
+
+_thread_state = threading.local()
+
+
+def _thread_connection() -> httplib2.Http:
+    """
+    Return this thread's keep-alive connection pool.
+
+    httplib2 is not thread-safe, so each worker thread owns one ``Http``.
+    It is shared by every user served on that thread; credentials are layered
+    on top per user, which keeps the TCP/TLS connection to googleapis.com warm
+    across requests.
+    """
+    connection = getattr(_thread_state, "connection", None)
+    if connection is None:
+        connection = _thread_state.connection = httplib2.Http(timeout=settings.GMAIL_HTTP_TIMEOUT)
+    return connection
+
+
+class GmailClient:
+    """A user's credentials plus per-thread authorized transports, reused across requests."""
+
+    def __init__(self, credentials: Credentials, service: Resource) -> None:
+        """Wrap credentials for one user around the shared service object."""
+        self.credentials = credentials
+        self.service = service
+        self.last_used = time.monotonic()
+        self._local = threading.local()
+
+    def http(self) -> AuthorizedHttp:
+        """Authorized transport for the calling thread."""
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = AuthorizedHttp(self.credentials, http=_thread_connection())
+        return http
+
+
+class GmailClientPool:
+    """
+    Reuse Gmail clients across requests instead of rebuilding them each time.
+
+    The discovery document is parsed once per process from the static copy
+    shipped with google-api-python-client. Every user shares the resulting
+    service object, because requests are always executed with the caller's
+    own authorized transport. Per-user clients are dropped once idle for
+    ``idle_seconds`` or when more than ``max_clients`` are held.
+    """
+
+    def __init__(self, idle_seconds: float, max_clients: int) -> None:
+        """Initialize an empty pool; the service object is built on first use."""
+        self.idle_seconds = idle_seconds
+        self.max_clients = max_clients
+        self._clients: OrderedDict[str, GmailClient] = OrderedDict()
+        self._service: Resource | None = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.build_seconds = 0.0
+
+    @property
+    def service(self) -> Resource:
+        """Gmail service object shared by all users."""
+        if self._service is None:
+            started = time.perf_counter()
+            document = json.loads(get_static_doc("gmail", "v1"))
+            # Requests are always executed with an explicit per-user transport;
+            # this one only satisfies the client library's constructor
+            self._service = build_from_document(document, http=httplib2.Http())
+            self.build_seconds += time.perf_counter() - started
+        return self._service
+
+    def acquire(self, user: UserInDB, credentials: Credentials) -> GmailClient:
+        """
+        Return the pooled client for ``user``, creating it if needed.
+
+        Token refreshes update ``credentials`` in place, so a pooled client is
+        only replaced when it was built around a different credentials object
+        (e.g. after the user re-consented and got a new refresh token).
+        """
+        user_id = str(user.id)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+            client = self._clients.get(user_id)
+            if client is not None and client.credentials is credentials:
+                client.last_used = now
+                self._clients.move_to_end(user_id)
+                self.hits += 1
+                return client
+            service = self.service
+
+        started = time.perf_counter()
+        client = GmailClient(credentials, service)
+
+        with self._lock:
+            self.misses += 1
+            self.build_seconds += time.perf_counter() - started
+            self._clients[user_id] = client
+            self._clients.move_to_end(user_id)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+        return client
+
+    def discard(self, user_id: str) -> None:
+        """Forget a user's client, e.g. after their tokens were revoked."""
+        with self._lock:
+            self._clients.pop(user_id, None)
+
+    def _evict_idle(self, now: float) -> None:
+        while self._clients:
+            user_id, client = next(iter(self._clients.items()))
+            if now - client.last_used < self.idle_seconds:
+                break
+            del self._clients[user_id]
+            self.evictions += 1
+
+    def stats(self) -> dict[str, float | int]:
+        """Reuse counters and total time spent constructing clients."""
+        return {
+            "clients": len(self._clients),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "build_seconds": round(self.build_seconds, 4),
+        }
+
+
+# Singleton instance
+gmail_client_pool = GmailClientPool(
+    idle_seconds=settings.GMAIL_CLIENT_IDLE_SECONDS,
+    max_clients=settings.GMAIL_CLIENT_POOL_SIZE,
+)
@@ -2,171 +2,353 @@
 
 import asyncio
 import base64
+import logging
+import threading
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Iterator
 from email.mime.text import MIMEText
-from typing import Any
+from typing import Any, TypeVar
 
-from bs4 import BeautifulSoup
-from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.errors import HttpError
 
 from app.core.config import settings
-from app.core.database import db
-from app.models.schemas import UserInDB, UserUpdate
+from app.models.schemas import UserInDB
+from app.services.gmail_client_pool import gmail_client_pool
+from app.services.mailbox_sync import mailbox_sync
+from app.services.message_cache import message_cache
+from app.services.message_parser import parse_message
+from app.services.parse_pool import parse_pool
+from app.services.search_index import search_index
+from app.services.single_flight import single_flight
+from app.services.token_manager import token_manager
 
+logger = logging.getLogger(__name__)
 
-class GmailService:
-    """Gmail API service with automatic token refresh."""
+T = TypeVar("T")
 
-    def __init__(self, user: UserInDB) -> None:
-        """Initialize Gmail service for a specific user."""
-        self.user = user
-        self.credentials = self._get_credentials()
-        self.service = build("gmail", "v1", credentials=self.credentials)
-
-    def _get_credentials(self) -> Credentials:
-        """Get and refresh Google credentials if needed."""
-        credentials = Credentials(
-            token=self.user.access_token,
-            refresh_token=self.user.refresh_token,
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=settings.GOOGLE_CLIENT_ID,
-            client_secret=settings.GOOGLE_CLIENT_SECRET,
-            scopes=[
-                "openid",
-                "https://www.googleapis.com/auth/userinfo.email",
-                "https://www.googleapis.com/auth/userinfo.profile",
-                "https://www.googleapis.com/auth/gmail.readonly",
-                "https://www.googleapis.com/auth/gmail.send",
-                "https://www.googleapis.com/auth/gmail.modify",
-            ],
-        )
+# The Gmail batch endpoint rejects more than 100 sub-requests per call
+GMAIL_BATCH_LIMIT = 100
 
-        # Check if token needs refresh
-        if credentials.expired or not credentials.valid:
-            credentials.refresh(Request())
-
-            # Update user tokens in database
-            task = asyncio.create_task(
-                db.update_user(
-                    self.user.id,
-                    UserUpdate(
-                        access_token=credentials.token,
-                        token_expiry=credentials.expiry if credentials.expiry else None,
-                    ),
-                )
-            )
-            # Store task reference to avoid warning
-            self._update_task = task
+# messages.list returns at most this many IDs per page
+GMAIL_LIST_LIMIT = 500
+
+# Pseudo-format for refreshing the labels of an already cached message
+LABELS_ONLY = "labels"
 
-        return credentials
+# Projections for fetch_emails: whole messages, or headers and snippet only
+FULL = "full"
+METADATA = "metadata"
+
+# What a METADATA fetch asks Gmail for; bodies are never downloaded or parsed
+METADATA_HEADERS = ["From", "To", "Subject", "Date"]
+METADATA_FIELDS = "id,threadId,labelIds,snippet,payload/headers"
+
+# Sub-request statuses worth a second attempt (rate limits and transient errors)
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class GmailService:
+    """Gmail API service for one user, backed by a pooled client."""
 
-    def fetch_emails(self, max_results: int = 10, query: str = "") -> list[dict[str, Any]]:
+    def __init__(self, user: UserInDB, credentials: Credentials | None = None) -> None:
+        """
+        Initialize Gmail service for a specific user.
+
+        Pass credentials from ``token_manager.get_credentials`` to be sure they
+        are valid; otherwise the user's shared credentials are used as-is and
+        the transport refreshes them if Gmail rejects the token.
+        """
+        self.user = user
+        self.credentials = credentials or token_manager.credentials_for(user)
+        self.client = gmail_client_pool.acquire(user, self.credentials)
+        self.service = self.client.service
+        self.round_trips = 0
+        self.last_fetch_stats: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _http(self) -> AuthorizedHttp:
+        """Return this thread's authorized transport from the pooled client."""
+        return self.client.http()
+
+    def execute(self, request: Any) -> Any:
+        """Execute a single or batch API request, counting the HTTP round trip."""
+        with self._lock:
+            self.round_trips += 1
+        return request.execute(http=self._http())
+
+    def fetch_emails(
+        self,
+        max_results: int = 10,
+        query: str = "",
+        batch: bool = True,
+        projection: str = FULL,
+    ) -> list[dict[str, Any]]:
         """
         Fetch emails from Gmail.
 
         Args:
             max_results: Maximum number of emails to fetch
             query: Gmail query string (e.g., 'is:unread', 'from:example@gmail.com')
+            batch: Retrieve message details through the batch endpoint instead of
+                one request per message
+            projection: ``FULL`` for complete messages, or ``METADATA`` for
+                headers, snippet and labels only (``body`` is then empty)
 
         Returns:
             List of email dictionaries with sanitized content
         """
-        try:
-            # Fetch message list
-            results = (
-                self.service.users()
-                .messages()
-                .list(userId="me", q=query, maxResults=max_results)
-                .execute()
-            )
+        round_trips_before = self.round_trips
 
-            messages = results.get("messages", [])
+        message_ids = self.list_message_ids(max_results=max_results, query=query)
+        if not message_ids:
+            return []
 
-            if not messages:
-                return []
+        emails = self.get_messages(
+            message_ids,
+            batch=batch,
+            projection=projection,
+            refresh_labels=not mailbox_sync.supports(query),
+        )
 
-            emails = []
-            for message in messages:
-                # Fetch full message details
-                msg = (
-                    self.service.users()
-                    .messages()
-                    .get(userId="me", id=message["id"], format="full")
-                    .execute()
-                )
+        self.last_fetch_stats = {
+            "requested": len(message_ids),
+            "fetched": len(emails),
+            "failed": len(message_ids) - len(emails),
+            "round_trips": self.round_trips - round_trips_before,
+        }
+        logger.info("Fetched emails: %s", self.last_fetch_stats)
 
-                email_data = self._parse_message(msg)
-                emails.append(email_data)
+        return emails
 
-            return emails
+    def list_message_ids(self, max_results: int = 10, query: str = "") -> list[str]:
+        """
+        List the IDs of messages matching a Gmail query, newest first.
 
+        Queries the mailbox sync store understands are answered from it, which
+        costs at most a history delta instead of a full listing.
+        """
+        try:
+            if mailbox_sync.supports(query):
+                return mailbox_sync.list_message_ids(self, max_results=max_results, query=query)
+            message_ids, _ = self.collect_message_ids(max_results=max_results, query=query)
         except HttpError as error:
             raise ValueError(f"Gmail API error: {error!s}") from error
 
-    def _parse_message(self, message: dict) -> dict[str, Any]:
-        """Parse Gmail message and extract relevant information."""
-        headers = message["payload"]["headers"]
-        header_dict = {header["name"]: header["value"] for header in headers}
-
-        # Extract body
-        body = self._get_message_body(message["payload"])
-
-        # Sanitize HTML content
-        sanitized_body = self._sanitize_html(body)
-
-        return {
-            "id": message["id"],
-            "thread_id": message["threadId"],
-            "subject": header_dict.get("Subject", "(No Subject)"),
-            "from": header_dict.get("From", "Unknown"),
-            "to": header_dict.get("To", ""),
-            "date": header_dict.get("Date", ""),
-            "snippet": message.get("snippet", ""),
-            "body": sanitized_body,
-            "labels": message.get("labelIds", []),
-        }
+        return message_ids
 
-    def _get_message_body(self, payload: dict) -> str:
-        """Extract body from email payload."""
-        body = ""
+    def collect_message_ids(self, max_results: int, query: str = "") -> tuple[list[str], bool]:
+        """
+        List up to ``max_results`` message IDs, following pages past the per-call limit.
 
-        if "parts" in payload:
-            for part in payload["parts"]:
-                if part["mimeType"] == "text/plain" and "data" in part["body"]:
-                    body = base64.urlsafe_b64decode(part["body"]["data"]).decode("utf-8")
-                    break
-                if part["mimeType"] == "text/html" and "data" in part["body"]:
-                    body = base64.urlsafe_b64decode(part["body"]["data"]).decode("utf-8")
-        elif "body" in payload and "data" in payload["body"]:
-            body = base64.urlsafe_b64decode(payload["body"]["data"]).decode("utf-8")
+        Returns:
+            The IDs, newest first, and whether they are every match for ``query``
+        """
+        message_ids: list[str] = []
+        exhausted = True
+        for results in self.list_pages(max_results, query):
+            message_ids.extend(message["id"] for message in results.get("messages", []))
+            exhausted = "nextPageToken" not in results
+        return message_ids, exhausted
+
+    def iter_message_ids(self, max_results: int = 10, query: str = "") -> Iterator[list[str]]:
+        """
+        Yield the IDs of messages matching a Gmail query page by page, newest first.
+
+        Like list_message_ids, but each page is handed over as soon as Gmail
+        returns it, so callers can start on it while the next one is listed.
+        """
+        try:
+            if mailbox_sync.supports(query):
+                yield from mailbox_sync.iter_message_ids(
+                    self, max_results=max_results, query=query, page_size=GMAIL_LIST_LIMIT
+                )
+                return
+            for results in self.list_pages(max_results, query):
+                yield [message["id"] for message in results.get("messages", [])]
+        except HttpError as error:
+            raise ValueError(f"Gmail API error: {error!s}") from error
+
+    def list_pages(self, max_results: int, query: str) -> Iterator[dict[str, Any]]:
+        """Run messages.list, following nextPageToken until ``max_results`` IDs are listed."""
+        listed = 0
+        page_token = None
+        while True:
+            results = self.list_messages_page(
+                max_results=min(max_results - listed, GMAIL_LIST_LIMIT),
+                query=query,
+                page_token=page_token,
+            )
+            yield results
+            listed += len(results.get("messages", []))
+            page_token = results.get("nextPageToken")
+            if page_token is None or listed >= max_results:
+                return
+
+    def list_messages_page(
+        self, max_results: int = 10, query: str = "", page_token: str | None = None
+    ) -> dict[str, Any]:
+        """Run one raw messages.list call and return its response."""
+        return self.execute(
+            self.service.users()
+            .messages()
+            .list(userId="me", q=query, maxResults=max_results, pageToken=page_token)
+        )
+
+    def get_messages(
+        self,
+        message_ids: list[str],
+        batch: bool = True,
+        projection: str = FULL,
+        refresh_labels: bool = True,
+    ) -> list[dict[str, Any]]:
+        """
+        Fetch and parse messages, preserving the order of ``message_ids``.
+
+        Messages already in the cache only have their labels refreshed, through a
+        metadata-only request that rides along in the same batch. Only ``FULL``
+        messages are cached; a cached one also serves ``METADATA`` requests.
+        Pass ``refresh_labels=False`` for IDs from a listing mailbox_sync just
+        synced: its history replay already brought the cached labels up to date,
+        so cached messages then cost no request at all.
+        """
+        user_id = str(self.user.id)
+        cached = message_cache.get_many(user_id, message_ids)
+        formats = dict.fromkeys(cached, LABELS_ONLY)
+        requested = [m for m in message_ids if refresh_labels or m not in cached]
 
-        return body
+        try:
+            if not requested:
+                raw_messages = []
+            elif batch:
+                raw_messages = self._get_messages_batch(requested, formats, projection)
+            else:
+                raw_messages = [
+                    self.execute(self._get_request(message_id, formats.get(message_id, projection)))
+                    for message_id in requested
+                ]
+        except HttpError as error:
+            raise ValueError(f"Gmail API error: {error!s}") from error
 
-    def _sanitize_html(self, html_content: str) -> str:
+        fetched = {msg["id"]: msg for msg in raw_messages}
+        parsed = iter(parse_pool.parse_many([m for m in raw_messages if m["id"] not in cached]))
+
+        emails = []
+        for message_id in message_ids:
+            email = cached.get(message_id)
+            msg = fetched.get(message_id)
+            if msg is None:
+                # Skipped by the batch, unless it was cached and not requested
+                if email is None or refresh_labels:
+                    continue
+            elif email is not None:
+                email["labels"] = msg.get("labelIds", [])
+                message_cache.update_labels(user_id, message_id, email["labels"])
+            else:
+                email = next(parsed)
+                if projection == FULL:
+                    message_cache.put(user_id, email)
+            emails.append(email)
+
+        if projection == FULL:
+            search_index.add(user_id, emails)
+        return emails
+
+    def get_email(self, message_id: str) -> dict[str, Any] | None:
         """
-        Strip HTML tags and return plain text.
+        Fetch a single message by ID, or None if it no longer exists.
 
-        This saves tokens when sending to AI.
+        Costs one messages.get, or nothing when the message is already cached
+        (labels are then as of the last listing that included it).
         """
-        if not html_content:
-            return ""
+        cached = message_cache.get_many(str(self.user.id), [message_id])
+        if message_id in cached:
+            return cached[message_id]
 
-        # Parse HTML
-        soup = BeautifulSoup(html_content, "lxml")
+        try:
+            msg = self.execute(self._get_request(message_id))
+        except HttpError as error:
+            if error.resp.status == 404:
+                return None
+            raise ValueError(f"Gmail API error: {error!s}") from error
 
-        # Remove script and style tags
-        for script in soup(["script", "style"]):
-            script.decompose()
+        email = parse_message(msg)
+        message_cache.put(str(self.user.id), email)
+        search_index.add(str(self.user.id), [email])
+        return email
 
-        # Get text
-        text = soup.get_text()
+    def _get_request(self, message_id: str, message_format: str = FULL) -> Any:
+        """
+        Build a messages.get request.
 
-        # Clean up whitespace
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        return "\n".join(chunk for chunk in chunks if chunk)
+        ``LABELS_ONLY`` asks for just the label IDs, ``METADATA`` for the
+        headers in METADATA_HEADERS plus snippet and labels.
+        """
+        messages = self.service.users().messages()
+        if message_format == LABELS_ONLY:
+            return messages.get(userId="me", id=message_id, format="minimal", fields="id,labelIds")
+        if message_format == METADATA:
+            return messages.get(
+                userId="me",
+                id=message_id,
+                format="metadata",
+                metadataHeaders=METADATA_HEADERS,
+                fields=METADATA_FIELDS,
+            )
+        return messages.get(userId="me", id=message_id, format=message_format)
+
+    def _get_messages_batch(
+        self,
+        message_ids: list[str],
+        formats: dict[str, str] | None = None,
+        default_format: str = FULL,
+        batch_size: int = GMAIL_BATCH_LIMIT,
+    ) -> list[dict[str, Any]]:
+        """
+        Fetch messages through the Gmail batch endpoint.
+
+        Messages are requested in ``default_format`` unless ``formats`` says
+        otherwise. Sub-requests that fail with a retryable status get one more
+        attempt in a follow-up batch; anything still failing is skipped so one
+        bad message does not sink the whole listing. Results keep the order of
+        ``message_ids``.
+        """
+        formats = formats or {}
+        batch_size = max(1, min(batch_size, GMAIL_BATCH_LIMIT))
+        fetched: dict[str, dict[str, Any]] = {}
+        retry: list[str] = []
+
+        def collect(
+            request_id: str, response: dict[str, Any] | None, exception: HttpError | None
+        ) -> None:
+            if exception is None:
+                fetched[request_id] = response
+            elif exception.resp.status in RETRYABLE_STATUSES:
+                retry.append(request_id)
+            else:
+                logger.warning("Skipping message %s: %s", request_id, exception)
+
+        pending = list(message_ids)
+        for attempt in range(2):
+            for start in range(0, len(pending), batch_size):
+                batch = self.service.new_batch_http_request(callback=collect)
+                for message_id in pending[start : start + batch_size]:
+                    batch.add(
+                        self._get_request(message_id, formats.get(message_id, default_format)),
+                        request_id=message_id,
+                    )
+                self.execute(batch)
+
+            if not retry:
+                break
+            if attempt == 0:
+                pending = retry.copy()
+                retry.clear()
+            else:
+                logger.warning("Giving up on %d message(s) after retry: %s", len(retry), retry)
+
+        return [fetched[message_id] for message_id in message_ids if message_id in fetched]
 
     def send_email(
         self, to: str, subject: str, body: str, thread_id: str | None = None
@@ -195,7 +377,8 @@ class GmailService:
             if thread_id:
                 send_params["body"]["threadId"] = thread_id
 
-            sent_message = self.service.users().messages().send(**send_params).execute()
+            sent_message = self.execute(self.service.users().messages().send(**send_params))
+            mailbox_sync.mark_stale(str(self.user.id))
 
             return {
                 "id": sent_message["id"],
@@ -217,7 +400,10 @@ class GmailService:
             True if successful
         """
         try:
-            self.service.users().messages().trash(userId="me", id=message_id).execute()
+            self.execute(self.service.users().messages().trash(userId="me", id=message_id))
+            message_cache.invalidate(str(self.user.id), message_id)
+            search_index.remove(str(self.user.id), message_id)
+            mailbox_sync.mark_stale(str(self.user.id))
             return True
 
         except HttpError as error:
@@ -234,12 +420,165 @@ class GmailService:
             True if successful
         """
         try:
-            self.service.users().messages().modify(
-                userId="me",
-                id=message_id,
-                body={"removeLabelIds": ["UNREAD"]},
-            ).execute()
+            self.execute(
+                self.service.users()
+                .messages()
+                .modify(userId="me", id=message_id, body={"removeLabelIds": ["UNREAD"]})
+            )
+            mailbox_sync.mark_stale(str(self.user.id))
             return True
 
         except HttpError as error:
             raise ValueError(f"Failed to mark email as read: {error!s}") from error
+
+
+class AsyncGmailService:
+    """
+    Async facade over GmailService for use inside request handlers.
+
+    The Google API client is blocking, so every call runs on a worker thread
+    while the event loop keeps serving other users. Message details are
+    fetched in batch-sized chunks, at most ``max_concurrency`` at a time.
+    """
+
+    def __init__(
+        self,
+        user: UserInDB,
+        credentials: Credentials | None = None,
+        max_concurrency: int | None = None,
+    ) -> None:
+        """Initialize the underlying Gmail service for a specific user."""
+        self.gmail = GmailService(user, credentials)
+        self._semaphore = asyncio.Semaphore(max_concurrency or settings.GMAIL_MAX_CONCURRENCY)
+
+    @classmethod
+    async def for_user(
+        cls, user: UserInDB, max_concurrency: int | None = None
+    ) -> "AsyncGmailService":
+        """Create a service with credentials that are valid right now."""
+        credentials = await token_manager.get_credentials(user)
+        return cls(user, credentials, max_concurrency)
+
+    async def _run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking Gmail call on a worker thread under the concurrency limit."""
+        async with self._semaphore:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def fetch_emails(
+        self, max_results: int = 10, query: str = "", projection: str = FULL
+    ) -> list[dict[str, Any]]:
+        """
+        Fetch emails without blocking the event loop (see GmailService.fetch_emails).
+
+        Identical fetches for the same user that overlap, such as a retried or
+        double-submitted request, share one set of Gmail calls.
+        """
+        key = (str(self.gmail.user.id), max_results, " ".join(query.split()), projection)
+        emails = await single_flight.run_async(
+            "fetch_emails", key, lambda: self._fetch_emails(max_results, query, projection)
+        )
+        return list(emails)
+
+    async def _fetch_emails(
+        self, max_results: int, query: str, projection: str
+    ) -> list[dict[str, Any]]:
+        emails: list[dict[str, Any]] = []
+        async for batch in self.iter_emails(max_results, query, projection):
+            emails.extend(batch)
+        return emails
+
+    async def iter_emails(
+        self,
+        max_results: int = 10,
+        query: str = "",
+        projection: str = FULL,
+        window: int | None = None,
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """
+        Yield emails batch by batch, newest first, while later pages are still loading.
+
+        The next page of IDs is listed while the current one is fetched in
+        chunks of ``GMAIL_BATCH_LIMIT``. At most ``window`` chunks are being
+        fetched or waiting for the caller at a time (``GMAIL_FETCH_WINDOW`` by
+        default), so memory is bounded by the window, not by ``max_results``.
+
+        Args:
+            max_results: Maximum number of emails to fetch
+            query: Gmail query string
+            projection: ``FULL`` or ``METADATA`` (see GmailService.fetch_emails)
+            window: Chunks in flight or ready but not yet consumed
+
+        Yields:
+            Parsed emails, one chunk of at most ``GMAIL_BATCH_LIMIT`` at a time
+        """
+        window = window or settings.GMAIL_FETCH_WINDOW
+        refresh_labels = not mailbox_sync.supports(query)
+        round_trips_before = self.gmail.round_trips
+        requested = fetched = 0
+
+        pages = self.gmail.iter_message_ids(max_results=max_results, query=query)
+        listing: asyncio.Task | None = asyncio.create_task(self._run(next, pages, None))
+        queued: deque[list[str]] = deque()
+        fetches: deque[asyncio.Task] = deque()
+        try:
+            while listing is not None or queued or fetches:
+                if listing is not None and not queued:
+                    page = await listing
+                    listing = None
+                    if page:
+                        requested += len(page)
+                        queued.extend(
+                            page[start : start + GMAIL_BATCH_LIMIT]
+                            for start in range(0, len(page), GMAIL_BATCH_LIMIT)
+                        )
+                        # List the next page while this one is fetched
+                        listing = asyncio.create_task(self._run(next, pages, None))
+                while queued and len(fetches) < window:
+                    fetches.append(
+                        asyncio.create_task(
+                            self._run(
+                                self.gmail.get_messages,
+                                queued.popleft(),
+                                projection=projection,
+                                refresh_labels=refresh_labels,
+                            )
+                        )
+                    )
+                if fetches:
+                    batch = await fetches.popleft()
+                    fetched += len(batch)
+                    yield batch
+        finally:
+            for task in [listing, *fetches]:
+                if task is not None:
+                    task.cancel()
+
+        self.gmail.last_fetch_stats = {
+            "requested": requested,
+            "fetched": fetched,
+            "failed": requested - fetched,
+            "round_trips": self.gmail.round_trips - round_trips_before,
+        }
+        logger.info("Fetched emails: %s", self.gmail.last_fetch_stats)
+
+    async def list_message_ids(self, max_results: int = 10, query: str = "") -> list[str]:
+        """List message IDs without fetching the messages themselves."""
+        return await self._run(self.gmail.list_message_ids, max_results=max_results, query=query)
+
+    async def get_email(self, message_id: str) -> dict[str, Any] | None:
+        """Fetch a single message by ID without blocking the event loop."""
+        return await self._run(self.gmail.get_email, message_id)
+
+    async def send_email(
+        self, to: str, subject: str, body: str, thread_id: str | None = None
+    ) -> dict[str, Any]:
+        """Send an email without blocking the event loop."""
+        return await self._run(self.gmail.send_email, to, subject, body, thread_id)
+
+    async def delete_email(self, message_id: str) -> bool:
+        """Move an email to trash without blocking the event loop."""
+        return await self._run(self.gmail.delete_email, message_id)
+
+    async def mark_as_read(self, message_id: str) -> bool:
+        """Mark an email as read without blocking the event loop."""
+        return await self._run(self.gmail.mark_as_read, message_id)
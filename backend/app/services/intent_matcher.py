@@ -0,0 +1,286 @@
+"""Rule-based intent detection for chat messages, compiled once at import."""
+
+import re
+from typing import Any
+
+# Keyword phrases per signal. Phrases match whole words only, so "get" does
+# not fire on "together" and "yes" does not fire on "yesterday"
+SIGNALS: dict[str, list[str]] = {
+    "confirm": [
+        "yes",
+        "confirm",
+        "do it",
+        "go ahead",
+        "send it",
+        "delete it",
+        "yeah",
+        "yep",
+        "sure",
+    ],
+    "fetch": ["show", "list", "fetch", "get", "display"],
+    "summarize": ["summarize", "summarise", "summary"],
+    "reply": ["reply", "respond", "answer", "write back"],
+    "delete": ["delete", "remove", "trash"],
+    "categorize": ["categorize", "categorise", "organize", "organise", "group", "category"],
+    # "today" alone is too common to mean a digest ("am I free today?"), so
+    # only phrases about the day's mail count
+    "digest": [
+        "digest",
+        "summary of the day",
+        "summary of today",
+        "summarize today",
+        "summarise today",
+        "today's emails",
+        "today's email",
+        "today's mail",
+        "today's inbox",
+        "emails from today",
+        "emails today",
+        "mail today",
+        "daily recap",
+    ],
+    "unread": ["unread"],
+    "from": ["from"],
+    "email": ["email", "mail", "message"],
+    "instruction": ["saying", "that", "tell them"],
+}
+
+# Ordinal words and the 0-based email index they refer to
+ORDINALS = {
+    "first": 0,
+    "second": 1,
+    "third": 2,
+    "fourth": 3,
+    "fifth": 4,
+    "last": -1,
+    "latest": 0,
+    "recent": 0,
+}
+
+# Signals checked in order; the first one present decides the intent
+PRIORITY = ["fetch", "summarize", "reply", "delete", "categorize", "digest"]
+
+DEFAULT_FETCH_COUNT = 5
+DEFAULT_CATEGORIZE_COUNT = 20
+
+
+# Email addresses are looked up separately, only in messages containing "@"
+EMAIL_ADDRESS = re.compile(r"[\w.-]+@[\w.-]+")
+
+
+def _trie_pattern(phrases: list[str]) -> str:
+    """
+    Compile phrases into a prefix-factored alternation.
+
+    ``re`` tries alternatives one by one at each position; sharing prefixes
+    ("sum" in "summary" and "summarize") makes each attempt a single walk
+    down the trie. Longer phrases are tried before their prefixes, so the
+    longest phrase at a position wins.
+    """
+    trie: dict[str, dict] = {}
+    for phrase in phrases:
+        node = trie
+        for char in " ".join(phrase.split()):
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: dict[str, dict]) -> str:
+        branches = [
+            (r"\s+" if char == " " else re.escape(char)) + emit(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+def _compile() -> tuple[re.Pattern[str], dict[str, str], dict[str, set[str]]]:
+    """
+    Build the token pattern over lowercase text and the phrase-to-signal map.
+
+    Also returns, for confirmations that name an action ("delete it"), the
+    other signals their words carry, which apply when there is nothing to
+    confirm.
+    """
+    kinds = {phrase: kind for kind, phrases in SIGNALS.items() for phrase in phrases}
+    implied = {
+        phrase: {kinds[word] for word in phrase.split() if kinds.get(word) not in (None, "confirm")}
+        for phrase in SIGNALS["confirm"]
+    }
+    kinds.update(dict.fromkeys(ORDINALS, "ordinal"))
+    pattern = re.compile(
+        r"\b(?:(?P<number>\d+)(?:\s*(?P<suffix>st|nd|rd|th))?"
+        rf"|(?P<phrase>{_trie_pattern(list(kinds))}))\b"
+        r"|#(?P<hash>\d+)"
+    )
+    return pattern, kinds, implied
+
+
+class IntentMatcher:
+    """
+    Detect what a chat message asks for in a single regex pass.
+
+    Every keyword, number and ``#N`` reference is found by one precompiled
+    pattern, scanning the message once; intent and parameters are then
+    decided from what was found.
+    """
+
+    def __init__(self) -> None:
+        """Compile the token pattern."""
+        self._pattern, self._kinds, self._implied = _compile()
+
+    def detect(self, message: str, conversation_history: list | None = None) -> dict[str, Any]:
+        """
+        Detect the intent of a chat message and extract its parameters.
+
+        Args:
+            message: The user's message
+            conversation_history: Earlier messages, used to resolve confirmations
+
+        Returns:
+            Dict with intent type and extracted parameters
+        """
+        # Lowercasing keeps offsets for all but a few exotic characters; if it
+        # did not, instructions are cut from the lowercase text instead
+        text = message.lower().replace("\u2019", "'")
+        original = message if len(message) == len(text) else text
+
+        address = None
+        address_span = (0, 0)
+        if "@" in text:
+            address_match = EMAIL_ADDRESS.search(original)
+            if address_match:
+                address = address_match.group()
+                address_span = address_match.span()
+
+        seen: set[str] = set()
+        # Signals named inside confirmations, used only if nothing is pending
+        implied: set[str] = set()
+        count = None
+        email_index = None
+        instruction = ""
+        # The part of the message that can describe which email is meant
+        reference = original
+        previous_kind = None
+        previous_end = 0
+
+        for match in self._pattern.finditer(text):
+            start, end = match.span()
+            # Words inside an email address ("bob.list@...") are not keywords
+            if address_span[0] <= start < address_span[1]:
+                continue
+
+            kind = None
+            group = match.lastgroup
+            if group == "phrase":
+                phrase = " ".join(match.group("phrase").split())
+                kind = self._kinds[phrase]
+                if kind == "confirm":
+                    implied.update(self._implied[phrase])
+                elif kind == "ordinal":
+                    if email_index is None:
+                        email_index = ORDINALS[phrase]
+                elif kind == "instruction" and not instruction:
+                    instruction = original[end:].strip().split("\n", 1)[0]
+                    reference = original[:start]
+                seen.add(kind)
+            elif group == "suffix":
+                # "2nd", "3 rd"
+                if email_index is None:
+                    email_index = int(match.group("number")) - 1
+            else:
+                number = int(match.group(group))
+                if count is None:
+                    count = number
+                if email_index is None and (
+                    group == "hash"
+                    or (previous_kind == "email" and not text[previous_end:start].strip())
+                ):
+                    email_index = number - 1
+            previous_kind = kind
+            previous_end = end
+
+        if "confirm" in seen and conversation_history:
+            pending = self._pending_action(conversation_history)
+            if pending is not None:
+                return pending
+        # "Delete it" with nothing to confirm still asks to delete something
+        seen.update(implied)
+
+        query = ""
+        if "unread" in seen:
+            query = "is:unread"
+        elif "from" in seen and address:
+            query = f"from:{address}"
+
+        intent = next((signal for signal in PRIORITY if signal in seen), None)
+        if intent in ("fetch", "summarize"):
+            return {
+                "intent": "fetch_emails",
+                "count": count or DEFAULT_FETCH_COUNT,
+                "query": query,
+            }
+        if intent == "reply":
+            return {
+                "intent": "generate_reply",
+                "email_index": email_index,
+                "instruction": instruction,
+                "reference": reference.strip(),
+            }
+        if intent == "delete":
+            return {
+                "intent": "delete_email",
+                "email_index": email_index,
+                "reference": reference.strip(),
+                "confirmed": False,
+            }
+        if intent == "categorize":
+            return {"intent": "categorize", "count": count or DEFAULT_CATEGORIZE_COUNT}
+        if intent == "digest":
+            return {"intent": "digest"}
+
+        # Default to general query
+        return {"intent": "query", "message": message}
+
+    def _pending_action(self, conversation_history: list) -> dict[str, Any] | None:
+        """Return the action the assistant asked to confirm in the last 3 messages, if any."""
+        for msg in reversed(conversation_history[-3:]):
+            # Handle both dict and Pydantic ChatMessage
+            if hasattr(msg, "role"):
+                role = msg.role
+                content = msg.content
+                metadata = getattr(msg, "metadata", None)
+            elif isinstance(msg, dict):
+                role = msg.get("role")
+                content = msg.get("content", "")
+                metadata = msg.get("metadata")
+            else:
+                continue
+
+            # Only check assistant messages
+            if role != "assistant":
+                continue
+
+            # Check if assistant was asking for delete confirmation
+            if "are you sure you want to delete" in content.lower():
+                if metadata and isinstance(metadata, dict):
+                    email_id = metadata.get("email_id")
+                    if email_id:
+                        return {"intent": "delete_email", "email_id": email_id, "confirmed": True}
+                return None
+
+            # Check if assistant was asking to send reply
+            if "would you like me to send" in content.lower():
+                if metadata and isinstance(metadata, dict):
+                    return {"intent": "send_reply", "confirmed": True, **metadata}
+                return None
+
+        return None
+
+
+# Singleton instance
+intent_matcher = IntentMatcher()
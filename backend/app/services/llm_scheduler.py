@@ -0,0 +1,303 @@
+"""Process-wide admission control for Gemini calls: rate limits, priorities, 429 retries."""
+
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+from google.api_core.exceptions import ResourceExhausted, TooManyRequests
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Priorities, lowest first: a user waiting on the answer, then background work
+INTERACTIVE = 0
+BULK = 1
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+# Longest wait before retrying a rate-limited call
+BACKOFF_MAX_SECONDS = 30.0
+
+# Seconds of quota that may be used in one burst. A minute's worth at once
+# would be within the per-minute limit on paper, but quota windows slide, so
+# the next minute would then start out exhausted.
+BURST_SECONDS = 1.0
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Whether Gemini turned a call down for quota (HTTP 429)."""
+    return isinstance(error, ResourceExhausted | TooManyRequests)
+
+
+class _TokenBucket:
+    """Refills ``per_minute`` units a minute, holding at most ``BURST_SECONDS`` worth."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.rate = per_minute / 60
+        self.capacity = max(self.rate * BURST_SECONDS, 1)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` is available; 0 if it is now."""
+        self._refill(now)
+        # A request larger than the bucket waits for a full bucket, not forever
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+    def drain(self, now: float) -> None:
+        self._refill(now)
+        self.level = min(self.level, 0)
+
+
+class _Waits:
+    """Queue wait times of admitted calls at one priority."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+
+class LLMScheduler:
+    """
+    Admit Gemini calls from every request in priority order, within rate limits.
+
+    Before a call runs it waits for a place in line, a free slot among
+    ``max_concurrency``, one request from a ``requests_per_minute`` bucket and
+    its estimated tokens from a ``tokens_per_minute`` bucket. Waiting calls
+    are admitted lowest priority value first (``INTERACTIVE`` before
+    ``BULK``), in arrival order within a priority. Once a response reports
+    its actual usage, ``settle`` corrects the token bucket by the difference.
+
+    A call Gemini rejects with 429 is retried up to ``max_retries`` times
+    after a jittered exponential backoff, and empties the request bucket so
+    every other caller slows down to the refill rate as well.
+
+    Waiting for admission blocks a thread, so async code hands Gemini work
+    to ``to_thread``, which runs it on threads kept for its priority rather
+    than on the event loop's default executor. A backlog of bulk calls then
+    ties up only bulk threads: Gmail fetches and other ``asyncio.to_thread``
+    work keep their threads, and an interactive call always has one free to
+    reach the queue, where it goes ahead of the backlog.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_concurrency: int,
+        max_retries: int,
+        backoff_base: float,
+    ) -> None:
+        """Initialize with full buckets and nobody waiting."""
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._requests = _TokenBucket(requests_per_minute)
+        self._tokens = _TokenBucket(tokens_per_minute)
+        self._queue: list[tuple[int, int]] = []
+        self._tickets = itertools.count()
+        self._running = 0
+        self._condition = threading.Condition()
+        self._waits = {priority: _Waits() for priority in PRIORITY_NAMES}
+        # No more calls than this run at once, so more threads would only wait
+        self._executors = {
+            priority: ThreadPoolExecutor(max_concurrency, thread_name_prefix=f"gemini-{name}")
+            for priority, name in PRIORITY_NAMES.items()
+        }
+        self.max_queue_depth = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.failed = 0
+        self.settled = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def run(self, call: Callable[[], T], priority: int = INTERACTIVE, tokens: int = 0) -> T:
+        """
+        Run ``call`` once admitted, retrying it when Gemini answers 429.
+
+        Args:
+            call: Makes the Gemini request and returns its response
+            priority: ``INTERACTIVE`` or ``BULK``
+            tokens: Estimated prompt and output tokens, charged up front
+
+        Raises:
+            Whatever ``call`` raised on its last attempt
+        """
+        attempt = 0
+        while True:
+            with self._slot(priority, tokens):
+                try:
+                    return call()
+                except Exception as error:
+                    if not self._retry(error, attempt):
+                        raise
+            self._backoff(attempt)
+            attempt += 1
+
+    def stream(
+        self, call: Callable[[], Iterable[T]], priority: int = INTERACTIVE, tokens: int = 0
+    ) -> Iterator[T]:
+        """
+        Like ``run``, for a streamed response.
+
+        The slot is held until the stream is drained or closed, and a 429 is
+        retried only before the first chunk has been passed on.
+        """
+        attempt = 0
+        while True:
+            started = False
+            with self._slot(priority, tokens):
+                try:
+                    for item in call():
+                        started = True
+                        yield item
+                    return
+                except Exception as error:
+                    if started or not self._retry(error, attempt):
+                        raise
+            self._backoff(attempt)
+            attempt += 1
+
+    async def to_thread(self, priority: int, func: Callable[..., T], *args: Any) -> T:
+        """
+        Like ``asyncio.to_thread``, on a thread kept for Gemini calls of ``priority``.
+
+        Args:
+            priority: ``INTERACTIVE`` or ``BULK``, the priority ``func`` calls Gemini at
+            func: Blocking function that makes Gemini calls through this scheduler
+            args: Arguments for ``func``
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, func, *args)
+        return await loop.run_in_executor(self._executors[priority], call)
+
+    def shutdown(self) -> None:
+        """Stop the threads kept for Gemini calls, once running calls finish."""
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def settle(self, estimated: int, input_tokens: int, output_tokens: int) -> None:
+        """Charge or refund the difference between a call's estimated and actual tokens."""
+        with self._condition:
+            self._tokens.take(input_tokens + output_tokens - estimated)
+            self.settled += 1
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self._condition.notify_all()
+
+    @contextmanager
+    def _slot(self, priority: int, tokens: int) -> Iterator[None]:
+        ticket = (priority, next(self._tickets))
+        queued_at = time.monotonic()
+        with self._condition:
+            heapq.heappush(self._queue, ticket)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+            while True:
+                now = time.monotonic()
+                delay = None
+                if self._queue[0] == ticket and self._running < self.max_concurrency:
+                    delay = max(self._requests.wait(1, now), self._tokens.wait(tokens, now))
+                    if delay == 0:
+                        break
+                self._condition.wait(delay)
+
+            heapq.heappop(self._queue)
+            self._requests.take(1)
+            self._tokens.take(tokens)
+            self._running += 1
+            self.admitted += 1
+            self._waits[priority].add(time.monotonic() - queued_at)
+            # The next in line may be admissible too
+            self._condition.notify_all()
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._condition.notify_all()
+
+    def _retry(self, error: Exception, attempt: int) -> bool:
+        """Count a failed call; return whether it should be tried again."""
+        with self._condition:
+            if not is_rate_limited(error):
+                self.failed += 1
+                return False
+            self.rate_limited += 1
+            self._requests.drain(time.monotonic())
+            if attempt >= self.max_retries:
+                self.failed += 1
+                return False
+            self.retries += 1
+            return True
+
+    def _backoff(self, attempt: int) -> None:
+        # Full jitter, so callers turned down together do not retry together
+        delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, self.backoff_base * 2**attempt))
+        logger.info("Gemini rate limited; retrying in %.2f s", delay)
+        time.sleep(delay)
+
+    def stats(self) -> dict[str, Any]:
+        """Queue depth, wait times by priority, 429 counters and tokens per call."""
+        with self._condition:
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_queue_depth,
+                "running": self._running,
+                "admitted": self.admitted,
+                "rate_limited": self.rate_limited,
+                "retries": self.retries,
+                "failed": self.failed,
+                "input_tokens_per_call": (
+                    round(self.input_tokens / self.settled, 1) if self.settled else None
+                ),
+                "output_tokens_per_call": (
+                    round(self.output_tokens / self.settled, 1) if self.settled else None
+                ),
+                "wait_seconds": {
+                    PRIORITY_NAMES[priority]: {
+                        "mean": round(waits.total / waits.count, 4) if waits.count else None,
+                        "max": round(waits.max, 4),
+                    }
+                    for priority, waits in self._waits.items()
+                },
+            }
+
+
+# Singleton instance
+llm_scheduler = LLMScheduler(
+    requests_per_minute=settings.GEMINI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.GEMINI_TOKENS_PER_MINUTE,
+    max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+    max_retries=settings.GEMINI_MAX_RETRIES,
+    backoff_base=settings.GEMINI_BACKOFF_BASE_SECONDS,
+)
@@ -0,0 +1,268 @@
+"""Incremental mailbox sync through the Gmail history API."""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from typing import TYPE_CHECKING, Any
+
+from googleapiclient.errors import HttpError
+
+from app.core.config import settings
+from app.services.message_cache import message_cache
+from app.services.search_index import search_index
+
+if TYPE_CHECKING:
+    from app.services.gmail_service import GmailService
+
+logger = logging.getLogger(__name__)
+
+# Queries the local store can answer from label IDs alone, mapped to the label
+# a message must carry (None means any message outside spam and trash)
+LOCAL_QUERIES: dict[str, str | None] = {"": None, "is:unread": "UNREAD"}
+
+EXCLUDED_LABELS = {"SPAM", "TRASH"}
+
+# Listings are fetched at least this deep so a few removals do not force a relist
+MIN_LISTING_DEPTH = 50
+
+
+def _normalize(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _matches(query: str, labels: list[str] | set[str]) -> bool:
+    """Whether a message with ``labels`` belongs to the listing for ``query``."""
+    if EXCLUDED_LABELS.intersection(labels):
+        return False
+    required = LOCAL_QUERIES[query]
+    return required is None or required in labels
+
+
+class _Listing:
+    """Newest-first prefix of a query's results."""
+
+    def __init__(self, message_ids: list[str], complete: bool) -> None:
+        self.message_ids = message_ids
+        # True when the prefix is the entire result set, not just its head
+        self.complete = complete
+
+
+class _MailboxState:
+    """Last synced history ID and locally maintained listings for one user."""
+
+    def __init__(self) -> None:
+        self.history_id: str | None = None
+        self.synced_at = 0.0
+        self.stale = False
+        self.listings: dict[str, _Listing] = {}
+        self.lock = threading.Lock()
+
+
+class MailboxSync:
+    """
+    Keep per-user message listings current with ``users.history.list`` deltas.
+
+    The first listing for a query costs one ``messages.list``. After that each
+    request replays only the history records since the stored ``historyId``:
+    additions are prepended, deletions and label changes that drop a message
+    out of a query are removed in place. When a change would put a message at
+    an unknown position (for example an old message marked unread) the affected
+    listing is discarded and rebuilt on next use. Within ``fresh_seconds`` of
+    the last sync no history call is made at all.
+    """
+
+    def __init__(self, fresh_seconds: float, max_users: int, window: int) -> None:
+        """Initialize an empty sync store."""
+        self.fresh_seconds = fresh_seconds
+        self.max_users = max_users
+        self.window = window
+        self._states: OrderedDict[str, _MailboxState] = OrderedDict()
+        self._lock = threading.Lock()
+        self.served_from_store = 0
+        self.full_lists = 0
+        self.history_syncs = 0
+        self.history_records = 0
+        self.resets = 0
+
+    def supports(self, query: str) -> bool:
+        """Whether ``query`` can be answered from the local store."""
+        return _normalize(query) in LOCAL_QUERIES
+
+    def _state(self, user_id: str) -> _MailboxState:
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is None:
+                state = self._states[user_id] = _MailboxState()
+                while len(self._states) > self.max_users:
+                    self._states.popitem(last=False)
+            else:
+                self._states.move_to_end(user_id)
+            return state
+
+    def mark_stale(self, user_id: str) -> None:
+        """Force a history sync on next use, e.g. after the user changed the mailbox."""
+        with self._lock:
+            state = self._states.get(user_id)
+        if state is not None:
+            state.stale = True
+
+    def list_message_ids(self, gmail: "GmailService", max_results: int, query: str) -> list[str]:
+        """List message IDs for a supported query, newest first."""
+        pages = self.iter_message_ids(gmail, max_results, query, page_size=max(max_results, 1))
+        return [message_id for page in pages for message_id in page]
+
+    def iter_message_ids(
+        self, gmail: "GmailService", max_results: int, query: str, page_size: int
+    ) -> Iterator[list[str]]:
+        """
+        Yield message IDs for a supported query page by page, newest first.
+
+        A stored listing is handed over in slices of ``page_size``. Otherwise
+        each page Gmail returns is passed on as it arrives, and the listing is
+        stored once complete, unless a sync ran meanwhile: its changes were
+        not applied to this listing and will not be replayed again.
+        """
+        query = _normalize(query)
+        user_id = str(gmail.user.id)
+        state = self._state(user_id)
+
+        with state.lock:
+            self._sync(gmail, user_id, state)
+            history_id = state.history_id
+
+            listing = state.listings.get(query)
+            stored = None
+            if listing is not None and (
+                listing.complete or len(listing.message_ids) >= max_results
+            ):
+                self.served_from_store += 1
+                stored = listing.message_ids[:max_results]
+
+        if stored is not None:
+            for start in range(0, len(stored), page_size):
+                yield stored[start : start + page_size]
+            return
+
+        message_ids: list[str] = []
+        exhausted = True
+        for results in gmail.list_pages(max(max_results, MIN_LISTING_DEPTH), query):
+            page = [message["id"] for message in results.get("messages", [])]
+            if len(message_ids) < max_results:
+                yield page[: max_results - len(message_ids)]
+            message_ids.extend(page)
+            exhausted = "nextPageToken" not in results
+
+        with state.lock:
+            self.full_lists += 1
+            if state.history_id == history_id:
+                state.listings[query] = _Listing(
+                    message_ids[: self.window],
+                    complete=exhausted and len(message_ids) <= self.window,
+                )
+
+    def _sync(self, gmail: "GmailService", user_id: str, state: _MailboxState) -> None:
+        """Bring ``state`` up to date with the mailbox's history."""
+        if state.history_id is None:
+            # Take the starting point before any listing so no change is missed;
+            # changes replayed on top of a listing that already has them are no-ops
+            profile = gmail.execute(gmail.service.users().getProfile(userId="me"))
+            # Cached labels are kept current from this point on, so none may
+            # date from before it
+            message_cache.invalidate(user_id)
+            state.history_id = profile["historyId"]
+            state.synced_at = time.monotonic()
+            return
+
+        if not state.stale and time.monotonic() - state.synced_at < self.fresh_seconds:
+            return
+
+        history = gmail.service.users().history()
+        page_token = None
+        try:
+            while True:
+                response = gmail.execute(
+                    history.list(userId="me", startHistoryId=state.history_id, pageToken=page_token)
+                )
+                for record in response.get("history", []):
+                    self._apply(user_id, state, record)
+                page_token = response.get("nextPageToken")
+                if not page_token:
+                    break
+        except HttpError as error:
+            if error.resp.status != 404:
+                raise
+            # The stored historyId is too old for Gmail to replay; start over
+            logger.info("History for user %s expired, resetting local store", user_id)
+            self.resets += 1
+            state.listings.clear()
+            state.history_id = None
+            self._sync(gmail, user_id, state)
+            return
+
+        state.history_id = response.get("historyId", state.history_id)
+        state.synced_at = time.monotonic()
+        state.stale = False
+        self.history_syncs += 1
+
+    def _apply(self, user_id: str, state: _MailboxState, record: dict[str, Any]) -> None:
+        """Apply one history record to every listing."""
+        self.history_records += 1
+
+        for item in record.get("messagesAdded", []):
+            message = item["message"]
+            labels = message.get("labelIds", [])
+            for query, listing in state.listings.items():
+                if _matches(query, labels) and message["id"] not in listing.message_ids:
+                    listing.message_ids.insert(0, message["id"])
+                    if len(listing.message_ids) > self.window:
+                        del listing.message_ids[self.window :]
+                        listing.complete = False
+
+        for item in record.get("messagesDeleted", []):
+            message_id = item["message"]["id"]
+            message_cache.invalidate(user_id, message_id)
+            search_index.remove(user_id, message_id)
+            for listing in state.listings.values():
+                if message_id in listing.message_ids:
+                    listing.message_ids.remove(message_id)
+
+        for key in ("labelsAdded", "labelsRemoved"):
+            for item in record.get(key, []):
+                message = item["message"]
+                labels = set(message.get("labelIds", []))
+                changed = set(item.get("labelIds", []))
+                previous = labels - changed if key == "labelsAdded" else labels | changed
+                message_cache.update_labels(user_id, message["id"], sorted(labels))
+
+                for query in list(state.listings):
+                    listing = state.listings[query]
+                    now_matches = _matches(query, labels)
+                    if now_matches == _matches(query, previous):
+                        continue
+                    if not now_matches:
+                        if message["id"] in listing.message_ids:
+                            listing.message_ids.remove(message["id"])
+                    elif message["id"] not in listing.message_ids:
+                        # Position unknown without the message date; rebuild on next use
+                        del state.listings[query]
+
+    def stats(self) -> dict[str, int]:
+        """Counters showing how often listings avoided a full messages.list."""
+        return {
+            "served_from_store": self.served_from_store,
+            "full_lists": self.full_lists,
+            "history_syncs": self.history_syncs,
+            "history_records": self.history_records,
+            "resets": self.resets,
+            "users": len(self._states),
+        }
+
+
+# Singleton instance
+mailbox_sync = MailboxSync(
+    fresh_seconds=settings.MAILBOX_SYNC_FRESH_SECONDS,
+    max_users=settings.MAILBOX_SYNC_MAX_USERS,
+    window=settings.MAILBOX_SYNC_WINDOW,
+)
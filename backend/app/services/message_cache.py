@@ -0,0 +1,140 @@
+"""In-process cache of parsed Gmail messages."""
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from app.core.config import settings
+
+
+def _estimate_size(email: dict[str, Any]) -> int:
+    """Approximate the memory held by a parsed message."""
+    size = sys.getsizeof(email)
+    for value in email.values():
+        size += sys.getsizeof(value)
+        if isinstance(value, list):
+            size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+class _UserPartition:
+    """LRU-ordered messages for one user."""
+
+    def __init__(self) -> None:
+        self.entries: OrderedDict[str, tuple[dict[str, Any], int]] = OrderedDict()
+        self.bytes = 0
+
+
+class MessageCache:
+    """
+    Per-user LRU cache of ``message_parser.parse_message`` output.
+
+    Gmail message content is immutable for a given ID, so a cached entry only
+    goes stale through its labels; callers refresh those with a cheap
+    metadata-only request, or mailbox_sync replays label changes from the
+    history, and either writes them back with ``update_labels``. Each user
+    gets ``max_bytes_per_user`` of (estimated) memory, and the least recently
+    active users are dropped beyond ``max_users``.
+    """
+
+    def __init__(self, max_bytes_per_user: int, max_users: int) -> None:
+        """Initialize an empty cache with the given memory budget."""
+        self.max_bytes_per_user = max_bytes_per_user
+        self.max_users = max_users
+        self._users: OrderedDict[str, _UserPartition] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.label_refreshes = 0
+
+    def _partition(self, user_id: str, create: bool = False) -> _UserPartition | None:
+        partition = self._users.get(user_id)
+        if partition is not None:
+            self._users.move_to_end(user_id)
+        elif create:
+            partition = self._users[user_id] = _UserPartition()
+            while len(self._users) > self.max_users:
+                _, dropped = self._users.popitem(last=False)
+                self.evictions += len(dropped.entries)
+        return partition
+
+    def get_many(self, user_id: str, message_ids: list[str]) -> dict[str, dict[str, Any]]:
+        """Return cached copies of whichever of ``message_ids`` are present."""
+        found: dict[str, dict[str, Any]] = {}
+        with self._lock:
+            partition = self._partition(user_id)
+            for message_id in message_ids:
+                entry = partition.entries.get(message_id) if partition else None
+                if entry is None:
+                    self.misses += 1
+                    continue
+                partition.entries.move_to_end(message_id)
+                self.hits += 1
+                found[message_id] = {**entry[0], "labels": list(entry[0]["labels"])}
+        return found
+
+    def put(self, user_id: str, email: dict[str, Any]) -> None:
+        """Store a parsed message, evicting least recently used ones over budget."""
+        size = _estimate_size(email)
+        if size > self.max_bytes_per_user:
+            return
+
+        with self._lock:
+            partition = self._partition(user_id, create=True)
+            previous = partition.entries.pop(email["id"], None)
+            if previous is not None:
+                partition.bytes -= previous[1]
+
+            partition.entries[email["id"]] = ({**email, "labels": list(email["labels"])}, size)
+            partition.bytes += size
+
+            while partition.bytes > self.max_bytes_per_user:
+                _, (_, evicted_size) = partition.entries.popitem(last=False)
+                partition.bytes -= evicted_size
+                self.evictions += 1
+
+    def update_labels(self, user_id: str, message_id: str, labels: list[str]) -> None:
+        """Replace the labels of a cached message after a metadata refresh."""
+        with self._lock:
+            partition = self._users.get(user_id)
+            entry = partition.entries.get(message_id) if partition else None
+            if entry is not None:
+                entry[0]["labels"] = list(labels)
+                self.label_refreshes += 1
+
+    def invalidate(self, user_id: str, message_id: str | None = None) -> None:
+        """Drop one message, or everything cached for the user."""
+        with self._lock:
+            partition = self._users.get(user_id)
+            if partition is None:
+                return
+            if message_id is None:
+                del self._users[user_id]
+                return
+            entry = partition.entries.pop(message_id, None)
+            if entry is not None:
+                partition.bytes -= entry[1]
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counters and current occupancy, for sizing the budget."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "label_refreshes": self.label_refreshes,
+                "users": len(self._users),
+                "entries": sum(len(p.entries) for p in self._users.values()),
+                "bytes": sum(p.bytes for p in self._users.values()),
+            }
+
+
+# Singleton instance
+message_cache = MessageCache(
+    max_bytes_per_user=settings.MESSAGE_CACHE_MAX_BYTES_PER_USER,
+    max_users=settings.MESSAGE_CACHE_MAX_USERS,
+)
@@ -0,0 +1,138 @@
+"""
+Turn raw Gmail API messages into the email dicts the rest of the app uses.
+
+Kept free of settings and service imports so process-pool workers can import
+it cheaply.
+"""
+
+import base64
+from typing import Any
+
+from app.services.html_text import MAX_INPUT_CHARS, html_to_text
+
+# Parts nested deeper than this are ignored; real mail rarely goes past four levels
+MAX_MIME_DEPTH = 10
+
+# Bodies are decoded up to this size; html_to_text reads no further anyway
+MAX_BODY_BYTES = MAX_INPUT_CHARS
+
+
+def parse_message(message: dict) -> dict[str, Any]:
+    """Parse Gmail message and extract relevant information."""
+    headers = message["payload"]["headers"]
+    header_dict = {header["name"]: header["value"] for header in headers}
+
+    # Extract body
+    body = get_message_body(message["payload"])
+
+    # Strip HTML; this saves tokens when sending to AI
+    sanitized_body = html_to_text(body)
+
+    return {
+        "id": message["id"],
+        "thread_id": message["threadId"],
+        "subject": header_dict.get("Subject", "(No Subject)"),
+        "from": header_dict.get("From", "Unknown"),
+        "to": header_dict.get("To", ""),
+        "date": header_dict.get("Date", ""),
+        "snippet": message.get("snippet", ""),
+        "body": sanitized_body,
+        "labels": message.get("labelIds", []),
+    }
+
+
+def parse_messages(messages: list[dict]) -> list[dict[str, Any]]:
+    """Parse a batch of messages; the unit of work sent to a pool worker."""
+    return [parse_message(message) for message in messages]
+
+
+def get_message_body(payload: dict, max_bytes: int = MAX_BODY_BYTES) -> str:
+    """
+    Decode the body of the best text part of a payload.
+
+    Only the part chosen by ``find_body_part`` is decoded, and at most
+    ``max_bytes`` of it; invalid UTF-8 is replaced rather than failing the
+    whole message.
+
+    Args:
+        payload: Gmail ``payload`` of a message in ``full`` format
+        max_bytes: Decoded bytes beyond this are never decoded
+
+    Returns:
+        Raw body text or HTML, or "" when the message has no inline text part
+    """
+    part = find_body_part(payload)
+    if part is None:
+        return ""
+    data = part["body"]["data"]
+    max_chars = _encoded_length(max_bytes)
+    if len(data) <= max_chars:
+        # Gmail sometimes leaves off the base64 padding
+        return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)).decode(
+            "utf-8", errors="replace"
+        )
+
+    raw = base64.urlsafe_b64decode(data[:max_chars])[:max_bytes]
+    # Drop a character the cut split in two instead of turning it into U+FFFD
+    return raw.decode("utf-8", errors="replace").removesuffix("\ufffd")
+
+
+def find_body_part(payload: dict, max_depth: int = MAX_MIME_DEPTH) -> dict | None:
+    """
+    Find the part holding a message's readable body without decoding anything.
+
+    Walks the MIME tree depth-first in document order, so the body of a
+    multipart/alternative nested in multipart/mixed is found. The first
+    text/plain part wins; otherwise the first text/html part is used.
+    Attachments, including text ones and parts whose data Gmail serves
+    separately behind an ``attachmentId``, are skipped without fetching them.
+
+    Args:
+        payload: Gmail ``payload`` of a message in ``full`` format
+        max_depth: Parts nested deeper than this are ignored
+
+    Returns:
+        The chosen part, or None when there is no inline text part
+    """
+    html_part = None
+    stack = [(payload, 0)]
+
+    while stack:
+        part, depth = stack.pop()
+        if "parts" in part:
+            if depth < max_depth:
+                stack.extend((child, depth + 1) for child in reversed(part["parts"]))
+            continue
+        if "data" not in part.get("body", {}) or _is_attachment(part):
+            continue
+
+        mime_type = part.get("mimeType", "text/plain").lower()
+        if mime_type == "text/plain":
+            return part
+        if html_part is None and mime_type == "text/html":
+            html_part = part
+
+    return html_part
+
+
+def _is_attachment(part: dict) -> bool:
+    if part.get("filename") or "attachmentId" in part.get("body", {}):
+        return True
+    return any(
+        header["name"].lower() == "content-disposition"
+        and header["value"].lower().startswith("attachment")
+        for header in part.get("headers", ())
+    )
+
+
+def _encoded_length(size: int) -> int:
+    """Number of base64 characters that encode ``size`` bytes."""
+    return -(-size // 3) * 4
+
+
+def payload_size(payload: dict) -> int:
+    """Length of the encoded body data parsing a payload will decode, i.e. the work it holds."""
+    part = find_body_part(payload)
+    if part is None:
+        return 0
+    return min(len(part["body"]["data"]), _encoded_length(MAX_BODY_BYTES))
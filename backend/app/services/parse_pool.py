@@ -0,0 +1,114 @@
+"""Process pool for parsing Gmail messages off the request threads."""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from app.core.config import settings
+from app.services.message_parser import parse_messages, payload_size
+
+logger = logging.getLogger(__name__)
+
+
+class ParsePool:
+    """
+    Parse raw Gmail messages in worker processes, or inline when that is cheaper.
+
+    Base64 decoding and HTML-to-text conversion are CPU-bound, so on worker
+    threads they still contend for the GIL with every other request. Batches
+    whose encoded bodies total at least ``inline_max_bytes`` are split across
+    ``max_workers`` processes; smaller ones are parsed in the calling thread,
+    where pickling and dispatch would cost more than they save. The pool is
+    started on first use, and if it breaks the batch is parsed inline and a
+    fresh pool is started next time.
+    """
+
+    def __init__(self, max_workers: int, inline_max_bytes: int) -> None:
+        """Initialize without starting any processes; ``max_workers=0`` always parses inline."""
+        self.max_workers = max_workers
+        self.inline_max_bytes = inline_max_bytes
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self.inline_batches = 0
+        self.pooled_batches = 0
+        self.pooled_messages = 0
+        self.pool_failures = 0
+        self.pooled_seconds = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned workers import only the parser, never the app or its threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def parse_many(self, messages: list[dict]) -> list[dict[str, Any]]:
+        """Parse messages into email dicts, preserving order."""
+        if (
+            self.max_workers <= 0
+            or len(messages) < 2
+            or sum(payload_size(message["payload"]) for message in messages) < self.inline_max_bytes
+        ):
+            self.inline_batches += 1
+            return parse_messages(messages)
+
+        # One chunk per worker keeps pickling to a few large transfers
+        chunk_count = min(self.max_workers, len(messages))
+        chunks = [messages[index::chunk_count] for index in range(chunk_count)]
+
+        started = time.perf_counter()
+        try:
+            results = list(self._get_executor().map(parse_messages, chunks))
+        except BrokenProcessPool as error:
+            logger.warning("Parse pool failed, parsing inline: %s", error)
+            self.pool_failures += 1
+            with self._lock:
+                self._executor = None
+            return parse_messages(messages)
+
+        self.pooled_batches += 1
+        self.pooled_messages += len(messages)
+        self.pooled_seconds += time.perf_counter() - started
+
+        # Undo the round-robin split
+        parsed: list[dict[str, Any]] = [{}] * len(messages)
+        for index, chunk in enumerate(results):
+            parsed[index::chunk_count] = chunk
+        return parsed
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, if any were started."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    def stats(self) -> dict[str, float | int]:
+        """How many batches were parsed inline vs in worker processes."""
+        return {
+            "workers": self.max_workers if self._executor is not None else 0,
+            "inline_batches": self.inline_batches,
+            "pooled_batches": self.pooled_batches,
+            "pooled_messages": self.pooled_messages,
+            "pool_failures": self.pool_failures,
+            "pooled_seconds": round(self.pooled_seconds, 4),
+        }
+
+
+# Singleton instance
+parse_pool = ParsePool(
+    max_workers=(
+        settings.PARSE_POOL_WORKERS
+        if settings.PARSE_POOL_WORKERS is not None
+        else os.cpu_count() or 1
+    ),
+    inline_max_bytes=settings.PARSE_INLINE_MAX_BYTES,
+)
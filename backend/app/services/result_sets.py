@@ -0,0 +1,60 @@
+"""Remember which emails a user was shown, so "email #2" resolves without refetching."""
+
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+
+
+class ResultSetCache:
+    """
+    Per-user record of the ordered message IDs from the latest email listing.
+
+    Entries expire after ``ttl_seconds`` and at most ``max_users`` are kept,
+    least recently used first out.
+    """
+
+    def __init__(self, ttl_seconds: float, max_users: int) -> None:
+        """Initialize an empty cache."""
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self._entries: OrderedDict[str, tuple[float, list[str]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def remember(self, user_id: str, message_ids: list[str]) -> None:
+        """Store the IDs of the emails just shown to the user, in display order."""
+        with self._lock:
+            self._entries[user_id] = (time.monotonic(), list(message_ids))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def resolve(self, user_id: str, index: int) -> str | None:
+        """Map a 0-based display index (negative counts from the end) to a message ID."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[user_id]
+                entry = None
+
+            message_ids = entry[1] if entry else []
+            if -len(message_ids) <= index < len(message_ids):
+                self.hits += 1
+                return message_ids[index]
+
+            self.misses += 1
+            return None
+
+    def stats(self) -> dict[str, int]:
+        """Hit/miss counters."""
+        return {"hits": self.hits, "misses": self.misses, "users": len(self._entries)}
+
+
+# Singleton instance
+result_sets = ResultSetCache(
+    ttl_seconds=settings.RESULT_SET_TTL_SECONDS,
+    max_users=settings.RESULT_SET_MAX_USERS,
+)
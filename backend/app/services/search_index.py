@@ -0,0 +1,226 @@
+"""Local full-text similarity search over each user's synced messages."""
+
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from itertools import pairwise
+from typing import Any
+
+import numpy as np
+
+from app.core.config import settings
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Words that say nothing about which email is meant, including the chat
+# commands that carry a reference ("reply to the email from John")
+STOPWORDS = frozenset(
+    {
+        "a", "about", "all", "an", "and", "answer", "any", "are", "as", "at", "back", "be",
+        "by", "can", "delete", "did", "do", "email", "emails", "for", "from", "fw", "fwd",
+        "get", "has", "have", "hi", "i", "in", "is", "it", "mail", "me", "message", "my",
+        "of", "on", "one", "or", "our", "please", "re", "remove", "reply", "respond", "sent",
+        "that", "the", "this", "to", "trash", "us", "was", "we", "with", "write", "you", "your",
+    }
+)  # fmt: skip
+
+
+def _document_text(email: dict[str, Any]) -> str:
+    """
+    Text indexed for a parsed message; the subject is repeated to weigh it more.
+
+    People refer to an email by its sender and topic, which the subject and
+    Gmail's snippet of the opening lines carry. Full bodies would add hundreds
+    of terms per message, and with hashed vectors every extra term is another
+    chance of a false match.
+    """
+    return " ".join(
+        (
+            email.get("from", ""),
+            email.get("subject", ""),
+            email.get("subject", ""),
+            email.get("snippet", ""),
+        )
+    )
+
+
+def vectorize(text: str, dim: int) -> np.ndarray:
+    """
+    Hash a text's words and word bigrams into a unit-length vector.
+
+    Each term lands in one of ``dim`` buckets with a sign taken from its hash,
+    so collisions tend to cancel out instead of adding up. Term counts are
+    damped with log1p, so one repeated word cannot dominate a message.
+    """
+    words = [word for word in _TOKEN.findall(text.lower()) if word not in STOPWORDS]
+    vector = np.zeros(dim, dtype=np.float32)
+    if not words:
+        return vector
+
+    terms = words + [f"{first} {second}" for first, second in pairwise(words)]
+    hashes = np.fromiter(
+        (zlib.crc32(term.encode()) for term in terms), dtype=np.uint32, count=len(terms)
+    )
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, hashes % dim, signs)
+
+    vector = np.sign(vector) * np.log1p(np.abs(vector))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _UserIndex:
+    """Vectors of one user's messages, one row each, plus per-bucket document counts."""
+
+    def __init__(self, dim: int) -> None:
+        self.vectors = np.zeros((16, dim), dtype=np.float32)
+        # Message ID per row; None marks a free row
+        self.ids: list[str | None] = []
+        self.rows: dict[str, int] = {}
+        self.free: list[int] = []
+        self.document_counts = np.zeros(dim, dtype=np.int32)
+
+    def add(self, message_id: str, vector: np.ndarray) -> None:
+        if self.free:
+            row = self.free.pop()
+            self.ids[row] = message_id
+        else:
+            row = len(self.ids)
+            if row == len(self.vectors):
+                self.vectors = np.concatenate([self.vectors, np.zeros_like(self.vectors)])
+            self.ids.append(message_id)
+        self.vectors[row] = vector
+        self.rows[message_id] = row
+        self.document_counts += vector != 0
+
+    def remove(self, message_id: str) -> None:
+        row = self.rows.pop(message_id, None)
+        if row is None:
+            return
+        self.document_counts -= self.vectors[row] != 0
+        self.vectors[row] = 0
+        self.ids[row] = None
+        self.free.append(row)
+
+
+class SearchIndex:
+    """
+    Per-user similarity index over parsed messages, for free-text references.
+
+    Messages are added as they are fetched and parsed, and removed when they
+    are deleted, so the index covers what the user has recently synced without
+    any Gmail or Gemini calls of its own. Messages are hashed into ``dim``
+    dimensional vectors (see ``vectorize``); a search weighs the query's terms
+    by inverse document frequency, so rare words like names and topics count
+    more than common ones, and ranks every message with one matrix-vector
+    product. Each user keeps at most ``max_messages``, oldest first out, and
+    the least recently active users are dropped beyond ``max_users``.
+    """
+
+    def __init__(self, dim: int, max_messages: int, max_users: int) -> None:
+        """Initialize an empty index."""
+        self.dim = dim
+        self.max_messages = max_messages
+        self.max_users = max_users
+        self._users: OrderedDict[str, _UserIndex] = OrderedDict()
+        self._lock = threading.Lock()
+        self.indexed = 0
+        self.searches = 0
+        self.matches = 0
+
+    def add(self, user_id: str, emails: list[dict[str, Any]]) -> None:
+        """Index parsed messages; ones already indexed are skipped, as content never changes."""
+        with self._lock:
+            index = self._users.get(user_id)
+            known = index.rows if index is not None else {}
+        new = [email for email in emails if email["id"] not in known]
+        if not new:
+            return
+
+        # Hash outside the lock; this is the expensive part
+        vectors = [(email["id"], vectorize(_document_text(email), self.dim)) for email in new]
+
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is None:
+                index = self._users[user_id] = _UserIndex(self.dim)
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            self._users.move_to_end(user_id)
+
+            for message_id, vector in vectors:
+                if message_id in index.rows:
+                    continue
+                index.add(message_id, vector)
+                self.indexed += 1
+            while len(index.rows) > self.max_messages:
+                index.remove(next(iter(index.rows)))
+
+    def remove(self, user_id: str, message_id: str) -> None:
+        """Drop a message, e.g. after it was deleted."""
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None:
+                index.remove(message_id)
+
+    def search(
+        self, user_id: str, query: str, k: int = 5, min_score: float = 0.0
+    ) -> list[tuple[str, float]]:
+        """
+        Find the messages most similar to a free-text description.
+
+        Args:
+            user_id: Whose messages to search
+            query: Description such as "the email from John about the invoice"
+            k: Maximum number of results
+            min_score: Results scoring at or below this are left out
+
+        Returns:
+            (message ID, score) pairs, best first
+        """
+        query_vector = vectorize(query, self.dim)
+        self.searches += 1
+
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is None or not index.rows or not query_vector.any():
+                return []
+            self._users.move_to_end(user_id)
+
+            documents = len(index.rows)
+            idf = np.log((documents + 1) / (index.document_counts + 1), dtype=np.float32) + 1
+            weighted = query_vector * idf
+            weighted /= np.linalg.norm(weighted)
+            scores = index.vectors[: len(index.ids)] @ weighted
+            ids = list(index.ids)
+
+        top = np.argsort(-scores)[:k] if len(scores) <= k else np.argpartition(-scores, k)[:k]
+        results = [
+            (ids[row], float(scores[row]))
+            for row in top[np.argsort(-scores[top])]
+            if ids[row] is not None and scores[row] > min_score
+        ]
+        if results:
+            self.matches += 1
+        return results
+
+    def stats(self) -> dict[str, int]:
+        """Index size and how often searches found anything."""
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "messages": sum(len(index.rows) for index in self._users.values()),
+                "indexed": self.indexed,
+                "searches": self.searches,
+                "matches": self.matches,
+                "bytes": sum(index.vectors.nbytes for index in self._users.values()),
+            }
+
+
+# Singleton instance
+search_index = SearchIndex(
+    dim=settings.SEARCH_INDEX_DIM,
+    max_messages=settings.SEARCH_INDEX_MAX_MESSAGES_PER_USER,
+    max_users=settings.SEARCH_INDEX_MAX_USERS,
+)
@@ -0,0 +1,111 @@
+"""Share one underlying call between identical calls that overlap in time."""
+
+import asyncio
+import threading
+from collections import Counter
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    """One blocking call in progress, and its outcome once finished."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Coalesce duplicate in-flight calls, so retries and double submits cost one call.
+
+    A call is identified by an operation name and a key of its normalized
+    arguments, which callers scope to a user where the result is the user's.
+    While a call with the same operation and key is already running, later
+    callers wait for it and get its result, or its exception, instead of
+    making their own. Nothing is kept once the call finishes; this is not a
+    cache. ``run`` is for blocking calls made from worker threads and
+    ``run_async`` for coroutines on the event loop.
+    """
+
+    def __init__(self) -> None:
+        """Initialize with nothing in flight."""
+        self._flights: dict[tuple[str, Hashable], _Flight] = {}
+        self._tasks: dict[tuple[str, Hashable], asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.calls: Counter[str] = Counter()
+        self.coalesced: Counter[str] = Counter()
+
+    def run(self, operation: str, key: Hashable, call: Callable[[], T]) -> T:
+        """Return ``call()``, or the result of an identical call already running."""
+        with self._lock:
+            flight = self._flights.get((operation, key))
+            leader = flight is None
+            if leader:
+                flight = self._flights[operation, key] = _Flight()
+            self._count(operation, leader)
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = call()
+            return flight.result
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[operation, key]
+            flight.done.set()
+
+    async def run_async(self, operation: str, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await ``call()``, or an identical call already running.
+
+        The shared call runs as its own task, so one caller giving up (e.g. a
+        closed connection) does not cancel it for the others.
+        """
+        with self._lock:
+            task = self._tasks.get((operation, key))
+            leader = task is None
+            if leader:
+                task = asyncio.ensure_future(call())
+                self._tasks[operation, key] = task
+                task.add_done_callback(lambda done: self._forget(operation, key, done))
+            self._count(operation, leader)
+        return await asyncio.shield(task)
+
+    def _forget(self, operation: str, key: Hashable, task: asyncio.Task) -> None:
+        with self._lock:
+            self._tasks.pop((operation, key), None)
+        # Callers that are still waiting get the exception; don't also log it
+        # as never retrieved when they have all given up
+        if not task.cancelled():
+            task.exception()
+
+    def _count(self, operation: str, leader: bool) -> None:
+        self.calls[operation] += 1
+        if not leader:
+            self.coalesced[operation] += 1
+
+    def stats(self) -> dict[str, Any]:
+        """Calls and coalesced calls per operation, and calls in flight right now."""
+        with self._lock:
+            return {
+                "in_flight": len(self._flights) + len(self._tasks),
+                "operations": {
+                    operation: {"calls": calls, "coalesced": self.coalesced[operation]}
+                    for operation, calls in self.calls.items()
+                },
+            }
+
+
+# Singleton instance
+single_flight = SingleFlight()
@@ -0,0 +1,220 @@
+"""Google OAuth token management with proactive, single-flight refresh."""
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Coroutine
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+from app.core.config import settings
+from app.core.database import db
+from app.models.schemas import UserInDB, UserUpdate
+
+logger = logging.getLogger(__name__)
+
+GMAIL_SCOPES = [
+    "openid",
+    "https://www.googleapis.com/auth/userinfo.email",
+    "https://www.googleapis.com/auth/userinfo.profile",
+    "https://www.googleapis.com/auth/gmail.readonly",
+    "https://www.googleapis.com/auth/gmail.send",
+    "https://www.googleapis.com/auth/gmail.modify",
+]
+
+PERSIST_ATTEMPTS = 3
+
+
+def _utc_naive(value: datetime | None) -> datetime | None:
+    """google-auth compares expiry against naive UTC datetimes."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class _TokenState:
+    """The single Credentials object handed out for one user."""
+
+    def __init__(self, credentials: Credentials, refresh_token: str) -> None:
+        self.credentials = credentials
+        self.refresh_token = refresh_token
+        self.refresh_task: asyncio.Task | None = None
+
+
+class TokenManager:
+    """
+    Hand out valid Google credentials without refreshing on the request path.
+
+    Each user has one Credentials object that every request and pooled Gmail
+    client shares, so a refresh updates all of them in place. Tokens inside
+    ``refresh_margin_seconds`` of expiry are refreshed by a background task
+    while the still-valid token keeps being served; only an already expired
+    token makes the caller wait. Concurrent refreshes for a user collapse
+    into one task, and new tokens are written back to the database with
+    retries so other workers pick them up from the user row.
+    """
+
+    def __init__(self, refresh_margin_seconds: float, max_users: int) -> None:
+        """Initialize an empty token manager."""
+        self.refresh_margin = timedelta(seconds=refresh_margin_seconds)
+        self.max_users = max_users
+        self._states: OrderedDict[str, _TokenState] = OrderedDict()
+        self._lock = threading.Lock()
+        self._tasks: set[asyncio.Task] = set()
+        self._request = Request()
+        self.refreshes = 0
+        self.background_refreshes = 0
+        self.coalesced = 0
+        self.refresh_failures = 0
+        self.persist_failures = 0
+
+    def credentials_for(self, user: UserInDB) -> Credentials:
+        """
+        Return the shared credentials for ``user`` without refreshing them.
+
+        A token another worker refreshed and stored on the user row is adopted
+        when it outlives the one held here.
+        """
+        return self._state_for(user).credentials
+
+    def _state_for(self, user: UserInDB) -> _TokenState:
+        user_id = str(user.id)
+        user_expiry = _utc_naive(user.token_expiry)
+
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is None or state.refresh_token != user.refresh_token:
+                credentials = Credentials(
+                    token=user.access_token,
+                    refresh_token=user.refresh_token,
+                    token_uri="https://oauth2.googleapis.com/token",
+                    client_id=settings.GOOGLE_CLIENT_ID,
+                    client_secret=settings.GOOGLE_CLIENT_SECRET,
+                    scopes=GMAIL_SCOPES,
+                    expiry=user_expiry,
+                )
+                state = self._states[user_id] = _TokenState(credentials, user.refresh_token)
+                while len(self._states) > self.max_users:
+                    self._states.popitem(last=False)
+            else:
+                credentials = state.credentials
+                if (
+                    user.access_token
+                    and user_expiry is not None
+                    and (credentials.expiry is None or user_expiry > credentials.expiry)
+                ):
+                    credentials.token = user.access_token
+                    credentials.expiry = user_expiry
+            self._states.move_to_end(user_id)
+            return state
+
+    async def get_credentials(self, user: UserInDB) -> Credentials:
+        """
+        Return credentials that are valid right now.
+
+        Raises:
+            ValueError: If the token had expired and could not be refreshed
+        """
+        state = self._state_for(user)
+        credentials = state.credentials
+
+        if not credentials.token or (
+            credentials.expiry is not None and credentials.expiry <= _utcnow()
+        ):
+            # Shielded so a caller giving up does not cancel the shared refresh
+            await asyncio.shield(self._refresh(user, state))
+        elif credentials.expiry is not None and (
+            credentials.expiry - _utcnow() <= self.refresh_margin
+        ):
+            self.background_refreshes += 1
+            self._refresh(user, state)
+
+        return credentials
+
+    def _refresh(self, user: UserInDB, state: _TokenState) -> asyncio.Task:
+        """Start a refresh for ``user``, or join the one already in flight."""
+        if state.refresh_task is not None and not state.refresh_task.done():
+            self.coalesced += 1
+            return state.refresh_task
+
+        state.refresh_task = self._track(self._do_refresh(user, state))
+        return state.refresh_task
+
+    def _track(self, coroutine: Coroutine[Any, Any, None]) -> asyncio.Task:
+        """Run ``coroutine`` as a task that is kept alive until it finishes."""
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._on_task_done)
+        return task
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        # Failures are logged where they happen; retrieving the exception keeps
+        # background tasks nobody awaited from warning at shutdown
+        if not task.cancelled():
+            task.exception()
+
+    async def _do_refresh(self, user: UserInDB, state: _TokenState) -> None:
+        credentials = state.credentials
+        try:
+            await asyncio.to_thread(credentials.refresh, self._request)
+        except RefreshError as error:
+            self.refresh_failures += 1
+            logger.warning("Token refresh failed for user %s: %s", user.id, error)
+            raise ValueError("Google authorization has expired. Please sign in again.") from error
+
+        self.refreshes += 1
+        # Callers waiting on the refresh should not also wait on the database
+        self._track(self._persist(user, credentials))
+
+    async def _persist(self, user: UserInDB, credentials: Credentials) -> None:
+        """Store refreshed tokens, retrying transient database failures."""
+        update = UserUpdate(
+            access_token=credentials.token,
+            token_expiry=(
+                credentials.expiry.replace(tzinfo=timezone.utc) if credentials.expiry else None
+            ),
+        )
+        for attempt in range(1, PERSIST_ATTEMPTS + 1):
+            try:
+                await db.update_user(user.id, update)
+                return
+            except Exception as error:
+                if attempt == PERSIST_ATTEMPTS:
+                    self.persist_failures += 1
+                    logger.error("Could not store refreshed token for %s: %s", user.id, error)
+                    return
+                await asyncio.sleep(0.2 * 2**attempt)
+
+    async def aclose(self) -> None:
+        """Wait for in-flight refreshes so their tokens are persisted before exit."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict[str, int]:
+        """Refresh counters."""
+        return {
+            "users": len(self._states),
+            "refreshes": self.refreshes,
+            "background_refreshes": self.background_refreshes,
+            "coalesced": self.coalesced,
+            "refresh_failures": self.refresh_failures,
+            "persist_failures": self.persist_failures,
+            "in_flight": len(self._tasks),
+        }
+
+
+# Singleton instance
+token_manager = TokenManager(
+    refresh_margin_seconds=settings.TOKEN_REFRESH_MARGIN_SECONDS,
+    max_users=settings.TOKEN_MANAGER_MAX_USERS,
+)
@@ -0,0 +1,168 @@
+"""In-memory cache of users by ID, kept consistent across workers."""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any
+from uuid import UUID
+
+from realtime import AsyncRealtimeChannel, AsyncRealtimeClient, BroadcastPayload
+
+from app.core.config import settings
+from app.core.database import db
+from app.models.schemas import UserInDB
+
+logger = logging.getLogger(__name__)
+
+# Realtime channel and event that carry invalidations between workers
+BROADCAST_CHANNEL = "user-cache"
+BROADCAST_EVENT = "invalidate"
+
+
+class UserCache:
+    """
+    Users by ID for ``Database.get_user_by_id``, so chat requests skip a round trip.
+
+    Entries expire after ``ttl_seconds`` and at most ``max_users`` are kept,
+    least recently used first out. ``invalidate`` drops a user whose row was
+    written, here and, once ``start_broadcast`` has connected to Supabase
+    Realtime, on every other worker, so a token refreshed by one worker is
+    not served stale by the rest. Should a broadcast be lost, the TTL still
+    bounds how long a stale entry lives.
+
+    A lookup that started before an invalidation may return the row as it
+    was; ``begin`` and ``put`` keep such a result from being cached.
+    """
+
+    def __init__(self, ttl_seconds: float, max_users: int) -> None:
+        """Initialize an empty cache, not yet connected to other workers."""
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self._users: OrderedDict[UUID, tuple[float, UserInDB]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._origin = uuid.uuid4().hex
+        self._realtime: AsyncRealtimeClient | None = None
+        self._channel: AsyncRealtimeChannel | None = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.remote_invalidations = 0
+        self.broadcast_failures = 0
+
+    def get(self, user_id: UUID) -> UserInDB | None:
+        """A copy of the cached user, or None if not cached or expired."""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._users[user_id]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._users.move_to_end(user_id)
+            self.hits += 1
+            return entry[1].model_copy()
+
+    def begin(self) -> int:
+        """Mark the start of a database lookup; pass the result to ``put``."""
+        with self._lock:
+            return self._generation
+
+    def put(self, user: UserInDB, generation: int | None = None) -> None:
+        """
+        Cache ``user``.
+
+        Args:
+            user: The user as just read from or written to the database
+            generation: What ``begin`` returned before the read; the user is
+                not cached if anything was invalidated since. Omit for rows
+                returned by a write, which are current.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._users[user.id] = (time.monotonic(), user.model_copy())
+            self._users.move_to_end(user.id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def drop(self, user_id: UUID) -> None:
+        """Forget a user on this worker only."""
+        with self._lock:
+            self._users.pop(user_id, None)
+            self._generation += 1
+
+    async def invalidate(self, user_id: UUID) -> None:
+        """Forget a user on this worker and tell the others to do the same."""
+        self.drop(user_id)
+        self.invalidations += 1
+        if self._channel is None:
+            return
+        try:
+            await self._channel.send_broadcast(
+                BROADCAST_EVENT, {"id": str(user_id), "origin": self._origin}
+            )
+        except Exception as error:
+            self.broadcast_failures += 1
+            logger.warning("Could not broadcast user cache invalidation: %s", error)
+
+    async def start_broadcast(self, url: str, key: str) -> None:
+        """
+        Share invalidations with other workers over a Supabase Realtime broadcast channel.
+
+        If Realtime cannot be reached the worker still starts; its entries
+        then only expire with the TTL.
+
+        Args:
+            url: Supabase project URL
+            key: Supabase key allowed to use Realtime
+        """
+        realtime = AsyncRealtimeClient(f"{url}/realtime/v1", token=key)
+        try:
+            await realtime.connect()
+            channel = realtime.channel(BROADCAST_CHANNEL)
+            channel.on_broadcast(BROADCAST_EVENT, self._on_broadcast)
+            await channel.subscribe()
+        except Exception as error:
+            logger.warning("User cache invalidations will not be shared: %s", error)
+            return
+        self._realtime, self._channel = realtime, channel
+
+    def _on_broadcast(self, message: BroadcastPayload) -> None:
+        payload = message["payload"]
+        if payload.get("origin") == self._origin:
+            return
+        self.drop(UUID(payload["id"]))
+        self.remote_invalidations += 1
+
+    async def aclose(self) -> None:
+        """Leave the broadcast channel, if connected."""
+        if self._realtime is not None:
+            await self._realtime.close()
+            self._realtime = self._channel = None
+
+    def stats(self) -> dict[str, Any]:
+        """Hit rate, size and invalidation counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "users": len(self._users),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "invalidations": self.invalidations,
+                "remote_invalidations": self.remote_invalidations,
+                "broadcast_connected": self._channel is not None,
+                "broadcast_failures": self.broadcast_failures,
+            }
+
+
+# Singleton instance
+user_cache = UserCache(
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+    max_users=settings.USER_CACHE_MAX_USERS,
+)
+db.use_user_cache(user_cache)
@@ -0,0 +1,23 @@
+"""
+Performance benchmarks. Run from the backend directory, e.g.:
+
+    python -m benchmarks.chat_concurrency
+
+Placeholder settings are filled in so the app imports without real credentials.
+"""
+
+import os
+
+for _name in (
+    "GOOGLE_CLIENT_ID",
+    "GOOGLE_CLIENT_SECRET",
+    "GOOGLE_REDIRECT_URI",
+    "SUPABASE_KEY",
+    "GEMINI_API_KEY",
+):
+    os.environ.setdefault(_name, "benchmark")
+os.environ.setdefault("SUPABASE_URL", "https://benchmark.supabase.co")
+# supabase-py validates that the service key looks like a JWT
+os.environ.setdefault(
+    "SUPABASE_SERVICE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.benchmark"
+)
@@ -0,0 +1,103 @@
+"""
+Gemini calls and accuracy of categorization, Gemini only vs local classifier first.
+
+Simulates one user categorizing their inbox ``--requests`` times as new mail
+arrives, 20 emails at a time. Emails come from category-typical senders with
+category-typical subjects, plus a share of ambiguous ones; the stand-in model
+always answers with the true category, so accuracy measures what the local
+classifier gets wrong when it answers instead.
+
+``gemini`` categorizes without a user ID, the old behaviour. ``classifier``
+passes one, so confident emails are labelled locally and Gemini's answers
+train the model.
+
+Usage:
+    python -m benchmarks.categorize --requests 50 --latency-ms 800
+"""
+
+import argparse
+import random
+import time
+from typing import Any
+from uuid import uuid4
+
+from app.services.ai_service import AIService
+from app.services.category_classifier import category_classifier
+from benchmarks.fake_gemini import FakeModel
+
+SENDERS = {
+    "Work": ["jira@acme-corp.com", "manager@acme-corp.com", "github@notifications.github.com"],
+    "Personal": ["mom@gmail.com", "alex.friend@yahoo.com", "book.club@gmail.com"],
+    "Promotions": ["deals@shopmart.com", "news@fashionhub.com", "offers@travelzone.com"],
+    "Urgent": ["security@bank.com", "alerts@acme-corp.com", "it-helpdesk@acme-corp.com"],
+}
+SUBJECTS = {
+    "Work": ["Sprint planning notes", "Q3 roadmap review", "PR #{n} ready for review"],
+    "Personal": ["Dinner on Sunday?", "Photos from the trip", "Book club pick for June"],
+    "Promotions": ["50% off everything this weekend", "Your exclusive offer inside"],
+    "Urgent": ["Action required: suspicious sign-in", "Production outage in progress"],
+}
+SNIPPETS = {
+    "Work": "Please review the attached document before our sync with the team",
+    "Personal": "Hope you are doing well, it was great to see you last week",
+    "Promotions": "Shop now and save big, limited time only. Unsubscribe here",
+    "Urgent": "Immediate action is needed, please respond as soon as possible",
+}
+
+
+def make_email(index: int, rng: random.Random, ambiguous: float) -> tuple[dict[str, Any], str]:
+    category = rng.choice(list(SENDERS))
+    # Ambiguous emails borrow sender and wording from other categories
+    sender_category = rng.choice(list(SENDERS)) if rng.random() < ambiguous else category
+    snippet_category = rng.choice(list(SENDERS)) if rng.random() < ambiguous else category
+    subject = rng.choice(SUBJECTS[category]).format(n=rng.randint(100, 999))
+    email = {
+        "id": f"m{index:06d}",
+        "from": rng.choice(SENDERS[sender_category]),
+        "subject": f"{subject} [{index}]",
+        "snippet": SNIPPETS[snippet_category],
+    }
+    return email, category
+
+
+def run(label: str, batches: list[list[tuple[dict, str]]], latency: float, user: Any) -> None:
+    service = AIService()
+    truth = {email["subject"]: category for batch in batches for email, category in batch}
+    service.model = FakeModel(latency, categorize=truth.__getitem__)
+
+    correct = total = 0
+    started = time.perf_counter()
+    for batch in batches:
+        categories = service.categorize_emails([email for email, _ in batch], user)
+        for category, emails in categories.items():
+            correct += sum(truth[email["subject"]] == category for email in emails)
+            total += len(emails)
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{label:>10}: {elapsed:6.2f} s  gemini_calls={service.usage['calls']:3d}  "
+        f"prompt_tokens={service.usage['prompt_tokens']:6d}  "
+        f"accuracy={correct / total:.1%}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=800.0)
+    parser.add_argument("--ambiguous", type=float, default=0.15, help="share of mixed signals")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    batches = [
+        [make_email(request * 20 + offset, rng, args.ambiguous) for offset in range(20)]
+        for request in range(args.requests)
+    ]
+
+    run("gemini", batches, args.latency_ms / 1000, None)
+    run("classifier", batches, args.latency_ms / 1000, uuid4())
+    print(category_classifier.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Wall time of categorizing a large inbox, one chunk after another vs in parallel.
+
+Categorizes ``--emails`` emails without a user ID, so every email goes to the
+stand-in model, ``CATEGORIZE_CHUNK_SIZE`` at a time. ``sequential`` is
+AIService.categorize_emails; ``parallel`` is iter_categorization with
+``CATEGORIZE_CONCURRENCY`` chunks in flight. A ``--failure-rate`` share of
+calls fails, so both also show how many emails still end up labelled by
+Gemini after retries rather than by the keyword fallback.
+
+Usage:
+    python -m benchmarks.categorize_large --emails 1000 --latency-ms 800
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections.abc import AsyncIterator
+
+from app.core.config import settings
+from app.services.ai_service import AIService
+from app.services.gmail_service import GMAIL_BATCH_LIMIT
+from benchmarks.categorize import make_email
+from benchmarks.fake_gemini import FakeModel
+
+
+async def in_batches(emails: list[dict]) -> AsyncIterator[list[dict]]:
+    """Hand emails over in chunks, the way AsyncGmailService.iter_emails does."""
+    for start in range(0, len(emails), GMAIL_BATCH_LIMIT):
+        yield emails[start : start + GMAIL_BATCH_LIMIT]
+
+
+async def drain(service: AIService, emails: list[dict]) -> tuple[dict[str, list[dict]], int]:
+    """Run iter_categorization to the end; return the categories and progress events seen."""
+    events = 0
+    categories: dict[str, list[dict]] = {}
+    async for _, _, result in service.iter_categorization(in_batches(emails)):
+        if result is None:
+            events += 1
+        else:
+            categories = result
+    return categories, events
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--emails", type=int, default=settings.CATEGORIZE_MAX_EMAILS)
+    parser.add_argument("--latency-ms", type=float, default=800.0)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    labelled = [make_email(index, rng, ambiguous=0.15) for index in range(args.emails)]
+    emails = [email for email, _ in labelled]
+    truth = {email["subject"]: category for email, category in labelled}
+
+    for label in ("sequential", "parallel"):
+        service = AIService()
+        service.model = FakeModel(
+            args.latency_ms / 1000, categorize=truth.__getitem__, failure_rate=args.failure_rate
+        )
+
+        started = time.perf_counter()
+        if label == "sequential":
+            categories, events = service.categorize_emails(emails), 0
+        else:
+            categories, events = asyncio.run(drain(service, emails))
+        elapsed = time.perf_counter() - started
+
+        correct = sum(
+            truth[email["subject"]] == category
+            for category, members in categories.items()
+            for email in members
+        )
+        print(
+            f"{label:>10}: {elapsed:6.2f} s  gemini_calls={service.usage['calls']:3d}  "
+            f"progress_events={events:3d}  accuracy={correct / len(emails):.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
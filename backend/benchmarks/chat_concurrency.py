@@ -0,0 +1,186 @@
+"""
+Latency of concurrent /chat/message calls against a fake Gmail server.
+
+Compares three ways of serving the "show N emails" intent:
+
+- ``serial``: the original handler, one blocking messages.get per email on
+  the event loop
+- ``batch``: blocking batch retrieval on the event loop
+- ``async``: AsyncGmailService, which releases the loop during Gmail I/O
+
+Database and Gemini calls are replaced with in-memory stand-ins so only the
+Gmail path is measured. The parsed-message cache is cleared before every
+request unless ``--warm-cache`` is given.
+
+Usage:
+    python -m benchmarks.chat_concurrency --clients 8 --rounds 3 --emails 10
+"""
+
+import argparse
+import asyncio
+import socket
+import statistics
+import threading
+import time
+from collections.abc import AsyncIterator
+from datetime import datetime, timezone
+from typing import Any
+from uuid import uuid4
+
+import httplib2
+import httpx
+import uvicorn
+from googleapiclient.discovery import build_from_document
+
+from app.models.schemas import UserInDB
+from app.routers import chat
+from app.services import gmail_service
+from app.services.ai_service import AIService
+from app.services.gmail_client_pool import gmail_client_pool
+from app.services.message_cache import message_cache
+from benchmarks.fake_gmail import FakeGmail
+from main import app
+
+
+class FakeDatabase:
+    """In-memory replacement for the chat router's database calls."""
+
+    def __init__(self, user: UserInDB) -> None:
+        self.user = user
+
+    async def get_user_by_id(self, _user_id: Any) -> UserInDB:
+        return self.user
+
+    async def save_chat_message(self, *_args: Any, **_kwargs: Any) -> None:
+        return None
+
+    async def get_email_summaries(self, *_args: Any) -> dict[str, str]:
+        return {}
+
+    async def save_email_summaries(self, *_args: Any) -> None:
+        return None
+
+
+async def snippet_summaries(
+    _self: AIService, _user_id: Any, emails: list[dict[str, Any]]
+) -> AsyncIterator[dict[str, str]]:
+    """Stand-in for Gemini summaries, so only Gmail work is measured."""
+    yield {email["id"]: email["snippet"] for email in emails}
+
+
+class BlockingGmailService(gmail_service.AsyncGmailService):
+    """Runs Gmail calls directly on the event loop, like the handler used to."""
+
+    batch = False
+
+    async def fetch_emails(self, max_results: int = 10, query: str = "") -> list[dict[str, Any]]:
+        return self.gmail.fetch_emails(max_results=max_results, query=query, batch=self.batch)
+
+
+class BlockingBatchGmailService(BlockingGmailService):
+    batch = True
+
+
+MODES = {
+    "serial": BlockingGmailService,
+    "batch": BlockingBatchGmailService,
+    "async": gmail_service.AsyncGmailService,
+}
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+async def run_mode(base_url: str, mode: str, user: UserInDB, args: argparse.Namespace) -> None:
+    chat.AsyncGmailService = MODES[mode]
+    latencies: list[float] = []
+
+    async def client(http: httpx.AsyncClient) -> None:
+        for _ in range(args.rounds):
+            if not args.warm_cache:
+                message_cache.invalidate(str(user.id))
+            start = time.perf_counter()
+            response = await http.post(
+                "/chat/message",
+                params={"user_id": str(user.id)},
+                json={"message": f"show {args.emails} emails", "conversation_history": []},
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(args.clients)))
+        elapsed = time.perf_counter() - started
+
+    print(
+        f"{mode:>7}: p50={statistics.median(latencies) * 1000:8.1f} ms  "
+        f"p99={percentile(latencies, 99) * 1000:8.1f} ms  "
+        f"throughput={len(latencies) / elapsed:6.2f} req/s"
+    )
+
+
+def start_server() -> tuple[uvicorn.Server, str]:
+    """Serve the app on its own thread and event loop, like a single uvicorn worker."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--emails", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--body-kb", type=float, default=2.0)
+    parser.add_argument(
+        "--warm-cache", action="store_true", help="keep parsed messages cached between requests"
+    )
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    fake = FakeGmail(
+        message_count=max(args.emails, 50),
+        latency=args.latency_ms / 1000,
+        body_size=int(args.body_kb * 1000),
+    ).start()
+    gmail_client_pool._service = build_from_document(
+        fake.discovery_document(), http=httplib2.Http()
+    )
+
+    now = datetime.now(timezone.utc)
+    user = UserInDB(
+        id=uuid4(),
+        email="bench@example.com",
+        google_id="bench",
+        refresh_token="refresh",
+        access_token="access",
+        created_at=now,
+        updated_at=now,
+    )
+    chat.db = FakeDatabase(user)
+    AIService.iter_summaries = snippet_summaries
+
+    print(
+        f"{args.clients} clients x {args.rounds} rounds, {args.emails} emails per request, "
+        f"{args.latency_ms:.0f} ms Gmail latency, ~{args.body_kb:g} KB bodies"
+    )
+    server, base_url = start_server()
+    try:
+        for mode in args.modes:
+            asyncio.run(run_mode(base_url, mode, user, args))
+    finally:
+        server.should_exit = True
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Time to first byte of /chat/message vs /chat/stream.
+
+Each scenario sends the same chat message to both endpoints, one request at
+a time, and records when the first byte of the body arrived, when the first
+content (an email header or generated text) arrived, and when the response
+finished. Gmail is the fake server from ``fake_gmail`` and Gemini
+a stand-in with a fixed delay per call plus a delay per streamed word.
+Stored summaries are cleared before every request, so every listing
+summarizes its emails afresh.
+
+Usage:
+    python -m benchmarks.chat_stream --rounds 5 --gemini-ms 800 --token-ms 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import httplib2
+import httpx
+from googleapiclient.discovery import build_from_document
+
+from app.models.schemas import UserInDB
+from app.routers import chat
+from app.services import ai_service, enrichment_store
+from app.services.gmail_client_pool import gmail_client_pool
+from benchmarks.chat_concurrency import FakeDatabase, start_server
+from benchmarks.fake_gemini import FakeModel
+from benchmarks.fake_gmail import FakeGmail
+
+SCENARIOS = {
+    "list": "show me 20 emails",
+    "reply": "reply to email #1",
+    "digest": "give me today's digest",
+    "query": "what should I focus on this morning?",
+}
+
+# Stream events that show the user something; /chat/message only has the final body
+CONTENT_EVENTS = {"event: email", "event: token"}
+
+
+async def measure(http: httpx.AsyncClient, path: str, user: UserInDB, message: str) -> tuple:
+    enrichment_store.enrichment_store._entries.clear()
+    start = time.perf_counter()
+    first_byte = first_content = None
+    async with http.stream(
+        "POST",
+        path,
+        params={"user_id": str(user.id)},
+        json={"message": message, "conversation_history": []},
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            if first_content is None and line in CONTENT_EVENTS:
+                first_content = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return first_byte, first_content or total, total
+
+
+async def run(base_url: str, user: UserInDB, args: argparse.Namespace) -> None:
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as http:
+        # Prime the listing that "reply to email #1" resolves against
+        await measure(http, "/chat/message", user, SCENARIOS["list"])
+
+        for name, message in SCENARIOS.items():
+            for path in ("/chat/message", "/chat/stream"):
+                samples = [await measure(http, path, user, message) for _ in range(args.rounds)]
+                print(
+                    f"{name:>6} {path:<13}: "
+                    f"ttfb p50={statistics.median(s[0] for s in samples) * 1000:7.1f} ms  "
+                    f"first content p50={statistics.median(s[1] for s in samples) * 1000:7.1f} ms  "
+                    f"total p50={statistics.median(s[2] for s in samples) * 1000:7.1f} ms"
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Gmail latency")
+    parser.add_argument("--gemini-ms", type=float, default=800.0, help="Gemini latency per call")
+    parser.add_argument("--token-ms", type=float, default=20.0, help="delay per streamed word")
+    args = parser.parse_args()
+
+    fake = FakeGmail(message_count=50, latency=args.latency_ms / 1000, body_size=2000).start()
+    gmail_client_pool._service = build_from_document(
+        fake.discovery_document(), http=httplib2.Http()
+    )
+
+    now = datetime.now(timezone.utc)
+    user = UserInDB(
+        id=uuid4(),
+        email="bench@example.com",
+        google_id="bench",
+        refresh_token="refresh",
+        access_token="access",
+        created_at=now,
+        updated_at=now,
+    )
+    chat.db = enrichment_store.db = FakeDatabase(user)
+    model = FakeModel(args.gemini_ms / 1000, args.token_ms / 1000)
+    ai_service.genai.GenerativeModel = lambda _name: model
+
+    server, base_url = start_server()
+    try:
+        asyncio.run(run(base_url, user, args))
+    finally:
+        server.should_exit = True
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
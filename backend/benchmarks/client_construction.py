@@ -0,0 +1,90 @@
+"""
+Time spent constructing Gmail clients per request, before and after pooling.
+
+``per-request`` reproduces the old behaviour: parse the discovery document,
+build a service object and open a fresh connection for every request.
+``pooled`` goes through GmailClientPool, which parses the document once and
+keeps connections alive. Both then make one API call to a fake Gmail server.
+
+Usage:
+    python -m benchmarks.client_construction --requests 50
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import httplib2
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+
+from app.models.schemas import UserInDB
+from app.services.gmail_client_pool import GmailClientPool
+from benchmarks.fake_gmail import FakeGmail
+
+
+def report(label: str, construct: list[float], call: list[float]) -> None:
+    print(
+        f"{label:>11}: construct mean={statistics.mean(construct) * 1000:7.2f} ms  "
+        f"first call p50={statistics.median(call) * 1000:7.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    fake = FakeGmail(message_count=10, latency=0.0).start()
+    document = json.dumps(fake.discovery_document())
+    credentials = Credentials(token="benchmark")
+
+    construct: list[float] = []
+    call: list[float] = []
+    for _ in range(args.requests):
+        started = time.perf_counter()
+        service = build_from_document(document, http=httplib2.Http())
+        http = AuthorizedHttp(credentials, http=httplib2.Http())
+        construct.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        service.users().getProfile(userId="me").execute(http=http)
+        call.append(time.perf_counter() - started)
+    report("per-request", construct, call)
+
+    now = datetime.now(timezone.utc)
+    user = UserInDB(
+        id=uuid4(),
+        email="bench@example.com",
+        google_id="bench",
+        refresh_token="refresh",
+        access_token="benchmark",
+        created_at=now,
+        updated_at=now,
+    )
+    pool = GmailClientPool(idle_seconds=600, max_clients=10)
+    pool._service = build_from_document(document, http=httplib2.Http())
+
+    construct.clear()
+    call.clear()
+    for _ in range(args.requests):
+        started = time.perf_counter()
+        client = pool.acquire(user, credentials)
+        http = client.http()
+        construct.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        client.service.users().getProfile(userId="me").execute(http=http)
+        call.append(time.perf_counter() - started)
+    report("pooled", construct, call)
+    print(f"pool stats: {pool.stats()}")
+
+    fake.stop()
+
+
+if __name__ == "__main__":
+    main()
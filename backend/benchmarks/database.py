@@ -0,0 +1,108 @@
+"""
+Request latency and event-loop stalls with blocking vs async Database calls.
+
+``--requests`` concurrent requests on one event loop each make the round
+trips /chat/message makes to the database: look up the user, store the
+user's message, store the reply. The database is ``fake_postgrest`` with
+``--latency-ms`` per round trip. ``blocking`` runs the same queries with
+the synchronous PostgREST client, as Database did before; ``async`` is
+Database. A ticker on the same loop measures how late it is woken, which
+is how long every other request on the worker is held up. Latencies count
+from when all requests arrived.
+
+Usage:
+    python -m benchmarks.database --requests 50 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any
+from uuid import UUID
+
+from postgrest import APIResponse, SyncPostgrestClient
+
+from app.core.config import settings
+from app.core.database import Database
+from app.models.schemas import UserCreate
+from benchmarks.fake_postgrest import FakePostgrest
+
+
+class BlockingDatabase(Database):
+    """Database with the synchronous client, calling ``execute()`` on the event loop."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        key = settings.SUPABASE_SERVICE_KEY
+        self.client = SyncPostgrestClient(
+            f"{settings.SUPABASE_URL}/rest/v1",
+            headers={
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+                "apikey": key,
+                "Authorization": f"Bearer {key}",
+            },
+        )
+
+    async def _execute(self, query: Any) -> APIResponse:
+        return query.execute()
+
+
+async def chat_request(db: Database, user_id: UUID, started: float) -> float:
+    """Seconds from when every request arrived until this one is answered."""
+    await db.get_user_by_id(user_id)
+    await db.save_chat_message(user_id, "user", "show my unread emails")
+    await db.save_chat_message(user_id, "assistant", "You have 3 unread emails.")
+    return time.perf_counter() - started
+
+
+async def run(label: str, db: Database, user_id: UUID, args: argparse.Namespace) -> None:
+    stalls: list[float] = []
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls.append(time.perf_counter() - started - 0.005)
+
+    ticking = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    latencies = sorted(
+        await asyncio.gather(*(chat_request(db, user_id, started) for _ in range(args.requests)))
+    )
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticking
+
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{label:>8}: {args.requests} requests in {elapsed * 1000:7.1f} ms  "
+        f"p50={statistics.median(latencies) * 1000:7.1f} ms  p99={p99 * 1000:7.1f} ms  "
+        f"max_loop_stall={max(stalls, default=0) * 1000:7.1f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    fake = FakePostgrest(latency=args.latency_ms / 1000).start()
+    settings.SUPABASE_URL = fake.url
+    try:
+        for label, db in {"blocking": BlockingDatabase(), "async": Database()}.items():
+            user = await db.create_user(
+                UserCreate(email=f"{label}@example.com", google_id=label, refresh_token="r")
+            )
+            await run(label, db, user.id, args)
+            await db.aclose()
+        print(db.stats())
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
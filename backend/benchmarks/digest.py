@@ -0,0 +1,93 @@
+"""
+Gemini calls, prompt tokens and wall time of full-day digests.
+
+Simulates a heavy user's day of ``--emails`` emails, asking for a digest
+once, again straight away, and again after ``--new`` more emails arrive.
+``single`` is the digest as it was before group summaries: only the newest
+20 emails, listed in one prompt. ``hierarchical`` is
+summarize_digest_groups followed by generate_daily_digest, with group
+summaries kept in the in-process enrichment store between requests.
+``sent`` is how many of the day's emails this request's prompts listed;
+emails whose group summary was stored earlier are covered without it.
+
+Usage:
+    python -m benchmarks.digest --emails 600 --new 10 --latency-ms 800
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from uuid import uuid4
+
+from app.services import enrichment_store
+from app.services.ai_service import AIService
+from benchmarks.categorize import make_email
+from benchmarks.categorize_large import in_batches
+from benchmarks.chat_concurrency import FakeDatabase
+from benchmarks.fake_gemini import FakeModel
+
+
+class RecordingModel(FakeModel):
+    """FakeModel that keeps every prompt it was sent."""
+
+    def __init__(self, latency: float) -> None:
+        super().__init__(latency)
+        self.prompts: list[str] = []
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs: object) -> object:
+        self.prompts.append(prompt)
+        return super().generate_content(prompt, stream=stream, **kwargs)
+
+
+def single(service: AIService, day: list[dict]) -> None:
+    service.generate_daily_digest(day[:20])
+
+
+def hierarchical(service: AIService, day: list[dict], user_id: object) -> None:
+    _, group_summaries = asyncio.run(service.summarize_digest_groups(user_id, in_batches(day)))
+    service.generate_daily_digest(day, group_summaries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--emails", type=int, default=600)
+    parser.add_argument("--new", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=800.0)
+    args = parser.parse_args()
+
+    enrichment_store.db = FakeDatabase(None)
+    rng = random.Random(7)
+    # Newest first, as Gmail lists them
+    mail = [make_email(index, rng, ambiguous=0.15)[0] for index in range(args.emails + args.new)]
+    mail.reverse()
+    requests = {
+        "first": mail[args.new :],
+        "repeat": mail[args.new :],
+        "new mail": mail,
+    }
+
+    for label in ("single", "hierarchical"):
+        user_id = uuid4()
+        for request, day in requests.items():
+            service = AIService()
+            service.model = RecordingModel(args.latency_ms / 1000)
+            started = time.perf_counter()
+            if label == "single":
+                single(service, day)
+            else:
+                hierarchical(service, day, user_id)
+            elapsed = time.perf_counter() - started
+
+            prompts = "\n".join(service.model.prompts)
+            sent = sum(email["subject"] in prompts for email in day)
+            print(
+                f"{label:>12} {request:<8}: {elapsed:6.2f} s  "
+                f"gemini_calls={service.usage['calls']:3d}  "
+                f"prompt_tokens={service.usage['prompt_tokens']:6d}  "
+                f"sent={sent}/{len(day)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Stand-in for a Gemini GenerativeModel with configurable latency."""
+
+import json
+import random
+import re
+import time
+from collections.abc import Callable, Iterator
+from types import SimpleNamespace
+from typing import Any
+
+from google.api_core.exceptions import ResourceExhausted
+
+SUMMARY = "The sender asks for an update on the quarterly report before Friday."
+
+REPLY = (
+    "Thanks for the reminder. I will send the updated quarterly report by Thursday "
+    "afternoon and flag anything that needs your review before the Friday meeting."
+)
+
+
+class FakeStream:
+    """Iterates like a streamed Gemini response, one word per chunk."""
+
+    def __init__(self, text: str, usage: SimpleNamespace, token_latency: float) -> None:
+        self.text = text
+        self.usage_metadata = usage
+        self.token_latency = token_latency
+
+    def __iter__(self) -> Iterator[SimpleNamespace]:
+        for word in re.findall(r"\S+\s*", self.text):
+            time.sleep(self.token_latency)
+            yield SimpleNamespace(candidates=[word], parts=[word], text=word)
+
+
+class FakeModel:
+    """
+    Answers like Gemini, with estimated token counts.
+
+    Every call waits ``latency`` before answering; streamed responses then
+    wait ``token_latency`` before each word. Summarization prompts get a JSON
+    object keyed by the message IDs they list, categorization prompts one
+    keyed by email index with labels from ``categorize`` (given each email's
+    subject), and everything else a canned reply. A ``failure_rate`` share of
+    calls is turned down with a 429 after the wait.
+    """
+
+    def __init__(
+        self,
+        latency: float,
+        token_latency: float = 0.0,
+        categorize: Callable[[str], str] | None = None,
+        failure_rate: float = 0.0,
+    ) -> None:
+        self.latency = latency
+        self.token_latency = token_latency
+        self.categorize = categorize or (lambda _subject: "Work")
+        self.failure_rate = failure_rate
+        self._random = random.Random(7)
+
+    def generate_content(self, prompt: str, stream: bool = False, **_kwargs: Any) -> Any:
+        time.sleep(self.latency)
+        if self._random.random() < self.failure_rate:
+            raise ResourceExhausted("Resource has been exhausted (e.g. check quota).")
+        message_ids = re.findall(r"^\[id: (\S+)\]$", prompt, re.MULTILINE)
+        listed = re.findall(r"^(\d+): From=.*?, Subject=(.*?), Snippet=", prompt, re.MULTILINE)
+        if message_ids:
+            text = json.dumps(dict.fromkeys(message_ids, SUMMARY))
+        elif listed:
+            text = json.dumps({index: self.categorize(subject) for index, subject in listed})
+        else:
+            text = REPLY
+        usage = SimpleNamespace(
+            prompt_token_count=len(prompt) // 4,
+            candidates_token_count=len(text) // 4,
+        )
+        if stream:
+            return FakeStream(text, usage, self.token_latency)
+        return SimpleNamespace(text=text, usage_metadata=usage)
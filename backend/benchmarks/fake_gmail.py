@@ -0,0 +1,251 @@
+"""In-process fake of the Gmail REST API for local benchmarks."""
+
+import base64
+import json
+import multiprocessing
+import re
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from googleapiclient.discovery_cache import get_static_doc
+
+
+def _b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii")
+
+
+def make_message(index: int, body_size: int = 20_000) -> dict:
+    html = "<html><body>" + (
+        f"<p>Update {index}: quarterly numbers and the <b>invoice</b> are attached.</p>" * 8
+    )
+    html += (
+        "<table>" + "<tr><td>Promo item</td><td>$9.99</td></tr>" * (body_size // 40) + "</table>"
+    )
+    html += "<style>p{color:red}</style></body></html>"
+    return {
+        "id": f"m{index:05d}",
+        "threadId": f"t{index:05d}",
+        "labelIds": ["INBOX", "UNREAD"] if index % 3 else ["INBOX"],
+        "snippet": f"Update {index}: quarterly numbers and the invoice",
+        "historyId": str(1000 + index),
+        "sizeEstimate": len(html),
+        "payload": {
+            "mimeType": "multipart/alternative",
+            "headers": [
+                {"name": "From", "value": f"Sender {index % 7} <sender{index % 7}@example.com>"},
+                {"name": "To", "value": "me@example.com"},
+                {"name": "Subject", "value": f"Report #{index}"},
+                {"name": "Date", "value": "Mon, 5 Oct 2026 09:00:00 +0000"},
+            ],
+            "parts": [
+                {"mimeType": "text/html", "body": {"data": _b64(html), "size": len(html)}},
+            ],
+        },
+    }
+
+
+class FakeGmail:
+    """Serve a synthetic mailbox with a fixed per-request latency."""
+
+    def __init__(
+        self, message_count: int = 200, latency: float = 0.05, body_size: int = 20_000
+    ) -> None:
+        # Newest first, like messages.list
+        self.messages = [make_message(i, body_size) for i in range(message_count)]
+        self.by_id = {m["id"]: m for m in self.messages}
+        self.history: list[dict] = []
+        self.history_id = 5000
+        # history.list answers 404 for start IDs older than this, as Gmail does
+        self.oldest_history_id = 0
+        self.latency = latency
+        self.requests = 0
+        self.bytes_sent = 0
+        self.fail_once: set[str] = set()
+        self.missing: set[str] = set()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.root_url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self._process: multiprocessing.Process | None = None
+
+    def start(self, separate_process: bool = True) -> "FakeGmail":
+        """
+        Start serving in the background.
+
+        A separate process keeps the fake's own CPU work from competing for the
+        GIL with the code being measured; use a thread when a test needs to
+        inspect ``requests`` or adjust failure injection while running.
+        """
+        if separate_process:
+            context = multiprocessing.get_context("fork")
+            self._process = context.Process(target=self.server.serve_forever, daemon=True)
+            self._process.start()
+            self.server.socket.close()
+        else:
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+        else:
+            self.server.shutdown()
+
+    def discovery_document(self) -> dict:
+        document = json.loads(get_static_doc("gmail", "v1"))
+        document["rootUrl"] = self.root_url
+        return document
+
+    def _record(self, kind: str, message: dict, label_ids: list[str] | None = None) -> None:
+        self.history_id += 1
+        item: dict = {"message": {"id": message["id"], "labelIds": list(message["labelIds"])}}
+        if label_ids is not None:
+            item["labelIds"] = label_ids
+        self.history.append({"id": str(self.history_id), kind: [item]})
+
+    def deliver(self, body_size: int = 2_000) -> dict:
+        """Add a new message at the top of the mailbox."""
+        with self._lock:
+            message = make_message(len(self.by_id), body_size)
+            self.messages.insert(0, message)
+            self.by_id[message["id"]] = message
+            self._record("messagesAdded", message)
+            return message
+
+    def relabel(self, message_id: str, add: list[str] = (), remove: list[str] = ()) -> None:
+        """Change a message's labels and log the matching history records."""
+        with self._lock:
+            message = self.by_id[message_id]
+            added = [label for label in add if label not in message["labelIds"]]
+            removed = [label for label in remove if label in message["labelIds"]]
+            message["labelIds"] = [
+                label for label in message["labelIds"] if label not in removed
+            ] + added
+            if added:
+                self._record("labelsAdded", message, added)
+            if removed:
+                self._record("labelsRemoved", message, removed)
+
+    def delete(self, message_id: str) -> None:
+        """Delete a message for good and log the history record."""
+        with self._lock:
+            message = self.by_id.pop(message_id)
+            self.messages.remove(message)
+            self._record("messagesDeleted", message)
+
+    def expire_history(self) -> None:
+        """Forget the history so far, so no start ID handed out yet can be replayed."""
+        with self._lock:
+            self.history.clear()
+            self.oldest_history_id = self.history_id + 1
+
+    def _listed(self, query: str) -> list[dict]:
+        visible = [m for m in self.messages if not {"SPAM", "TRASH"} & set(m["labelIds"])]
+        if query == "is:unread":
+            return [m for m in visible if "UNREAD" in m["labelIds"]]
+        return visible
+
+    def _get(self, path: str, params: dict) -> tuple[int, dict]:
+        if path.endswith("/profile"):
+            return 200, {"emailAddress": "me@example.com", "historyId": str(self.history_id)}
+        if path.endswith("/history"):
+            start_id = int(params["startHistoryId"][0])
+            if start_id < self.oldest_history_id:
+                return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+            records = [r for r in self.history if int(r["id"]) > start_id]
+            return 200, {"history": records, "historyId": str(self.history_id)}
+        if path.endswith("/messages"):
+            limit = int(params.get("maxResults", ["100"])[0])
+            start = int(params.get("pageToken", ["0"])[0])
+            listed = self._listed(params.get("q", [""])[0])
+            page = listed[start : start + min(limit, 500)]
+            body = {"messages": [{"id": m["id"], "threadId": m["threadId"]} for m in page]}
+            if start + len(page) < len(listed):
+                body["nextPageToken"] = str(start + len(page))
+            return 200, body
+        match = re.search(r"/messages/([^/?]+)$", path)
+        if match:
+            message_id = match.group(1)
+            with self._lock:
+                if message_id in self.fail_once:
+                    self.fail_once.discard(message_id)
+                    return 503, {"error": {"code": 503, "message": "backend error"}}
+            if message_id in self.missing or message_id not in self.by_id:
+                return 404, {"error": {"code": 404, "message": "not found"}}
+            message = self.by_id[message_id]
+            message_format = params.get("format", ["full"])[0]
+            if message_format == "minimal":
+                message = {k: v for k, v in message.items() if k != "payload"}
+            elif message_format == "metadata":
+                wanted = set(params.get("metadataHeaders", []))
+                headers = [h for h in message["payload"]["headers"] if h["name"] in wanted]
+                message = {
+                    **{k: v for k, v in message.items() if k != "payload"},
+                    "payload": {"headers": headers},
+                }
+            return 200, message
+        return 404, {"error": {"code": 404, "message": path}}
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str) -> None:
+                with fake._lock:
+                    fake.bytes_sent += len(body)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                with fake._lock:
+                    fake.requests += 1
+                time.sleep(fake.latency)
+                url = urlparse(self.path)
+                status, body = fake._get(url.path, parse_qs(url.query))
+                self._send(status, json.dumps(body).encode(), "application/json")
+
+            def do_POST(self) -> None:
+                with fake._lock:
+                    fake.requests += 1
+                time.sleep(fake.latency)
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                if not self.path.startswith("/batch"):
+                    self._send(200, b"{}", "application/json")
+                    return
+                content_type = self.headers["Content-Type"]
+                envelope = BytesParser(policy=HTTP).parsebytes(
+                    f"Content-Type: {content_type}\r\n\r\n".encode() + raw
+                )
+                boundary = "batch_fake_boundary"
+                out = []
+                for part in envelope.iter_parts():
+                    content_id = part["Content-ID"].strip("<>")
+                    request_line = part.get_payload(decode=True).decode().split("\n", 1)[0]
+                    target = urlparse(request_line.split(" ")[1])
+                    status, body = fake._get(target.path, parse_qs(target.query))
+                    payload = json.dumps(body)
+                    out.append(
+                        f"--{boundary}\r\nContent-Type: application/http\r\n"
+                        f"Content-ID: <response-{content_id}>\r\n\r\n"
+                        f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n"
+                        f"Content-Length: {len(payload)}\r\n\r\n{payload}\r\n"
+                    )
+                out.append(f"--{boundary}--\r\n")
+                self._send(200, "".join(out).encode(), f"multipart/mixed; boundary={boundary}")
+
+        return Handler
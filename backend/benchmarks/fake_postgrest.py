@@ -0,0 +1,160 @@
+"""In-process fake of Supabase's PostgREST API for local benchmarks."""
+
+import json
+import multiprocessing
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qsl, urlparse
+
+# Query parameters that are not column filters
+RESERVED = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+class FakePostgrest:
+    """
+    Serve in-memory tables the way PostgREST does, with a fixed per-request latency.
+
+    Supports what Database uses: ``eq`` and ``in`` filters, ``order``,
+    ``limit`` and column ``select`` on reads, inserts and upserts with
+    ``on_conflict``, and filtered updates. Rows get an ``id`` and
+    timestamps when inserted without them, like the defaults in schema.sql.
+    """
+
+    def __init__(self, latency: float = 0.02) -> None:
+        self.tables: dict[str, list[dict[str, Any]]] = {}
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._process: multiprocessing.Process | None = None
+
+    def start(self, separate_process: bool = True) -> "FakePostgrest":
+        """
+        Start serving in the background.
+
+        As with FakeGmail, a separate process keeps the fake's CPU work away
+        from the code being measured; a thread lets a test change ``latency``
+        or read ``tables`` while it runs.
+        """
+        if separate_process:
+            context = multiprocessing.get_context("fork")
+            self._process = context.Process(target=self.server.serve_forever, daemon=True)
+            self._process.start()
+            self.server.socket.close()
+        else:
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+        else:
+            self.server.shutdown()
+
+    def _matching(self, table: str, params: list[tuple[str, str]]) -> list[dict[str, Any]]:
+        rows = self.tables.setdefault(table, [])
+        for column, condition in params:
+            if column in RESERVED:
+                continue
+            operator, _, value = condition.partition(".")
+            if operator == "eq":
+                rows = [row for row in rows if str(row.get(column)) == value]
+            elif operator == "in":
+                values = {item.strip('"') for item in value.strip("()").split(",")}
+                rows = [row for row in rows if str(row.get(column)) in values]
+        return rows
+
+    def _select(self, table: str, params: list[tuple[str, str]]) -> list[dict[str, Any]]:
+        rows = self._matching(table, params)
+        options = dict(params)
+        if "order" in options:
+            column, _, direction = options["order"].partition(".")
+            rows = sorted(rows, key=lambda row: row[column], reverse=direction == "desc")
+        if "limit" in options:
+            rows = rows[: int(options["limit"])]
+        columns = [column.strip() for column in options.get("select", "*").split(",")]
+        if columns != ["*"]:
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        return rows
+
+    def _insert(self, table: str, params: list[tuple[str, str]], body: Any) -> list[dict[str, Any]]:
+        rows = self.tables.setdefault(table, [])
+        conflict = dict(params).get("on_conflict")
+        now = datetime.now(timezone.utc).isoformat()
+        written = []
+        for values in body if isinstance(body, list) else [body]:
+            existing = None
+            if conflict:
+                keys = conflict.split(",")
+                existing = next(
+                    (row for row in rows if all(row.get(key) == values.get(key) for key in keys)),
+                    None,
+                )
+            if existing is not None:
+                existing.update(values, updated_at=now)
+                written.append(existing)
+                continue
+            row = {"id": str(uuid.uuid4()), "created_at": now, "updated_at": now, **values}
+            rows.append(row)
+            written.append(row)
+        return written
+
+    def _update(self, table: str, params: list[tuple[str, str]], body: Any) -> list[dict[str, Any]]:
+        rows = self._matching(table, params)
+        now = datetime.now(timezone.utc).isoformat()
+        for row in rows:
+            row.update(body, updated_at=now)
+        return rows
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+            def _respond(self, method: str) -> None:
+                with fake._lock:
+                    fake.requests += 1
+                time.sleep(fake.latency)
+                url = urlparse(self.path)
+                table = url.path.rsplit("/", 1)[-1]
+                params = parse_qsl(url.query)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+
+                with fake._lock:
+                    if method == "GET":
+                        status, rows = 200, fake._select(table, params)
+                    elif method == "POST":
+                        status, rows = 201, fake._insert(table, params, body)
+                    else:
+                        status, rows = 200, fake._update(table, params, body)
+                    payload = json.dumps(rows).encode()
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self) -> None:
+                self._respond("GET")
+
+            def do_POST(self) -> None:
+                self._respond("POST")
+
+            def do_PATCH(self) -> None:
+                self._respond("PATCH")
+
+        return Handler
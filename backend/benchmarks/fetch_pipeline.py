@@ -0,0 +1,127 @@
+"""
+Time to first email, total time and peak memory of fetching a large listing.
+
+``materialized`` is AsyncGmailService.fetch_emails as it was before
+iter_emails: list every ID (following nextPageToken), then fetch every chunk
+at once and return one list. ``pipelined`` is iter_emails, which hands over
+each chunk as it arrives, lists the next page while the current one is
+fetched, and keeps at most ``GMAIL_FETCH_WINDOW`` chunks in flight. The
+consumer drops each chunk once it has seen it, as a streaming caller would,
+so peak memory shows what the fetch path itself holds on to.
+``--projection metadata`` leaves bodies out, as categorize and digest do.
+Each is run for a search query and for ``""``, which categorize uses and
+which is listed through the mailbox sync store.
+
+Usage:
+    python -m benchmarks.fetch_pipeline --emails 2000 --latency-ms 100
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any
+from uuid import uuid4
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+
+from app.models.schemas import UserInDB
+from app.services.gmail_client_pool import gmail_client_pool
+from app.services.gmail_service import (
+    FULL,
+    GMAIL_BATCH_LIMIT,
+    METADATA,
+    AsyncGmailService,
+)
+from benchmarks.fake_gmail import FakeGmail
+
+QUERIES = ["newer_than:1d", ""]
+
+
+async def materialized(service: AsyncGmailService, count: int, query: str, projection: str) -> Any:
+    message_ids = await service.list_message_ids(max_results=count, query=query)
+    chunks = [
+        message_ids[start : start + GMAIL_BATCH_LIMIT]
+        for start in range(0, len(message_ids), GMAIL_BATCH_LIMIT)
+    ]
+    results = await asyncio.gather(
+        *(service._run(service.gmail.get_messages, c, projection=projection) for c in chunks)
+    )
+    yield [email for chunk in results for email in chunk]
+
+
+def pipelined(service: AsyncGmailService, count: int, query: str, projection: str) -> Any:
+    return service.iter_emails(max_results=count, query=query, projection=projection)
+
+
+async def measure(
+    fetch: Any, service: AsyncGmailService, query: str, args: argparse.Namespace, trace: bool
+) -> tuple:
+    """Return seconds to the first emails and to the last, and peak traced bytes if ``trace``."""
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    first = None
+    async for batch in fetch(service, args.emails, query, args.projection):
+        first = first or time.perf_counter() - started
+        del batch
+    total = time.perf_counter() - started
+    peak = 0
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return first, total, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--projection", choices=[FULL, METADATA], default=METADATA)
+    args = parser.parse_args()
+
+    fake = FakeGmail(
+        message_count=args.emails, latency=args.latency_ms / 1000, body_size=4_000
+    ).start()
+    gmail_client_pool._service = build_from_document(
+        fake.discovery_document(), http=httplib2.Http()
+    )
+    now = datetime.now(timezone.utc)
+    user = UserInDB(
+        id=uuid4(),
+        email="bench@example.com",
+        google_id="bench",
+        refresh_token="refresh",
+        access_token="access",
+        created_at=now,
+        updated_at=now,
+    )
+
+    try:
+        for query in QUERIES:
+            for label, fetch in {"materialized": materialized, "pipelined": pipelined}.items():
+                samples = [
+                    asyncio.run(measure(fetch, AsyncGmailService(user), query, args, trace=False))
+                    for _ in range(args.rounds)
+                ]
+                first = statistics.median(sample[0] for sample in samples)
+                total = statistics.median(sample[1] for sample in samples)
+                # Tracing slows everything down, so memory gets a run of its own
+                _, _, peak = asyncio.run(
+                    measure(fetch, AsyncGmailService(user), query, args, trace=True)
+                )
+                print(
+                    f"{query or '(all)':>13} {label:>12}: first emails after "
+                    f"{first * 1000:7.1f} ms  all {args.emails} after {total * 1000:7.1f} ms  "
+                    f"peak memory {peak / 1024 / 1024:5.1f} MB"
+                )
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Gemini calls lost to 429s and interactive latency under bulk load, with and without LLMScheduler.
+
+A stand-in model enforces a requests-per-minute quota over a sliding minute
+and answers 429 beyond it, like Gemini does. ``--bulk`` background calls
+(batched summaries, categorization chunks) start at once, while
+``--interactive`` chat replies arrive one every ``--interactive-gap-ms``,
+all handed off from one event loop the way AIService and the chat router
+do. Alongside each reply a probe measures how long other blocking work,
+such as a Gmail fetch, waits for a thread in the loop's default executor.
+``unscheduled`` calls the model directly through ``asyncio.to_thread``, as
+AIService did before the scheduler, so every 429 becomes a fallback answer.
+``shared`` goes through an LLMScheduler but still waits for admission on
+default-executor threads; ``scheduled`` uses ``LLMScheduler.to_thread``,
+as AIService does now. Both take about ``--bulk / --quota`` minutes, as
+they should. Every call's prompt is different, so none are merged by
+single-flight.
+
+Usage:
+    python -m benchmarks.gemini_scheduler --quota 300 --bulk 400 --interactive 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from google.api_core.exceptions import ResourceExhausted
+
+from app.services import ai_service
+from app.services.ai_service import AIService
+from app.services.llm_scheduler import BULK, INTERACTIVE, LLMScheduler
+from benchmarks.fake_gemini import FakeModel
+
+PROMPT = "Summarize these emails in 2-4 short bullet points.\n\n" + "1. Quarterly report\n" * 40
+
+
+class QuotaModel(FakeModel):
+    """FakeModel that turns down calls beyond ``quota`` in any 60 seconds."""
+
+    def __init__(self, latency: float, quota: int) -> None:
+        super().__init__(latency)
+        self.quota = quota
+        self._calls: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs: Any) -> Any:
+        with self._lock:
+            now = time.monotonic()
+            while self._calls and now - self._calls[0] > 60:
+                self._calls.popleft()
+            if len(self._calls) >= self.quota:
+                raise ResourceExhausted("Quota exceeded for requests per minute.")
+            self._calls.append(now)
+        return super().generate_content(prompt, stream=stream, **kwargs)
+
+
+class Unscheduled:
+    """Stand-in for the scheduler that calls Gemini straight away, once."""
+
+    def run(self, call: Callable[[], Any], *_args: Any) -> Any:
+        return call()
+
+    def stream(self, call: Callable[[], Iterable[Any]], *_args: Any) -> Iterable[Any]:
+        return call()
+
+    def settle(self, *_args: Any) -> None:
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        return {}
+
+
+async def run(label: str, scheduler: Any, args: argparse.Namespace) -> None:
+    ai_service.llm_scheduler = scheduler
+    service = AIService()
+    service.model = QuotaModel(args.latency_ms / 1000, args.quota)
+    results: dict[int, list[tuple[float, bool]]] = {INTERACTIVE: [], BULK: []}
+    probe_waits: list[float] = []
+
+    def call(priority: int, index: int) -> bool:
+        try:
+            # Distinct prompts, so single-flight does not merge the calls
+            service._generate(f"{PROMPT}\nRequest {index}", priority)
+        except ResourceExhausted:
+            return False
+        return True
+
+    async def submit(priority: int, index: int) -> None:
+        # Timed from the hand-off, so waiting for a thread counts too
+        started = time.perf_counter()
+        if label == "scheduled":
+            ok = await scheduler.to_thread(priority, call, priority, index)
+        else:
+            ok = await asyncio.to_thread(call, priority, index)
+        results[priority].append((time.perf_counter() - started, ok))
+
+    async def probe() -> None:
+        started = time.perf_counter()
+        await asyncio.to_thread(time.sleep, 0)
+        probe_waits.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(submit(BULK, index)) for index in range(args.bulk)]
+    for index in range(args.interactive):
+        tasks.append(asyncio.create_task(submit(INTERACTIVE, args.bulk + index)))
+        tasks.append(asyncio.create_task(probe()))
+        await asyncio.sleep(args.interactive_gap_ms / 1000)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    for priority, name in ((INTERACTIVE, "interactive"), (BULK, "bulk")):
+        latencies = sorted(latency for latency, ok in results[priority] if ok)
+        lost = sum(not ok for _, ok in results[priority])
+        p50 = statistics.median(latencies) * 1000 if latencies else float("nan")
+        print(
+            f"{label:>11} {name:<11}: answered={len(latencies):4d}  lost_to_429={lost:4d}  "
+            f"p50={p50:8.1f} ms  "
+            f"max={(latencies[-1] if latencies else float('nan')) * 1000:8.1f} ms"
+        )
+    print(
+        f"{label:>11} other work : p50 wait={statistics.median(probe_waits) * 1000:8.1f} ms  "
+        f"max={max(probe_waits) * 1000:8.1f} ms"
+    )
+    print(f"{label:>11} wall time {elapsed:.1f} s  {scheduler.stats()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quota", type=int, default=300, help="requests per minute")
+    parser.add_argument("--bulk", type=int, default=400)
+    parser.add_argument("--interactive", type=int, default=20)
+    parser.add_argument("--interactive-gap-ms", type=float, default=500.0)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    asyncio.run(run("unscheduled", Unscheduled(), args))
+    for label in ("shared", "scheduled"):
+        scheduler = LLMScheduler(
+            requests_per_minute=args.quota,
+            tokens_per_minute=10_000_000,
+            max_concurrency=16,
+            max_retries=4,
+            backoff_base=1.0,
+        )
+        asyncio.run(run(label, scheduler, args))
+        scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Throughput of email body text extraction, BeautifulSoup vs html_to_text.
+
+The corpus is generated to look like real mail: plain-text notes, small
+transactional receipts, table-based marketing newsletters with inline styles,
+Outlook conditional comments and preheader padding, and long multi-article
+digests of several hundred KB. ``beautifulsoup`` is the extraction
+GmailService used before; ``html_to_text`` is the regex-based engine.
+
+Usage:
+    python -m benchmarks.html_text --repeat 5
+"""
+
+import argparse
+import random
+import time
+from collections.abc import Callable
+
+from bs4 import BeautifulSoup
+
+from app.services.html_text import html_to_text
+
+WORDS = ["update", "invoice", "meeting", "offer", "members", "order", "review", "team", "launch"]
+
+
+def sentence(rng: random.Random, words: int = 14) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def plain_note(rng: random.Random) -> str:
+    paragraphs = ["\n".join(sentence(rng) for _ in range(4)) for _ in range(40)]
+    return "Hi team,\n\n" + "\n\n".join(paragraphs) + "\n\n-- \nSent from my phone"
+
+
+def receipt(rng: random.Random) -> str:
+    rows = "".join(
+        f'<tr><td style="padding:4px;font-family:Arial">{sentence(rng, 4)}</td>'
+        f'<td align="right" style="padding:4px">${rng.randint(1, 400)}.{rng.randint(0, 99):02d}</td></tr>'
+        for _ in range(25)
+    )
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Your receipt</title>'
+        "<style>td{font-size:14px;color:#333}</style></head><body>"
+        f"<p>Thanks for your order!</p><table width='100%'>{rows}</table>"
+        f"<p>{sentence(rng)}</p><p>Questions? Reply to this email.</p></body></html>"
+    )
+
+
+def article(rng: random.Random, index: int) -> str:
+    link = f"https://click.example-mail.com/ls/click?upn={'x' * 180}&amp;id={index}"
+    return (
+        '<tr><td class="mobile-padding" style="padding:24px 32px 0 32px;'
+        'font-family:Helvetica,Arial,sans-serif;font-size:16px;line-height:24px;color:#222222">'
+        f'<h2 style="margin:0 0 8px 0;font-size:22px">{sentence(rng, 6)}</h2>'
+        f'<img src="https://cdn.example.com/img/{index}.jpg" width="536" alt="" '
+        'style="display:block;border:0;max-width:100%">'
+        + "".join(f"<p style='margin:0 0 12px 0'>{sentence(rng)}</p>" for _ in range(3))
+        + f'<table role="presentation" cellpadding="0" cellspacing="0"><tr><td bgcolor="#0066ff" '
+        f'style="border-radius:4px"><a href="{link}" style="color:#ffffff;padding:12px 24px;'
+        'display:inline-block;text-decoration:none">Read more &rarr;</a></td></tr></table>'
+        "</td></tr>"
+    )
+
+
+def newsletter(rng: random.Random, articles: int) -> str:
+    preheader = sentence(rng, 10) + "&zwnj;&nbsp;" * 120
+    styles = "".join(
+        f".c{index}{{color:#{rng.randint(0, 0xFFFFFF):06x};padding:{index}px}}"
+        for index in range(300)
+    )
+    body = "".join(article(rng, index) for index in range(articles))
+    return (
+        '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN">'
+        '<html xmlns="http://www.w3.org/1999/xhtml"><head>'
+        '<meta name="viewport" content="width=device-width">'
+        f"<style type='text/css'>{styles}</style>"
+        "<!--[if mso]><xml><o:OfficeDocumentSettings><o:PixelsPerInch>96</o:PixelsPerInch>"
+        "</o:OfficeDocumentSettings></xml><![endif]--></head><body style='margin:0'>"
+        f'<div style="display:none;max-height:0;overflow:hidden">{preheader}</div>'
+        '<center><table role="presentation" width="100%" cellpadding="0" cellspacing="0">'
+        '<tr><td align="center"><!--[if mso]><table width="600"><tr><td><![endif]-->'
+        f'<table role="presentation" width="600" style="max-width:600px">{body}</table>'
+        "<!--[if mso]></td></tr></table><![endif]--></td></tr></table></center>"
+        '<p style="font-size:12px;color:#999">You are receiving this because you signed up. '
+        '<a href="https://example.com/unsubscribe">Unsubscribe</a> &middot; '
+        "123 Market St, San Francisco</p>"
+        '<img src="https://track.example.com/open.gif" width="1" height="1" alt=""></body></html>'
+    )
+
+
+def corpus() -> dict[str, list[str]]:
+    rng = random.Random(7)
+    return {
+        "plain text": [plain_note(rng) for _ in range(20)],
+        "receipt": [receipt(rng) for _ in range(20)],
+        "newsletter": [newsletter(rng, 12) for _ in range(10)],
+        "digest": [newsletter(rng, 150) for _ in range(3)],
+    }
+
+
+def beautifulsoup(html_content: str) -> str:
+    """GmailService._sanitize_html as it was before html_to_text."""
+    soup = BeautifulSoup(html_content, "lxml")
+    for script in soup(["script", "style"]):
+        script.decompose()
+    text = soup.get_text()
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return "\n".join(chunk for chunk in chunks if chunk)
+
+
+def measure(extract: Callable[[str], str], bodies: list[str], repeat: int) -> tuple[float, float]:
+    """Return (MB/s, mean ms per body)."""
+    size = sum(len(body.encode()) for body in bodies) * repeat
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for body in bodies:
+            extract(body)
+    elapsed = time.perf_counter() - started
+    return size / elapsed / 1e6, elapsed / (len(bodies) * repeat) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    extractors = {"beautifulsoup": beautifulsoup, "html_to_text": html_to_text}
+    for shape, bodies in corpus().items():
+        average_kb = sum(len(body.encode()) for body in bodies) / len(bodies) / 1024
+        print(f"{shape} ({len(bodies)} bodies, ~{average_kb:.0f} KB each)")
+        for name, extract in extractors.items():
+            throughput, per_body = measure(extract, bodies, args.repeat)
+            print(f"  {name:>13}: {throughput:8.1f} MB/s  {per_body:8.3f} ms/body")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Accuracy and speed of chat intent detection, substring rules vs IntentMatcher.
+
+``substring`` is AIService.detect_intent as it was before IntentMatcher: a
+chain of ``any(word in message)`` scans with regexes compiled per call.
+``matcher`` is the single-pass compiled matcher. Both are scored against a
+small labelled corpus of chat messages; a message counts as correct when the
+intent and every labelled parameter match.
+
+Usage:
+    python -m benchmarks.intents --repeat 200
+"""
+
+import argparse
+import re
+import time
+from collections.abc import Callable
+from typing import Any
+
+from app.services.intent_matcher import intent_matcher
+
+# (message, expected intent, expected parameters)
+CORPUS: list[tuple[str, str, dict[str, Any]]] = [
+    ("show me my last 10 emails", "fetch_emails", {"count": 10}),
+    ("list unread emails", "fetch_emails", {"query": "is:unread"}),
+    ("fetch emails from alice@example.com", "fetch_emails", {"query": "from:alice@example.com"}),
+    ("get my 3 latest messages", "fetch_emails", {"count": 3}),
+    ("display my inbox", "fetch_emails", {"count": 5}),
+    ("Show 20 emails", "fetch_emails", {"count": 20}),
+    ("summarize my last 7 emails", "fetch_emails", {"count": 7}),
+    ("give me a summary of my unread mail", "fetch_emails", {"query": "is:unread"}),
+    ("can you summarise the inbox", "fetch_emails", {}),
+    (
+        "reply to email #2 saying I'll be there at 5",
+        "generate_reply",
+        {"email_index": 1, "instruction": "I'll be there at 5"},
+    ),
+    ("respond to the first email", "generate_reply", {"email_index": 0}),
+    (
+        "answer the third one and tell them thanks",
+        "generate_reply",
+        {"email_index": 2, "instruction": "thanks"},
+    ),
+    ("reply to email 4", "generate_reply", {"email_index": 3}),
+    ("write back to the latest email", "generate_reply", {"email_index": 0}),
+    ("reply to the 2nd email", "generate_reply", {"email_index": 1}),
+    ("delete the second email", "delete_email", {"email_index": 1}),
+    ("trash email #3", "delete_email", {"email_index": 2}),
+    ("remove the last email", "delete_email", {"email_index": -1}),
+    ("delete email 5", "delete_email", {"email_index": 4}),
+    ("categorize my emails", "categorize", {"count": 20}),
+    ("organize my last 50 emails", "categorize", {"count": 50}),
+    ("group my inbox by category", "categorize", {}),
+    ("give me my daily digest", "digest", {}),
+    ("what's in today's emails", "digest", {}),
+    ("summary of the day please", "digest", {}),
+    ("any emails today?", "digest", {}),
+    ("daily recap", "digest", {}),
+    ("summarize today", "digest", {}),
+    ("are we meeting together on friday?", "query", {}),
+    ("what's the weather today?", "query", {}),
+    ("am I free today after lunch?", "query", {}),
+    ("who sent the budget report?", "query", {}),
+    ("forget it", "query", {}),
+    ("what did Bob say about the launch?", "query", {}),
+    ("did yesterday's meeting get moved?", "query", {}),
+    ("I'm starting to feel overwhelmed by my inbox", "query", {}),
+    ("thanks, that's helpful", "query", {}),
+    ("hello there", "query", {}),
+    ("what is a good subject line for a job application?", "query", {}),
+    ("is there anything urgent?", "query", {}),
+    ("remind me what the groupon offer said", "query", {}),
+    ("which thread mentions the outlisted items?", "query", {}),
+    ("how many newsletters do I get per week", "query", {}),
+    ("hmm, interesting", "query", {}),
+    ("find emails about invoices", "fetch_emails", {}),
+    ("I read it yesterday", "query", {}),
+    ("this is getting long", "query", {}),
+    ("give me the gist of things", "query", {}),
+    ("rate my productivity this week", "query", {}),
+    ("what's the status of 5 things I asked for", "query", {}),
+]
+
+
+def substring(message: str) -> dict[str, Any]:
+    """AIService.detect_intent before IntentMatcher, minus the confirmation lookup."""
+    message_lower = message.lower()
+
+    def number() -> int | None:
+        match = re.search(r"\b(\d+)\b", message)
+        return int(match.group(1)) if match else None
+
+    def email_index() -> int | None:
+        match = re.search(r"#(\d+)|email\s+(\d+)|(\d+)\s*(?:st|nd|rd|th)", message_lower)
+        if match:
+            return int(match.group(1) or match.group(2) or match.group(3)) - 1
+        ordinals = {"first": 0, "second": 1, "third": 2, "fourth": 3, "fifth": 4}
+        ordinals.update({"last": -1, "latest": 0, "recent": 0})
+        for word, index in ordinals.items():
+            if word in message_lower:
+                return index
+        return None
+
+    def query() -> str:
+        if "unread" in message_lower:
+            return "is:unread"
+        if "from" in message_lower:
+            match = re.search(r"[\w\.-]+@[\w\.-]+", message)
+            if match:
+                return f"from:{match.group()}"
+        return ""
+
+    def instruction() -> str:
+        match = re.search(r"(?:saying|that|tell them)\s+(.+)", message, re.IGNORECASE)
+        return match.group(1) if match else ""
+
+    if any(word in message_lower for word in ["show", "list", "fetch", "get", "display"]):
+        return {"intent": "fetch_emails", "count": number() or 5, "query": query()}
+    if any(word in message_lower for word in ["summarize", "summary"]):
+        return {"intent": "fetch_emails", "count": number() or 5, "query": query()}
+    if any(word in message_lower for word in ["reply", "respond", "answer"]):
+        return {
+            "intent": "generate_reply",
+            "email_index": email_index(),
+            "instruction": instruction(),
+        }
+    if any(word in message_lower for word in ["delete", "remove", "trash"]):
+        return {"intent": "delete_email", "email_index": email_index(), "confirmed": False}
+    if any(word in message_lower for word in ["categorize", "organize", "group", "category"]):
+        return {"intent": "categorize", "count": number() or 20}
+    if any(word in message_lower for word in ["digest", "today", "summary of the day"]):
+        return {"intent": "digest"}
+    return {"intent": "query", "message": message}
+
+
+def matcher(message: str) -> dict[str, Any]:
+    return intent_matcher.detect(message)
+
+
+def score(detect: Callable[[str], dict[str, Any]]) -> tuple[int, list[str]]:
+    """Return the number of correct messages and a line per mistake."""
+    correct = 0
+    mistakes = []
+    for message, intent, params in CORPUS:
+        result = detect(message)
+        expected = {"intent": intent, **params}
+        if all(result.get(key) == value for key, value in expected.items()):
+            correct += 1
+        else:
+            got = {key: result.get(key) for key in expected}
+            mistakes.append(f"{message!r}: expected {expected}, got {got}")
+    return correct, mistakes
+
+
+def measure(detect: Callable[[str], dict[str, Any]], repeat: int) -> float:
+    """Return mean microseconds per message."""
+    messages = [message for message, _, _ in CORPUS]
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            detect(message)
+    return (time.perf_counter() - started) / (len(messages) * repeat) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--verbose", action="store_true", help="print every misclassification")
+    args = parser.parse_args()
+
+    for name, detect in {"substring": substring, "matcher": matcher}.items():
+        correct, mistakes = score(detect)
+        per_message = measure(detect, args.repeat)
+        print(
+            f"{name:>9}: accuracy={correct}/{len(CORPUS)} ({correct / len(CORPUS):.0%})  "
+            f"{per_message:6.2f} µs/message"
+        )
+        if args.verbose:
+            for mistake in mistakes:
+                print(f"    {mistake}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Prompt tokens spent on email bodies, and how much of what senders wrote reaches Gemini.
+
+Emails are generated like real reply threads: new text of varying length
+ending in the sender's request, a closing and signature, and quoted
+history below; some are newsletters with a footer instead. ``sliced`` is
+what prompts used to contain, the first 1000 characters of a body for a
+reply and the first 500 for each email of a batched summary. ``packed``
+is PromptPacker with the budgets AIService uses now. ``new text`` is the
+share of the sender's sentences in the prompt, ``requests`` the share of
+emails whose request made it in, and ``other`` the share of prompt tokens
+that are not the sender's sentences: quotes, signatures and footers, but
+also greetings, sentences cut in half and cut markers. Tokens are counted with
+``count_tokens``; prompt templates are the same either way and are left out.
+
+Usage:
+    python -m benchmarks.prompt_packing --emails 500
+"""
+
+import argparse
+import random
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from app.services.ai_service import (
+    REPLY_BODY_TOKENS,
+    SUMMARY_BATCH_BODY_TOKENS,
+    SUMMARY_BATCH_SIZE,
+    SUMMARY_BODY_MAX_TOKENS,
+)
+from app.services.prompt_packer import count_tokens, prompt_packer
+
+# fmt: off
+WORDS = ["quarterly", "report", "invoice", "meeting", "budget", "review", "customer", "launch", "numbers", "draft", "schedule", "contract", "team", "update", "deadline", "figures", "proposal", "slides", "vendor", "timeline"]  # fmt: skip
+# fmt: on
+
+SIGNATURE = (
+    "Best regards,\nAlex Smith\nDirector of Finance | Acme Corp\n+1 555 0100 | acme.example.com"
+)
+
+FOOTER = (
+    "You are receiving this email because you subscribed to our newsletter.\n"
+    "Unsubscribe | Manage preferences | View in browser\n"
+    "© 2026 Acme Corp. All rights reserved. 100 Main Street, Springfield"
+)
+
+
+@dataclass
+class Email:
+    body: str
+    sentences: list[str]
+    request: str
+
+
+def sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(8, 20))
+    return " ".join(words).capitalize() + "."
+
+
+def make_email(index: int, rng: random.Random) -> Email:
+    sentences = [sentence(rng) for _ in range(rng.choice([1, 2, 3, 5, 8, 15, 30]))]
+    request = f"Could you send me item {index} by Friday?"
+    new_text = "\n".join(["Hi Sam,", *sentences, request])
+
+    if index % 4 == 0:
+        return Email(f"{new_text}\n{FOOTER}", sentences, request)
+
+    history = []
+    for depth in range(rng.randint(1, 4)):
+        quoted = "\n".join(sentence(rng) for _ in range(10))
+        history.append(f"On Mon, Oct {5 - depth}, 2026 at 9:00 AM Sam Lee <sam@example.com> wrote:")
+        history.append("\n".join(f"{'>' * (depth + 1)} {line}" for line in quoted.split("\n")))
+    return Email("\n".join([new_text, SIGNATURE, *history]), sentences, request)
+
+
+def score(label: str, emails: list[Email], contents: list[str], elapsed: float) -> None:
+    tokens = [count_tokens(content) for content in contents]
+    new_tokens = [
+        sum(count_tokens(line) for line in content.split("\n") if line in email.sentences)
+        + (count_tokens(email.request) if email.request in content else 0)
+        for email, content in zip(emails, contents, strict=True)
+    ]
+    kept = sum(
+        sum(line in content for line in email.sentences) / len(email.sentences)
+        for email, content in zip(emails, contents, strict=True)
+    )
+    requests = sum(
+        email.request in content for email, content in zip(emails, contents, strict=True)
+    )
+    other = sum(tokens) - sum(new_tokens)
+    print(
+        f"{label:<16}: tokens/email={sum(tokens) / len(emails):6.1f}  "
+        f"new text={kept / len(emails):6.1%}  requests={requests / len(emails):6.1%}  "
+        f"other={other / sum(tokens):6.1%}  {elapsed * 1e6 / len(emails):6.1f} µs/email"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--emails", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    emails = [make_email(index, rng) for index in range(args.emails)]
+    bodies = [email.body for email in emails]
+
+    def timed(label: str, pack: Callable[[], list[str]]) -> None:
+        started = time.perf_counter()
+        contents = pack()
+        score(label, emails, contents, time.perf_counter() - started)
+
+    timed("reply, sliced", lambda: [body[:1000] for body in bodies])
+    timed("reply, packed", lambda: [prompt_packer.body(body, REPLY_BODY_TOKENS) for body in bodies])
+    timed("summary, sliced", lambda: [body[:500] for body in bodies])
+    timed(
+        "summary, packed",
+        lambda: [
+            packed
+            for start in range(0, len(bodies), SUMMARY_BATCH_SIZE)
+            for packed in prompt_packer.bodies(
+                bodies[start : start + SUMMARY_BATCH_SIZE],
+                SUMMARY_BATCH_BODY_TOKENS,
+                SUMMARY_BODY_MAX_TOKENS,
+            )
+        ],
+    )
+    print(prompt_packer.stats())
+
+
+if __name__ == "__main__":
+    main()
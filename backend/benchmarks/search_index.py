@@ -0,0 +1,112 @@
+"""
+Accuracy and latency of resolving free-text email references locally.
+
+Builds a SearchIndex over a synthetic mailbox where every email has a sender
+and a topic, then asks for "the email from <first name> about <topic>" the way
+a chat user would. A lookup is correct when the best match has that sender
+and topic. References to senders and topics not in the mailbox measure how
+often a wrong email would clear the chat router's score threshold.
+
+Usage:
+    python -m benchmarks.search_index --messages 1000 --queries 500
+"""
+
+import argparse
+import random
+import statistics
+import time
+from typing import Any
+
+from app.core.config import settings
+from app.services.search_index import SearchIndex
+
+FIRST_NAMES = ["John", "Priya", "Maria", "Wei", "Ahmed", "Olga", "Kenji", "Fatima", "Lucas"]
+FIRST_NAMES += ["Emma", "Noah", "Aisha", "Diego", "Sofia", "Ivan", "Chloe", "Mateo", "Hana"]
+LAST_NAMES = ["Smith", "Patel", "Garcia", "Chen", "Khan", "Novak", "Tanaka", "Silva", "Brown"]
+TOPICS = [
+    "invoice", "quarterly report", "flight booking", "team offsite", "contract renewal",
+    "server outage", "job offer", "tax return", "birthday party", "budget review",
+    "hiring plan", "conference talk", "security audit", "rent payment", "product launch",
+    "insurance claim", "school trip", "design review", "pull request", "gym membership",
+]  # fmt: skip
+UNKNOWN_TOPICS = ["wedding venue", "parking ticket", "marathon training", "garden fence"]
+UNKNOWN_NAMES = ["Zoltan", "Brunhilde", "Thaddeus", "Ottoline"]
+FILLER = [
+    "thanks", "let", "know", "when", "works", "next", "week", "follow", "up", "attached",
+    "please", "see", "below", "regards", "quick", "question", "update", "meeting", "call",
+    "tomorrow", "morning", "afternoon", "available", "schedule",
+]  # fmt: skip
+
+
+def make_mailbox(count: int, rng: random.Random) -> list[dict[str, Any]]:
+    senders = [f"{first} {rng.choice(LAST_NAMES)}" for first in FIRST_NAMES]
+    emails = []
+    for index in range(count):
+        sender = rng.choice(senders)
+        topic = rng.choice(TOPICS)
+        filler = " ".join(rng.choice(FILLER) for _ in range(80))
+        emails.append(
+            {
+                "id": f"m{index:06d}",
+                "from": f"{sender} <{sender.split()[0].lower()}@example.com>",
+                "subject": f"Re: {topic}".title(),
+                "snippet": f"Hi, about the {topic}: {filler[:80]}",
+                "body": f"Hi,\n\nAbout the {topic}. {filler}\n\n{sender}",
+                "sender": sender.split()[0],
+                "topic": topic,
+            }
+        )
+    return emails
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=settings.SEARCH_INDEX_MAX_MESSAGES_PER_USER)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    emails = make_mailbox(args.messages, rng)
+    index = SearchIndex(dim=settings.SEARCH_INDEX_DIM, max_messages=args.messages, max_users=1)
+
+    started = time.perf_counter()
+    for start in range(0, len(emails), 50):
+        index.add("bench", emails[start : start + 50])
+    build = time.perf_counter() - started
+
+    latencies = []
+    correct = 0
+    for target in rng.sample(emails, min(args.queries, len(emails))):
+        reference = f"reply to the email from {target['sender']} about the {target['topic']}"
+        started = time.perf_counter()
+        matches = index.search("bench", reference, k=1)
+        latencies.append(time.perf_counter() - started)
+        best = next(email for email in emails if email["id"] == matches[0][0])
+        correct += best["sender"] == target["sender"] and best["topic"] == target["topic"]
+
+    threshold = settings.SEARCH_REFERENCE_MIN_SCORE
+    unknown = [
+        f"delete the email from {name} about the {topic}"
+        for name in UNKNOWN_NAMES
+        for topic in UNKNOWN_TOPICS
+    ]
+    false_matches = sum(
+        bool(index.search("bench", reference, k=1, min_score=threshold)) for reference in unknown
+    )
+
+    latencies.sort()
+    print(
+        f"{args.messages} messages indexed in {build * 1000:.0f} ms "
+        f"({build / args.messages * 1e6:.0f} µs/message, "
+        f"{index.stats()['bytes'] / 1024 / 1024:.1f} MB)"
+    )
+    print(
+        f"search: p50={statistics.median(latencies) * 1000:.2f} ms  "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms  "
+        f"top-1 accuracy={correct}/{len(latencies)} ({correct / len(latencies):.0%})"
+    )
+    print(f"unknown references above min score {threshold}: {false_matches}/{len(unknown)}")
+
+
+if __name__ == "__main__":
+    main()
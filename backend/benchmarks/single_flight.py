@@ -0,0 +1,130 @@
+"""
+Gmail requests and Gemini calls during a retry storm, with and without single-flight.
+
+``--duplicates`` copies of the same "show N emails" message reach
+/chat/message at once, as when a frontend retries a slow request or a user
+clicks send repeatedly. Gmail is the fake server from ``fake_gmail`` and
+Gemini a stand-in that counts its calls. ``off`` replaces SingleFlight with
+a pass-through, which is how every request behaved before; ``on`` is the
+shared singleton. Each mode starts with a new user and empty caches, so
+nothing is served from earlier work.
+
+Usage:
+    python -m benchmarks.single_flight --duplicates 5 --emails 10
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from collections.abc import Awaitable, Callable, Hashable
+from datetime import datetime, timezone
+from typing import Any, TypeVar
+from uuid import uuid4
+
+import google.generativeai as genai
+import httplib2
+import httpx
+from googleapiclient.discovery import build_from_document
+
+from app.models.schemas import UserInDB
+from app.routers import chat
+from app.services import ai_service, gmail_service, single_flight
+from app.services.gmail_client_pool import gmail_client_pool
+from benchmarks.chat_concurrency import FakeDatabase, start_server
+from benchmarks.fake_gemini import FakeModel
+from benchmarks.fake_gmail import FakeGmail
+
+T = TypeVar("T")
+
+
+class CountingModel(FakeModel):
+    """FakeModel that counts the calls it answers, across every AIService."""
+
+    calls = 0
+    lock = threading.Lock()
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs: Any) -> Any:
+        with CountingModel.lock:
+            CountingModel.calls += 1
+        return super().generate_content(prompt, stream=stream, **kwargs)
+
+
+class PassThrough:
+    """Stand-in for SingleFlight that makes every call itself."""
+
+    def run(self, _operation: str, _key: Hashable, call: Callable[[], T]) -> T:
+        return call()
+
+    async def run_async(
+        self, _operation: str, _key: Hashable, call: Callable[[], Awaitable[T]]
+    ) -> T:
+        return await call()
+
+    def stats(self) -> dict[str, Any]:
+        return {}
+
+
+async def storm(base_url: str, user: UserInDB, args: argparse.Namespace) -> float:
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as http:
+
+        async def send() -> None:
+            response = await http.post(
+                "/chat/message",
+                params={"user_id": str(user.id)},
+                json={"message": f"show {args.emails} emails", "conversation_history": []},
+            )
+            response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send() for _ in range(args.duplicates)))
+        return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--duplicates", type=int, default=5)
+    parser.add_argument("--emails", type=int, default=10)
+    parser.add_argument("--gmail-ms", type=float, default=100.0)
+    parser.add_argument("--gemini-ms", type=float, default=800.0)
+    args = parser.parse_args()
+
+    # In this process, so its request counter can be read
+    fake = FakeGmail(message_count=100, latency=args.gmail_ms / 1000).start(separate_process=False)
+    gmail_client_pool._service = build_from_document(
+        fake.discovery_document(), http=httplib2.Http()
+    )
+    genai.GenerativeModel = lambda *_args, **_kwargs: CountingModel(args.gemini_ms / 1000)
+    server, base_url = start_server()
+
+    try:
+        for mode, coalescer in {"off": PassThrough(), "on": single_flight.single_flight}.items():
+            gmail_service.single_flight = coalescer
+            ai_service.single_flight = coalescer
+            now = datetime.now(timezone.utc)
+            user = UserInDB(
+                id=uuid4(),
+                email="bench@example.com",
+                google_id="bench",
+                refresh_token="refresh",
+                access_token="access",
+                created_at=now,
+                updated_at=now,
+            )
+            chat.db = FakeDatabase(user)
+
+            gmail_before, gemini_before = fake.requests, CountingModel.calls
+            elapsed = asyncio.run(storm(base_url, user, args))
+            print(
+                f"{mode:>3}: {args.duplicates} identical requests in {elapsed * 1000:7.1f} ms  "
+                f"gmail_requests={fake.requests - gmail_before:3d}  "
+                f"gemini_calls={CountingModel.calls - gemini_before:3d}"
+            )
+        print(single_flight.single_flight.stats())
+    finally:
+        server.should_exit = True
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Wall-clock time and token usage of per-email vs batched Gemini summaries.
+
+``loop`` reproduces the old fetch_emails path: one summarize_single_email
+call per email. ``batch`` goes through summarize_emails_batch, which packs
+the emails into structured-output requests keyed by message ID.
+
+By default the model is a stand-in with a fixed per-call latency and a
+chars/4 token estimate, so no API key is needed. ``--live`` uses the real
+Gemini model configured in settings and its reported token counts.
+
+Usage:
+    python -m benchmarks.summaries --emails 10 --latency-ms 800
+    python -m benchmarks.summaries --emails 10 --live
+"""
+
+import argparse
+import time
+from typing import Any
+
+from app.services.ai_service import AIService
+from benchmarks.fake_gemini import FakeModel
+from benchmarks.fake_gmail import make_message
+
+
+def make_emails(count: int) -> list[dict[str, Any]]:
+    emails = []
+    for index in range(count):
+        message = make_message(index, body_size=2048)
+        emails.append(
+            {
+                "id": message["id"],
+                "from": f"Sender {index} <sender{index}@example.com>",
+                "subject": f"Quarterly report follow-up #{index}",
+                "snippet": message["snippet"],
+                "body": f"Hi, following up on item {index}. " * 60,
+            }
+        )
+    return emails
+
+
+def run(label: str, service: AIService, summarize: Any) -> None:
+    started = time.perf_counter()
+    summaries = summarize()
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:>5}: {elapsed * 1000:8.1f} ms  calls={service.usage['calls']:3d}  "
+        f"prompt_tokens={service.usage['prompt_tokens']:6d}  "
+        f"output_tokens={service.usage['output_tokens']:5d}  summaries={len(summaries)}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--emails", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=800.0)
+    parser.add_argument("--live", action="store_true", help="call the real Gemini API")
+    args = parser.parse_args()
+
+    emails = make_emails(args.emails)
+
+    def service() -> AIService:
+        ai_service = AIService()
+        if not args.live:
+            ai_service.model = FakeModel(args.latency_ms / 1000)
+        return ai_service
+
+    loop_service = service()
+    run(
+        "loop",
+        loop_service,
+        lambda: [loop_service.summarize_single_email(email) for email in emails],
+    )
+
+    batch_service = service()
+    run("batch", batch_service, lambda: batch_service.summarize_emails_batch(emails))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Database round trips and latency of /chat/history-style requests, with and without the user cache.
+
+``--users`` users make ``--requests`` requests between them, a few at a
+time, each looking the user up and reading their chat history, the two
+queries /chat/history makes. Every ``--refresh-every`` requests a user's
+access token is refreshed and written back, which invalidates their cache
+entry. The database is ``fake_postgrest`` with ``--latency-ms`` per round
+trip. ``off`` gives Database a cache whose entries expire at once, which
+is how every request behaved before; ``on`` is a cache with the
+configured TTL.
+
+Usage:
+    python -m benchmarks.user_cache --users 20 --requests 400 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.core.config import settings
+from app.core.database import Database
+from app.models.schemas import UserCreate, UserUpdate
+from app.services.user_cache import UserCache
+from benchmarks.fake_postgrest import FakePostgrest
+
+CONCURRENCY = 8
+
+
+async def run(label: str, cache: UserCache, args: argparse.Namespace) -> None:
+    db = Database()
+    db.use_user_cache(cache)
+    users = [
+        await db.create_user(
+            UserCreate(
+                email=f"{label}{index}@example.com",
+                google_id=f"{label}{index}",
+                refresh_token="refresh",
+            )
+        )
+        for index in range(args.users)
+    ]
+    latencies: list[float] = []
+    refreshes = 0
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def request(index: int) -> None:
+        nonlocal refreshes
+        user = users[index % len(users)]
+        async with semaphore:
+            if index and index % args.refresh_every == 0:
+                await db.update_user(user.id, UserUpdate(access_token=f"token-{index}"))
+                refreshes += 1
+            started = time.perf_counter()
+            await db.get_user_by_id(user.id)
+            await db.get_chat_history(user.id, limit=50)
+            latencies.append(time.perf_counter() - started)
+
+    before = db.queries
+    await asyncio.gather(*(request(index) for index in range(args.requests)))
+    trips = db.queries - before - refreshes
+    await db.aclose()
+    stats = cache.stats()
+    print(
+        f"{label:>3}: round_trips/request={trips / args.requests:4.2f}  "
+        f"p50={statistics.median(latencies) * 1000:6.1f} ms  "
+        f"hit_rate={stats['hit_rate']:.1%}  invalidations={stats['invalidations']}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--refresh-every", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    fake = FakePostgrest(latency=args.latency_ms / 1000).start()
+    settings.SUPABASE_URL = fake.url
+    try:
+        await run("off", UserCache(0, settings.USER_CACHE_MAX_USERS), args)
+        await run(
+            "on", UserCache(settings.USER_CACHE_TTL_SECONDS, settings.USER_CACHE_MAX_USERS), args
+        )
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,16 +1,53 @@
 """FastAPI application entry point."""
 
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
+from app.core.database import db
 from app.routers import auth, chat
+from app.services.category_classifier import category_classifier
+from app.services.enrichment_store import enrichment_store
+from app.services.gmail_client_pool import gmail_client_pool
+from app.services.llm_scheduler import llm_scheduler
+from app.services.mailbox_sync import mailbox_sync
+from app.services.message_cache import message_cache
+from app.services.parse_pool import parse_pool
+from app.services.prompt_packer import prompt_packer
+from app.services.result_sets import result_sets
+from app.services.search_index import search_index
+from app.services.single_flight import single_flight
+from app.services.token_manager import token_manager
+from app.services.user_cache import user_cache
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    """
+    Connect the user cache to other workers if configured.
+
+    On shutdown, let in-flight token refreshes finish persisting, then close
+    connections and workers.
+    """
+    if settings.USER_CACHE_BROADCAST:
+        await user_cache.start_broadcast(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+    yield
+    await token_manager.aclose()
+    await user_cache.aclose()
+    await db.aclose()
+    parse_pool.shutdown()
+    llm_scheduler.shutdown()
+
 
 app = FastAPI(
     title="Email Assistant API",
     description="AI-Powered Email Assistant Backend",
     version="0.1.0",
     debug=settings.DEBUG,
+    lifespan=lifespan,
 )
 
 # CORS Configuration
@@ -34,6 +71,27 @@ async def health_check() -> dict[str, str]:
     return {"status": "healthy", "environment": settings.ENVIRONMENT}
 
 
+@app.get("/metrics")
+async def metrics() -> dict[str, dict]:
+    """Cache and client-pool counters for capacity planning."""
+    return {
+        "gmail_clients": gmail_client_pool.stats(),
+        "message_cache": message_cache.stats(),
+        "parse_pool": parse_pool.stats(),
+        "mailbox_sync": mailbox_sync.stats(),
+        "result_sets": result_sets.stats(),
+        "search_index": search_index.stats(),
+        "enrichments": enrichment_store.stats(),
+        "classifier": category_classifier.stats(),
+        "gemini": llm_scheduler.stats(),
+        "single_flight": single_flight.stats(),
+        "prompts": prompt_packer.stats(),
+        "tokens": token_manager.stats(),
+        "database": db.stats(),
+        "users": user_cache.stats(),
+    }
+
+
 # Register routers
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
@@ -48,11 +48,31 @@ CREATE TABLE IF NOT EXISTS chat_history (
 CREATE INDEX IF NOT EXISTS idx_chat_history_user_id ON chat_history(user_id);
 CREATE INDEX IF NOT EXISTS idx_chat_history_created_at ON chat_history(created_at DESC);
 
+-- ============================================
+-- Email Enrichments Table (cached AI output per email)
+-- ============================================
+-- Rows are keyed by the model and prompt version that produced them, so
+-- changing either simply stops old rows from matching
+-- Digest group summaries are stored here too, under a "digest:<hash>"
+-- message ID derived from the messages in the group
+CREATE TABLE IF NOT EXISTS email_enrichments (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    message_id VARCHAR(64) NOT NULL,
+    model VARCHAR(64) NOT NULL,
+    prompt_version VARCHAR(32) NOT NULL,
+    summary TEXT NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (user_id, message_id, model, prompt_version)
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_enrichments_created_at ON email_enrichments(created_at);
+
 -- ============================================
 -- Row Level Security (RLS) Policies
 -- ============================================
 ALTER TABLE users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE chat_history ENABLE ROW LEVEL SECURITY;
+ALTER TABLE email_enrichments ENABLE ROW LEVEL SECURITY;
 
 -- Users can only read/update their own data
 CREATE POLICY "Users can view own data" ON users
@@ -68,8 +88,13 @@ CREATE POLICY "Users can view own chat history" ON chat_history
 CREATE POLICY "Users can insert own chat history" ON chat_history
     FOR INSERT WITH CHECK (auth.uid()::text = user_id::text);
 
+-- Email enrichment policies
+CREATE POLICY "Users can view own email enrichments" ON email_enrichments
+    FOR SELECT USING (auth.uid()::text = user_id::text);
+
 -- ============================================
 -- Grant permissions (if needed)
 -- ============================================
 -- GRANT ALL ON users TO authenticated;
 -- GRANT ALL ON chat_history TO authenticated;
+-- GRANT ALL ON email_enrichments TO authenticated;
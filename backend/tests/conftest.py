@@ -0,0 +1,15 @@
+"""Shared test setup."""
+
+import os
+
+# Settings requires these; tests never reach the real services
+for name in (
+    "GOOGLE_CLIENT_ID",
+    "GOOGLE_CLIENT_SECRET",
+    "GOOGLE_REDIRECT_URI",
+    "SUPABASE_URL",
+    "SUPABASE_KEY",
+    "SUPABASE_SERVICE_KEY",
+    "GEMINI_API_KEY",
+):
+    os.environ.setdefault(name, "test")
@@ -0,0 +1,112 @@
+"""Tests for AIService categorization."""
+
+from collections.abc import AsyncIterator
+from typing import Any
+from uuid import uuid4
+
+import pytest
+
+from app.services import ai_service
+from app.services.ai_service import AIService
+from app.services.category_classifier import category_classifier
+
+
+class DownModel:
+    """A Gemini model whose every call fails."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def generate_content(self, _prompt: str, **_kwargs: Any) -> Any:
+        self.calls += 1
+        raise RuntimeError("Gemini is down")
+
+
+def make_email(index: int, subject: str) -> dict[str, Any]:
+    return {
+        "id": f"m{index}",
+        "from": "sender@example.com",
+        "subject": subject,
+        "snippet": "",
+    }
+
+
+EMAILS = [
+    make_email(0, "Urgent: server outage"),
+    make_email(1, "Big sale, 50% discount"),
+    make_email(2, "Project meeting notes"),
+    make_email(3, "Dinner on Saturday?"),
+]
+
+KEYWORD_CATEGORIES = {
+    "Urgent": ["m0"],
+    "Promotions": ["m1"],
+    "Work": ["m2"],
+    "Personal": ["m3"],
+}
+
+
+@pytest.fixture
+def service(monkeypatch: pytest.MonkeyPatch) -> AIService:
+    monkeypatch.setattr(ai_service, "CATEGORIZE_RETRY_DELAY", 0)
+    service = AIService()
+    service.model = DownModel()
+    return service
+
+
+async def in_batches(emails: list[dict[str, Any]], size: int) -> AsyncIterator[list[dict]]:
+    for start in range(0, len(emails), size):
+        yield emails[start : start + size]
+
+
+def ids(categories: dict[str, list[dict]]) -> dict[str, list[str]]:
+    return {
+        category: [email["id"] for email in members] for category, members in categories.items()
+    }
+
+
+def test_categorize_falls_back_to_keywords_when_gemini_fails(service: AIService) -> None:
+    categories = service.categorize_emails(EMAILS, user_id=uuid4())
+
+    assert service.model.calls == ai_service.CATEGORIZE_ATTEMPTS
+    assert ids(categories) == KEYWORD_CATEGORIES
+
+
+async def test_iter_categorization_with_cold_classifier_falls_back_when_gemini_fails(
+    service: AIService,
+) -> None:
+    # A user the classifier has never seen: predict() returns None for every batch
+    results = [
+        result async for result in service.iter_categorization(in_batches(EMAILS, 2), uuid4())
+    ]
+
+    done, total, categories = results[-1]
+    assert done == total == len(EMAILS)
+    assert categories is not None
+    assert ids(categories) == KEYWORD_CATEGORIES
+
+
+async def test_llm_calls_count_every_gemini_call(service: AIService) -> None:
+    before = category_classifier.stats()["llm_calls"]
+    service.categorize_emails(EMAILS, user_id=uuid4())
+    async for _ in service.iter_categorization(in_batches(EMAILS, 2), uuid4()):
+        pass
+
+    # One chunk, then one per batch of two, each retried to the last attempt
+    assert service.model.calls == 3 * ai_service.CATEGORIZE_ATTEMPTS
+    assert category_classifier.stats()["llm_calls"] - before == service.model.calls
+
+
+def test_digest_groups_new_mail_only_changes_the_newest_group() -> None:
+    service = AIService()
+    # Newest first, as Gmail lists them
+    mail = [make_email(index, f"Email {index}") for index in range(300, 0, -1)]
+    day, later = mail[10:], mail
+
+    groups = service._digest_groups(day)
+    regrouped = service._digest_groups(later)
+
+    assert [email["id"] for group in groups for email in group] == [
+        email["id"] for email in reversed(day)
+    ]
+    assert regrouped[: len(groups) - 1] == groups[:-1]
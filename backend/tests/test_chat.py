@@ -0,0 +1,64 @@
+"""Tests for the chat router and its helpers."""
+
+from uuid import UUID, uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.database import db
+from app.models.schemas import ChatMessage
+from app.routers import chat
+from app.routers.chat import _resolve_email_index
+from app.services.result_sets import result_sets
+
+
+class NoGmail:
+    """Fails the test if Gmail is asked to list messages."""
+
+    async def list_message_ids(self, max_results: int) -> list[str]:
+        raise AssertionError(f"listed {max_results} message IDs from Gmail")
+
+
+def listing(*message_ids: str) -> ChatMessage:
+    return ChatMessage(
+        role="assistant",
+        content="Here are your emails",
+        metadata={"emails": [{"id": message_id} for message_id in message_ids]},
+    )
+
+
+async def test_resolve_email_index_prefers_the_conversations_listing() -> None:
+    user_id = uuid4()
+    # A later listing from another tab of the same user
+    result_sets.remember(str(user_id), ["other-1", "other-2"])
+
+    history = [listing("seen-1", "seen-2")]
+
+    assert await _resolve_email_index(user_id, 1, history, NoGmail()) == "seen-2"
+    assert await _resolve_email_index(user_id, 5, history, NoGmail()) is None
+
+
+async def test_resolve_email_index_falls_back_to_the_last_listing() -> None:
+    user_id = uuid4()
+    result_sets.remember(str(user_id), ["last-1", "last-2"])
+
+    assert await _resolve_email_index(user_id, -1, [], NoGmail()) == "last-2"
+
+
+@pytest.mark.parametrize("endpoint", ["/chat/message", "/chat/stream"])
+def test_invalid_users_are_rejected_with_their_status(
+    endpoint: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def no_user(_user_id: UUID) -> None:
+        return None
+
+    monkeypatch.setattr(db, "get_user_by_id", no_user)
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chat")
+    client = TestClient(app)
+
+    invalid = client.post(endpoint, params={"user_id": "nope"}, json={"message": "hi"})
+    assert invalid.status_code == 400
+    unknown = client.post(endpoint, params={"user_id": str(uuid4())}, json={"message": "hi"})
+    assert unknown.status_code == 404
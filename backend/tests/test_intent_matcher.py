@@ -0,0 +1,29 @@
+"""Tests for chat intent detection."""
+
+from app.models.schemas import ChatMessage
+from app.services.intent_matcher import intent_matcher
+
+DELETE_PROMPT = ChatMessage(
+    role="assistant",
+    content="Are you sure you want to delete this email from Alex?",
+    metadata={"email_id": "m1"},
+)
+
+
+def test_delete_it_confirms_a_pending_deletion() -> None:
+    intent = intent_matcher.detect("Delete it", [DELETE_PROMPT])
+
+    assert intent == {"intent": "delete_email", "email_id": "m1", "confirmed": True}
+
+
+def test_delete_it_without_a_pending_confirmation_asks_to_delete() -> None:
+    for history in (None, [], [ChatMessage(role="assistant", content="Here are your emails")]):
+        intent = intent_matcher.detect("Delete it", history)
+
+        assert intent["intent"] == "delete_email"
+        assert intent["confirmed"] is False
+        assert intent["email_index"] is None
+
+
+def test_plain_confirmation_without_anything_pending_is_a_query() -> None:
+    assert intent_matcher.detect("yes", [])["intent"] == "query"
@@ -0,0 +1,39 @@
+"""Tests for LLMScheduler."""
+
+import asyncio
+import time
+
+from app.services.llm_scheduler import BULK, INTERACTIVE, LLMScheduler
+
+
+async def test_interactive_call_overtakes_a_bulk_backlog_without_starving_other_threads() -> None:
+    scheduler = LLMScheduler(
+        requests_per_minute=1_000_000,
+        tokens_per_minute=1_000_000,
+        max_concurrency=2,
+        max_retries=0,
+        backoff_base=0,
+    )
+    finished: list[str] = []
+
+    def call(name: str) -> None:
+        scheduler.run(lambda: time.sleep(0.02), BULK if name.startswith("bulk") else INTERACTIVE)
+        finished.append(name)
+
+    try:
+        backlog = [
+            asyncio.create_task(scheduler.to_thread(BULK, call, f"bulk-{index}"))
+            for index in range(40)
+        ]
+        await asyncio.sleep(0.05)
+
+        # Other blocking work still gets a default-executor thread straight away
+        started = time.perf_counter()
+        await asyncio.to_thread(time.sleep, 0)
+        assert time.perf_counter() - started < 0.05
+
+        await scheduler.to_thread(INTERACTIVE, call, "interactive")
+        assert finished.index("interactive") < 10
+        await asyncio.gather(*backlog)
+    finally:
+        scheduler.shutdown()
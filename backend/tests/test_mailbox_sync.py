@@ -0,0 +1,240 @@
+"""Tests for MailboxSync against the fake Gmail API from the benchmarks."""
+
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import httplib2
+import pytest
+from googleapiclient.discovery import build_from_document
+
+from app.models.schemas import UserInDB
+from app.services.gmail_client_pool import gmail_client_pool
+from app.services.gmail_service import GmailService
+from app.services.mailbox_sync import MailboxSync, mailbox_sync
+from benchmarks.fake_gmail import FakeGmail
+
+# Messages m00000 (newest) to m00029; every third one, m00000 included, is read
+MESSAGE_COUNT = 30
+
+
+@pytest.fixture
+def fake(monkeypatch: pytest.MonkeyPatch) -> Iterator[FakeGmail]:
+    fake = FakeGmail(message_count=MESSAGE_COUNT, latency=0).start(separate_process=False)
+    monkeypatch.setattr(
+        gmail_client_pool,
+        "_service",
+        build_from_document(fake.discovery_document(), http=httplib2.Http()),
+    )
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def gmail(fake: FakeGmail) -> GmailService:
+    now = datetime.now(timezone.utc)
+    user = UserInDB(
+        id=uuid4(),
+        email="test@example.com",
+        google_id="test",
+        refresh_token="refresh",
+        access_token="access",
+        created_at=now,
+        updated_at=now,
+    )
+    gmail = GmailService(user)
+    assert gmail.service._baseUrl.startswith(fake.root_url)
+    return gmail
+
+
+@pytest.fixture
+def sync() -> MailboxSync:
+    # Sync on every request, so each one replays the history since the last
+    return MailboxSync(fresh_seconds=0, max_users=8, window=100)
+
+
+def listed(fake: FakeGmail, query: str = "") -> list[str]:
+    return [message["id"] for message in fake._listed(query)]
+
+
+def test_second_listing_is_served_from_the_store(
+    fake: FakeGmail, gmail: GmailService, sync: MailboxSync
+) -> None:
+    assert sync.list_message_ids(gmail, 10, "") == listed(fake)[:10]
+    assert sync.list_message_ids(gmail, 10, "IS:UNREAD") == listed(fake, "is:unread")[:10]
+
+    requests = fake.requests
+    assert sync.list_message_ids(gmail, 10, "") == listed(fake)[:10]
+    # One history call, no messages.list
+    assert fake.requests == requests + 1
+    assert sync.stats()["full_lists"] == 2
+    assert sync.stats()["served_from_store"] == 1
+
+
+def test_added_messages_are_prepended_to_matching_listings(
+    fake: FakeGmail, gmail: GmailService, sync: MailboxSync
+) -> None:
+    sync.list_message_ids(gmail, 10, "")
+    sync.list_message_ids(gmail, 10, "is:unread")
+
+    read = fake.deliver()
+    unread = fake.deliver()
+    assert "UNREAD" not in read["labelIds"]
+    assert "UNREAD" in unread["labelIds"]
+
+    assert sync.list_message_ids(gmail, 10, "")[:2] == [unread["id"], read["id"]]
+    assert sync.list_message_ids(gmail, 10, "is:unread")[0] == unread["id"]
+    assert read["id"] not in sync.list_message_ids(gmail, 40, "is:unread")
+    assert sync.stats()["full_lists"] == 2
+
+
+def test_deleted_messages_are_removed(
+    fake: FakeGmail, gmail: GmailService, sync: MailboxSync
+) -> None:
+    sync.list_message_ids(gmail, 10, "")
+    sync.list_message_ids(gmail, 10, "is:unread")
+
+    fake.delete("m00001")
+
+    assert sync.list_message_ids(gmail, 10, "") == listed(fake)[:10]
+    assert sync.list_message_ids(gmail, 10, "is:unread") == listed(fake, "is:unread")[:10]
+    assert "m00001" not in sync.list_message_ids(gmail, 10, "")
+    assert sync.stats()["full_lists"] == 2
+
+
+def test_label_changes_drop_messages_out_of_listings(
+    fake: FakeGmail, gmail: GmailService, sync: MailboxSync
+) -> None:
+    sync.list_message_ids(gmail, 10, "")
+    sync.list_message_ids(gmail, 10, "is:unread")
+
+    fake.relabel("m00001", remove=["UNREAD"])
+    fake.relabel("m00002", add=["TRASH"])
+
+    unread = sync.list_message_ids(gmail, 10, "is:unread")
+    everything = sync.list_message_ids(gmail, 10, "")
+    assert unread == listed(fake, "is:unread")[:10]
+    assert everything == listed(fake)[:10]
+    assert "m00001" not in unread
+    assert "m00001" in everything
+    assert "m00002" not in everything
+    assert sync.stats()["full_lists"] == 2
+
+
+def test_message_entering_a_listing_at_unknown_position_rebuilds_it(
+    fake: FakeGmail, gmail: GmailService, sync: MailboxSync
+) -> None:
+    sync.list_message_ids(gmail, 10, "")
+    sync.list_message_ids(gmail, 10, "is:unread")
+
+    # An old message marked unread belongs somewhere inside the listing
+    fake.relabel("m00003", add=["UNREAD"])
+
+    assert sync.list_message_ids(gmail, 10, "is:unread") == listed(fake, "is:unread")[:10]
+    assert sync.list_message_ids(gmail, 10, "") == listed(fake)[:10]
+    # Only the unread listing was listed again
+    assert sync.stats()["full_lists"] == 3
+
+
+def test_listings_are_capped_at_the_window(fake: FakeGmail, gmail: GmailService) -> None:
+    sync = MailboxSync(fresh_seconds=0, max_users=8, window=5)
+
+    assert sync.list_message_ids(gmail, 3, "") == listed(fake)[:3]
+    new = fake.deliver()
+    assert sync.list_message_ids(gmail, 5, "") == listed(fake)[:5]
+    assert sync.list_message_ids(gmail, 5, "")[0] == new["id"]
+    assert sync.stats()["full_lists"] == 1
+
+    # Deeper than the window: listed again
+    assert sync.list_message_ids(gmail, 8, "") == listed(fake)[:8]
+    assert sync.stats()["full_lists"] == 2
+
+
+def test_complete_listing_answers_any_depth(fake: FakeGmail, gmail: GmailService) -> None:
+    sync = MailboxSync(fresh_seconds=0, max_users=8, window=100)
+
+    sync.list_message_ids(gmail, 5, "")
+    assert sync.list_message_ids(gmail, 100, "") == listed(fake)
+    assert sync.stats()["full_lists"] == 1
+
+
+def test_expired_history_falls_back_to_a_full_relist(
+    fake: FakeGmail, gmail: GmailService, sync: MailboxSync
+) -> None:
+    sync.list_message_ids(gmail, 10, "")
+
+    fake.expire_history()
+    new = fake.deliver()
+
+    assert sync.list_message_ids(gmail, 10, "") == listed(fake)[:10]
+    assert sync.list_message_ids(gmail, 10, "")[0] == new["id"]
+    assert sync.stats()["resets"] == 1
+    assert sync.stats()["full_lists"] == 2
+
+
+def test_fresh_store_skips_the_history_call(fake: FakeGmail, gmail: GmailService) -> None:
+    sync = MailboxSync(fresh_seconds=60, max_users=8, window=100)
+    sync.list_message_ids(gmail, 10, "")
+
+    requests = fake.requests
+    sync.list_message_ids(gmail, 10, "")
+    assert fake.requests == requests
+
+    # Until the user changes the mailbox through the app
+    sync.mark_stale(str(gmail.user.id))
+    fake.delete("m00000")
+    assert sync.list_message_ids(gmail, 10, "")[0] == "m00001"
+    assert fake.requests == requests + 1
+
+
+def test_stored_listing_is_handed_over_in_pages(
+    fake: FakeGmail, gmail: GmailService, sync: MailboxSync
+) -> None:
+    sync.list_message_ids(gmail, 20, "")
+
+    pages = list(sync.iter_message_ids(gmail, 10, "", page_size=4))
+    assert [len(page) for page in pages] == [4, 4, 2]
+    assert [message_id for page in pages for message_id in page] == listed(fake)[:10]
+    assert sync.stats()["full_lists"] == 1
+
+
+def test_listing_overtaken_by_a_sync_is_not_stored(
+    fake: FakeGmail, gmail: GmailService, sync: MailboxSync
+) -> None:
+    pages = sync.iter_message_ids(gmail, 10, "", page_size=10)
+    next(pages)
+
+    # Another request syncs past this delivery while the listing is handed over
+    new = fake.deliver()
+    sync.list_message_ids(gmail, 10, "is:unread")
+    list(pages)
+
+    assert sync.list_message_ids(gmail, 10, "")[0] == new["id"]
+
+
+def test_synced_listing_needs_no_label_refresh(
+    fake: FakeGmail, gmail: GmailService, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(mailbox_sync, "fresh_seconds", 0)
+    gmail.fetch_emails(max_results=10)
+    fake.relabel("m00001", remove=["UNREAD"])
+
+    requests = fake.requests
+    emails = gmail.fetch_emails(max_results=10)
+
+    # The history call alone, which also carries the label change
+    assert fake.requests == requests + 1
+    assert [email["id"] for email in emails] == listed(fake)[:10]
+    assert "UNREAD" not in emails[1]["labels"]
+
+
+def test_other_queries_refresh_cached_labels(fake: FakeGmail, gmail: GmailService) -> None:
+    gmail.fetch_emails(max_results=10, query="newer_than:1d")
+    fake.relabel("m00001", remove=["UNREAD"])
+
+    requests = fake.requests
+    emails = gmail.fetch_emails(max_results=10, query="newer_than:1d")
+
+    # messages.list, then one batch of label-only sub-requests
+    assert fake.requests == requests + 2
+    assert "UNREAD" not in emails[1]["labels"]
@@ -0,0 +1,64 @@
+"""Tests for prompt packing."""
+
+import random
+
+from app.services.ai_service import (
+    REPLY_BODY_TOKENS,
+    SUMMARY_BATCH_BODY_TOKENS,
+    SUMMARY_BATCH_SIZE,
+    SUMMARY_BODY_MAX_TOKENS,
+)
+from app.services.prompt_packer import count_tokens, prompt_packer, strip_boilerplate
+from benchmarks.prompt_packing import FOOTER, SIGNATURE, make_email
+
+
+def test_request_after_a_closing_is_kept() -> None:
+    body = "Hi Sam,\nThanks!\nCould you send the signed contract by Friday?"
+
+    assert strip_boilerplate(body) == body
+    assert "signed contract" in prompt_packer.body(body, REPLY_BODY_TOKENS)
+
+
+def test_closing_followed_by_a_signature_is_stripped() -> None:
+    body = f"Hi Sam,\nCould you send the signed contract by Friday?\n{SIGNATURE}"
+
+    assert strip_boilerplate(body) == "Hi Sam,\nCould you send the signed contract by Friday?"
+
+
+def test_sentence_mentioning_footer_phrases_is_kept() -> None:
+    body = (
+        "Hi Sam,\n"
+        "Legal reviewed the draft.\n"
+        "They want our privacy policy linked from the signup page.\n"
+        "Could you add it and unsubscribe links to the launch emails by Friday?"
+    )
+
+    assert strip_boilerplate(body) == body
+
+
+def test_trailing_footer_block_is_stripped() -> None:
+    body = f"Hi Sam,\nThe launch is on Monday.\nSee you there.\n{FOOTER}"
+
+    assert strip_boilerplate(body) == "Hi Sam,\nThe launch is on Monday.\nSee you there."
+
+
+def test_packed_bodies_cost_fewer_tokens_than_the_old_slices() -> None:
+    rng = random.Random(7)
+    emails = [make_email(index, rng) for index in range(200)]
+    bodies = [email.body for email in emails]
+
+    reply_sliced = sum(count_tokens(body[:1000]) for body in bodies)
+    reply_packed = sum(count_tokens(prompt_packer.body(body, REPLY_BODY_TOKENS)) for body in bodies)
+    summary_sliced = sum(count_tokens(body[:500]) for body in bodies)
+    summary_packed = sum(
+        count_tokens(packed)
+        for start in range(0, len(bodies), SUMMARY_BATCH_SIZE)
+        for packed in prompt_packer.bodies(
+            bodies[start : start + SUMMARY_BATCH_SIZE],
+            SUMMARY_BATCH_BODY_TOKENS,
+            SUMMARY_BODY_MAX_TOKENS,
+        )
+    )
+
+    assert reply_packed < reply_sliced
+    assert summary_packed < summary_sliced